@@ -0,0 +1,352 @@
+# aggregate_queries.py
+import itertools
+
+from aggregation import iter_query_pages
+from query_builder import ShipmentQuery
+
+# Aggregate functions understood by both Cosmos DB and the local executor.
+AGGREGATE_FUNCTIONS = ("COUNT", "SUM", "MIN", "MAX", "AVG")
+# Grouped plans with at most this many combinations of group values are run on
+# Cosmos DB as scalar queries per group; wider ones are folded client-side.
+MAX_PUSHDOWN_GROUPS = 64
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def matches_filters(item, filters, since=None, defined=(), numeric=(), until=None):
+    """Evaluates a plan's WHERE conditions (see ShipmentQuery) against an in-memory document."""
+    for field, value in filters.items():
+        if not value:
+            continue
+        if item.get(field) not in value if isinstance(value, tuple) else item.get(field) != value:
+            return False
+    if since or until:
+        shipment_date = item.get('ShipmentDate')
+        if not isinstance(shipment_date, str):
+            return False
+        if (since and shipment_date < since) or (until and shipment_date >= until):
+            return False
+    for field in defined:
+        if field not in item:
+            return False
+    for field in numeric:
+        if not _is_number(item.get(field)):
+            return False
+    return True
+
+
+class Aggregate:
+    """A single aggregate column, e.g. Aggregate("TotalCost", "SUM", "CostUSD")."""
+
+    def __init__(self, alias, function, field=None):
+        function = function.upper()
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Unsupported aggregate function: {function}")
+        if function != "COUNT" and not field:
+            raise ValueError(f"{function} requires a field.")
+        self.alias = alias
+        self.function = function
+        self.field = field
+
+    def to_sql(self):
+        if self.function == "COUNT":
+            return "COUNT(1)"
+        return f"{self.function}(c.{self.field})"
+
+
+class AggregatePlan:
+    """
+    Describes a projected aggregate query: equality filters, optional
+    ShipmentDate bounds, and COUNT/SUM/... columns grouped by zero or
+    more document fields. The same plan can be rendered to a parameterized
+    Cosmos query or evaluated locally against in-memory documents.
+    """
+
+    def __init__(self, aggregates, group_by=(), filters=None, since=None, defined=(), numeric=(), until=None):
+        self.aggregates = list(aggregates)
+        self.group_by = tuple(group_by)
+        self.filters = {field: value for field, value in (filters or {}).items() if value}
+        self.since = since
+        self.defined = tuple(defined)
+        self.numeric = tuple(numeric)
+        self.until = until
+
+    def is_scalar(self):
+        return not self.group_by and len(self.aggregates) == 1
+
+    def to_query(self):
+        return ShipmentQuery(aggregates=self.aggregates, group_by=self.group_by, filters=self.filters,
+                             since=self.since, until=self.until, defined=self.defined, numeric=self.numeric,
+                             value=self.is_scalar())
+
+    def to_sql(self):
+        """Parameterized query text; the values come from to_query().parameters()."""
+        return self.to_query().text
+
+    def to_projection_query(self):
+        """
+        The plan's WHERE with just the fields it groups by and aggregates
+        projected, for folding the rows client-side (see CosmosAggregateExecutor).
+        """
+        fields = list(self.group_by)
+        for aggregate in self.aggregates:
+            if aggregate.field and aggregate.field not in fields:
+                fields.append(aggregate.field)
+        return ShipmentQuery(fields=fields, filters=self.filters, since=self.since, until=self.until,
+                             defined=self.defined, numeric=self.numeric)
+
+    def matches(self, item):
+        return matches_filters(item, self.filters, self.since, self.defined, self.numeric, self.until)
+
+
+# --- Executors ---
+
+class CosmosAggregateExecutor:
+    """
+    Runs aggregate plans against Cosmos DB.
+
+    The Python SDK only executes single-value aggregates: its query plan
+    rejects GROUP BY and several aggregates in one SELECT. So every
+    aggregate is sent as its own SELECT VALUE COUNT(1)/SUM(...) and only the
+    value comes back. A grouped plan first lists each group field's values
+    (SELECT DISTINCT VALUE, or the filter's own values), then runs a COUNT
+    per combination, and the other aggregates for the non-empty ones.
+
+    That needs every group field in `defined`: shipments missing a group
+    field form a group no equality filter can select. Those plans, and plans
+    with more than MAX_PUSHDOWN_GROUPS combinations, stream the few fields
+    they need (filtered in Cosmos DB) and fold them like LocalAggregateExecutor.
+    """
+
+    def __init__(self, container):
+        self.container = container
+
+    def _pages(self, query):
+        return iter_query_pages(self.container, query.text, parameters=query.parameters())
+
+    def _rows(self, query):
+        return [row for page in self._pages(query) for row in page]
+
+    def _value(self, plan, aggregate, filters):
+        scalar = AggregatePlan([aggregate], filters=filters, since=plan.since, until=plan.until,
+                               defined=plan.defined, numeric=plan.numeric)
+        rows = self._rows(scalar.to_query())
+        return rows[0] if rows else (0 if aggregate.function == "COUNT" else None)
+
+    def _group_values(self, plan, field):
+        value = plan.filters.get(field)
+        if value:
+            return list(value) if isinstance(value, tuple) else [value]
+        values = self._rows(ShipmentQuery(fields=(field,), filters=plan.filters, since=plan.since, until=plan.until,
+                                          defined=plan.defined, numeric=plan.numeric, value=True, distinct=True))
+        return sorted(value for value in values if isinstance(value, str) and value)
+
+    def _group_keys(self, plan):
+        """The group value combinations to query, or None when the plan cannot be pushed down."""
+        if not set(plan.group_by).issubset(plan.defined):
+            return None
+        values = []
+        combinations = 1
+        for field in plan.group_by:
+            values.append(self._group_values(plan, field))
+            combinations *= len(values[-1])
+            if combinations > MAX_PUSHDOWN_GROUPS:
+                return None
+        return list(itertools.product(*values))
+
+    def aggregate(self, plan):
+        if plan.is_scalar():
+            return [{plan.aggregates[0].alias: self._value(plan, plan.aggregates[0], plan.filters)}]
+        if not plan.group_by:
+            return [{aggregate.alias: self._value(plan, aggregate, plan.filters) for aggregate in plan.aggregates}]
+        keys = self._group_keys(plan)
+        if keys is None:
+            return fold_rows(plan, (row for page in self._pages(plan.to_projection_query()) for row in page))
+        count = Aggregate("ShipmentCount", "COUNT")
+        rows = []
+        for key in keys:
+            group = dict(zip(plan.group_by, key))
+            filters = dict(plan.filters, **group)
+            group_count = self._value(plan, count, filters)
+            if not group_count:
+                continue  # like GROUP BY, empty groups have no row
+            for aggregate in plan.aggregates:
+                group[aggregate.alias] = (group_count if aggregate.function == "COUNT"
+                                          else self._value(plan, aggregate, filters))
+            rows.append(group)
+        return rows
+
+
+class _Accumulator:
+    def __init__(self, function):
+        self.function = function
+        self.count = 0
+        self.value = None
+
+    def add(self, value):
+        if self.function == "COUNT":
+            self.count += 1
+            return
+        # Cosmos aggregates skip undefined values and only fold numbers.
+        if not _is_number(value):
+            return
+        self.count += 1
+        if self.value is None:
+            self.value = value
+        elif self.function in ("SUM", "AVG"):
+            self.value += value
+        elif self.function == "MIN":
+            self.value = min(self.value, value)
+        elif self.function == "MAX":
+            self.value = max(self.value, value)
+
+    def result(self):
+        if self.function == "COUNT":
+            return self.count
+        if self.function == "AVG" and self.count:
+            return self.value / self.count
+        return self.value
+
+
+def fold_rows(plan, rows):
+    """Evaluates the plan's aggregates over rows that already match its filters."""
+    groups = {}
+    for item in rows:
+        key = tuple(item.get(field) for field in plan.group_by)
+        accumulators = groups.get(key)
+        if accumulators is None:
+            accumulators = [_Accumulator(aggregate.function) for aggregate in plan.aggregates]
+            groups[key] = accumulators
+        for aggregate, accumulator in zip(plan.aggregates, accumulators):
+            accumulator.add(item.get(aggregate.field) if aggregate.field else None)
+
+    if not plan.group_by:
+        accumulators = groups.get((), [_Accumulator(a.function) for a in plan.aggregates])
+        return [{a.alias: acc.result() for a, acc in zip(plan.aggregates, accumulators)}]
+
+    result = []
+    for key, accumulators in groups.items():
+        # Like Cosmos, a group whose field is undefined omits that property.
+        row = {field: value for field, value in zip(plan.group_by, key) if value is not None}
+        for aggregate, accumulator in zip(plan.aggregates, accumulators):
+            row[aggregate.alias] = accumulator.result()
+        result.append(row)
+    return result
+
+
+class LocalAggregateExecutor:
+    """
+    In-memory stand-in for CosmosAggregateExecutor. Runs the same plans over a
+    list (or any re-iterable) of shipment documents with no network access.
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def aggregate(self, plan):
+        return fold_rows(plan, (item for item in self.items if plan.matches(item)))
+
+
+# --- Plans used by the API endpoints ---
+
+def status_count_plan(filters, since=None, until=None):
+    return AggregatePlan(
+        [Aggregate("ShipmentCount", "COUNT")],
+        group_by=("DeliveryStatus",),
+        filters=filters,
+        since=since,
+        until=until,
+    )
+
+
+def carrier_cost_plan(filters):
+    return AggregatePlan(
+        [Aggregate("TotalCost", "SUM", "CostUSD"), Aggregate("ShipmentCount", "COUNT")],
+        group_by=("Carrier",),
+        filters=filters,
+        defined=("Carrier",),
+        numeric=("CostUSD",),
+    )
+
+
+def priority_status_plan(filters):
+    return AggregatePlan(
+        [Aggregate("ShipmentCount", "COUNT")],
+        group_by=("DeliveryStatus", "Priority"),
+        filters=filters,
+        defined=("DeliveryStatus", "Priority"),
+    )
+
+
+def count_plan(filters, since=None, until=None):
+    return AggregatePlan([Aggregate("ShipmentCount", "COUNT")], filters=filters, since=since, until=until)
+
+
+def carrier_averages(carrier_rows):
+    """Turns carrier_cost_plan rows into {carrier: average cost}."""
+    averages = {}
+    for row in carrier_rows:
+        carrier = row.get('Carrier')
+        count = row.get('ShipmentCount') or 0
+        if carrier and count > 0:
+            averages[carrier] = round((row.get('TotalCost') or 0) / count, 2)
+    return averages
+
+
+def _count(rows):
+    return (rows[0].get('ShipmentCount') or 0) if rows else 0
+
+
+def dashboard_queries(store, filters, since):
+    """
+    The independent aggregate queries behind /api/dashboard_summary, as
+    {name: zero-argument callable}, so they can be run concurrently. The
+    counters are scalar COUNT plans, so Cosmos DB answers each with one
+    SELECT VALUE COUNT(1); the carrier averages are pushed down per carrier
+    (see CosmosAggregateExecutor).
+    """
+    status = filters.get("DeliveryStatus")
+    # None when the status filter excludes delayed shipments, so the count is 0.
+    includes_delayed = "Delayed" in status if isinstance(status, tuple) else status in (None, "", "Delayed")
+    delayed = dict(filters, DeliveryStatus="Delayed") if includes_delayed else None
+
+    def count(count_filters, count_since=None):
+        if count_filters is None:
+            return lambda: [{"ShipmentCount": 0}]
+        return lambda: store.aggregate(count_plan(count_filters, since=count_since))
+
+    return {
+        "total": count(filters),
+        "delayed": count(delayed),
+        "recent": count(filters, since),
+        "recentDelayed": count(delayed, since),
+        "carrierCosts": lambda: store.aggregate(carrier_cost_plan(filters)),
+    }
+
+
+def build_dashboard_summary(results, top_5_expensive):
+    """Assembles the dashboard payload from the rows returned by dashboard_queries."""
+    averages = carrier_averages(results["carrierCosts"])
+    return {
+        "totalShipments": _count(results["total"]),
+        "totalDelayedShipments": _count(results["delayed"]),
+        "ordersPast3Months": _count(results["recent"]),
+        "delayedPast3Months": _count(results["recentDelayed"]),
+        "avgCostByCarrierData": [
+            {"carrier": carrier, "averageCost": average} for carrier, average in averages.items()
+        ],
+        "top5ExpensiveShipments": top_5_expensive,
+    }
+
+
+def dashboard_summary(store, filters, since, top_5_expensive):
+    """
+    Builds the /api/dashboard_summary payload from pushed-down aggregate plans,
+    running them one after another.
+    `store` is anything with an aggregate(plan) method: a ShipmentStore or an executor.
+    """
+    results = {name: query() for name, query in dashboard_queries(store, filters, since).items()}
+    return build_dashboard_summary(results, top_5_expensive)
+
@@ -0,0 +1,78 @@
+# aggregation.py
+import re
+
+from bulk_import import is_throttled, retry_after_seconds
+from metrics import track_query
+from ru_budget import MAX_THROTTLED_ATTEMPTS, budget
+
+# Number of documents requested from Cosmos DB per page while streaming.
+DEFAULT_PAGE_SIZE = 1000
+# Query features the SDK cannot resume from a continuation token when the
+# query spans partitions (ORDER BY, aggregates, DISTINCT, TOP, OFFSET/LIMIT).
+_NOT_RESUMABLE = re.compile(
+    r"\b(ORDER\s+BY|GROUP\s+BY|DISTINCT|TOP|OFFSET|(COUNT|SUM|MIN|MAX|AVG)\s*\()",
+    re.IGNORECASE,
+)
+
+
+def is_resumable(query):
+    """Whether a cross-partition query can be resumed with by_page(continuation_token)."""
+    return not _NOT_RESUMABLE.search(query)
+
+
+def iter_query_pages(container, query, page_size=DEFAULT_PAGE_SIZE, parameters=None):
+    """
+    Yields the results of a cross-partition query one page at a time,
+    so callers never hold more than a single page in memory.
+
+    Every page is requested through the RU budget of the current priority
+    class (see ru_budget.py), and debited with the charges of that query's
+    own responses. A throttled (429) page is retried once the server's
+    retry-after has passed: a plain query resumes from the last continuation
+    token; any other query (see is_resumable) is issued again and the rows
+    already yielded are skipped.
+    """
+    kwargs = {
+        "query": query,
+        "enable_cross_partition_query": True,
+        "max_item_count": page_size,
+    }
+    if parameters:
+        kwargs["parameters"] = parameters
+    resumable = is_resumable(query)
+    with track_query(query, parameters) as tracked:
+        kwargs["response_hook"] = tracked.on_response
+        pages = container.query_items(**kwargs).by_page()
+        continuation = None
+        throttled = 0
+        yielded = skip = 0
+        while True:
+            budget.acquire()
+            try:
+                page = list(next(pages))
+            except StopIteration:
+                return
+            except Exception as e:
+                if not is_throttled(e) or throttled >= MAX_THROTTLED_ATTEMPTS:
+                    raise
+                throttled += 1
+                budget.on_throttle(retry_after_seconds(e))
+                if resumable:
+                    pages = container.query_items(**kwargs).by_page(continuation)
+                else:
+                    # Results are deterministic (ORDER BY ends with ShipmentID), so the
+                    # first `yielded` rows of the new run are the ones already returned.
+                    pages = container.query_items(**kwargs).by_page()
+                    skip = yielded
+                continue
+            throttled = 0
+            continuation = getattr(pages, "continuation_token", None)
+            budget.charge(tracked.add_page(len(page)))
+            if skip:
+                skipped = min(skip, len(page))
+                page, skip = page[skipped:], skip - skipped
+                if not page:
+                    continue
+            yielded += len(page)
+            yield page
+
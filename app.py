@@ -1,22 +1,57 @@
 # app.py
+import itertools
 import os
+import threading
+import time
+
+from startup import Startup
+
+# Created first so the imports below are timed as the "imports" phase.
+startup = Startup()
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from flask import Flask, jsonify, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, jsonify, request
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 
 from datetime import datetime, timedelta
-from collections import defaultdict
 
-# Azure Cosmos DB imports
-from azure.cosmos import CosmosClient, PartitionKey
+from aggregate_queries import build_dashboard_summary, carrier_cost_plan, dashboard_queries, priority_status_plan
+from change_feed import (ALL_VERSIONS_AND_DELETES, ChangeFeedConsumer, CosmosChangeFeed, FileChangeFeed, LiveAggregates,
+                         LiveAggregatingStore, parse_change)
+from correlation import DEFAULT_BINS, DEFAULT_SAMPLE_SIZE, MAX_BINS, MAX_SAMPLE_SIZE, summarize
+from daily_rollups import ROLLUP_FIELDS, DailyRollups, next_day
+from distributions import (DEFAULT_BINS as DISTRIBUTION_BINS, DISTRIBUTION_FIELDS, GROUP_FIELDS,
+                           MAX_BINS as MAX_DISTRIBUTION_BINS, DistributionSketches)
+from export import EXPORT_FIELDS, EXPORT_FORMATS, stream_export
+from facets import facet_counts, facet_cube_plan
+from live_updates import DashboardSubscriptions
+from metrics import instrument_app
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+from query_builder import spec_cache_stats
+from query_executor import QueryExecutor, QueryTimeout
+from responses import DataVersion, ResponseLayer
+from result_cache import ResultCache
+from ru_budget import BULK, INTERACTIVE, BudgetExhausted, budget, iter_with_priority, priority
+from search_index import SEARCH_FIELDS, LaneIndex
+from shared_aggregates import DEFAULT_SEGMENT_BYTES, AggregatePublisher, AggregateSegment, SharedAggregates
+from shipment_store import SORTABLE_COLUMNS, CosmosShipmentStore, narrow_filters, sort_spec
+from single_flight import SingleFlight
+
+startup.mark("imports")
 
 # --- Flask App Setup ---
 app = Flask(__name__)
 
+# --- Metrics ---
+# Per-route latency, query counts, rows and RU charge, served at /metrics.
+# SLOW_QUERY_MS logs every Cosmos query slower than that with its SQL.
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+instrument_app(app, slow_query_ms=float(SLOW_QUERY_MS) if SLOW_QUERY_MS else None)
+
 # --- CORS Configuration ---
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://127.0.0.1:3000", "http://localhost:3001"]}})
 
@@ -35,43 +70,617 @@ COSMOS_DB_DATABASE_ID = os.getenv("COSMOS_DB_DATABASE_ID")
 COSMOS_DB_CONTAINER_ID = os.getenv("COSMOS_DB_CONTAINER_ID")
 
 COSMOS_DB_PARTITION_KEY_PATH = "/ShipmentID"
+# Throttled (429) requests the SDK retries by itself before the RU budget
+# (see below) sees the throttle and waits out the retry-after hint.
+COSMOS_THROTTLE_RETRIES = int(os.getenv("COSMOS_THROTTLE_RETRIES", default=1))
+# A failed connection is retried by the warm-up thread, waiting twice as
+# long after each failure up to COSMOS_CONNECT_MAX_BACKOFF_SECONDS.
+COSMOS_CONNECT_MAX_BACKOFF_SECONDS = float(os.getenv("COSMOS_CONNECT_MAX_BACKOFF_SECONDS", default=30))
 cosmos_client = None
 shipments_container = None
 
 
-def initialize_cosmos_db():
-    """Initializes the Cosmos DB client and container."""
+def connect_cosmos_db():
+    """Creates the Cosmos DB client and container. Returns the container, or None if the attempt failed."""
     global cosmos_client, shipments_container
-    if not cosmos_client:
+    if not shipments_container:
+        # Deferred: the SDK takes ~80 ms to import and the memory store never needs it.
+        from azure.cosmos import CosmosClient
         try:
-            cosmos_client = CosmosClient(COSMOS_DB_ENDPOINT, credential=COSMOS_DB_KEY)
+            cosmos_client = CosmosClient(COSMOS_DB_ENDPOINT, credential=COSMOS_DB_KEY,
+                                         retry_throttle_total=COSMOS_THROTTLE_RETRIES)
             database = cosmos_client.get_database_client(COSMOS_DB_DATABASE_ID)
             shipments_container = database.get_container_client(COSMOS_DB_CONTAINER_ID)
             print("Cosmos DB client initialized successfully.")
         except Exception as e:
             print(f"Error initializing Cosmos DB client: {e}")
             print("Please ensure COSMOS_DB_ENDPOINT and COSMOS_DB_KEY are correctly set and valid.")
-            shipments_container = None
+            cosmos_client = shipments_container = None
+    return shipments_container
+
+
+def get_shipments_container():
+    """
+    The Cosmos DB container, or None until the warm-up thread has connected.
+    Requests never connect (or retry a failed connection) themselves.
+    """
     return shipments_container
 
 
-with app.app_context():
-    initialize_cosmos_db()
+# --- RU Budget Configuration ---
+# Every Cosmos query page is paid from a token bucket for its priority class.
+# Interactive routes may wait up to RU_MAX_WAIT_INTERACTIVE_SECONDS for budget
+# before they are shed (stale cached results are served if held, otherwise
+# 503); bulk scans and exports are capped at RU_BUDGET_BULK RU/s so they
+# cannot starve the dashboard.
+budget.configure(
+    rates={
+        INTERACTIVE: float(os.getenv("RU_BUDGET_INTERACTIVE", default=2000)),
+        BULK: float(os.getenv("RU_BUDGET_BULK", default=400)),
+    },
+    max_waits={
+        INTERACTIVE: float(os.getenv("RU_MAX_WAIT_INTERACTIVE_SECONDS", default=2)),
+        BULK: float(os.getenv("RU_MAX_WAIT_BULK_SECONDS", default=30)),
+    },
+)
+
+
+# --- Shipment Store Configuration ---
+# SHIPMENT_STORE selects the backend every route reads through:
+#   cosmos  - query the Cosmos DB container directly (default)
+#   memory  - NumPy columnar store loaded from SHIPMENT_DATA_FILE (JSON or NDJSON)
+#   replica - NumPy columnar store populated from Cosmos DB at startup
+SHIPMENT_STORE = os.getenv("SHIPMENT_STORE", "cosmos").lower()
+SHIPMENT_DATA_FILE = os.getenv("SHIPMENT_DATA_FILE")
+shipment_store = None
+# Held while the store is built, so the warm-up thread and early requests build it once.
+_store_lock = threading.RLock()
+
+# --- Snapshot Configuration ---
+# With SNAPSHOT_FILE set, the memory/replica stores are written to that file
+# every SNAPSHOT_INTERVAL_SECONDS (when the data changed) as raw column
+# arrays plus the change feed position they include. At startup the file is
+# memory-mapped instead of loading SHIPMENT_DATA_FILE or scanning Cosmos DB,
+# and the change feed replays what happened since. Worker processes mapping
+# the same file share its pages; only one of them writes it.
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE")
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", default=60))
+snapshot_header = None
+snapshot_writer = None
+
+
+def _snapshot_source(kind):
+    """What a snapshot for this store must have been taken from, or None if snapshots cannot be used."""
+    if kind == "memory":
+        if not SHIPMENT_DATA_FILE:
+            return {"store": "memory"}
+        stat = os.stat(SHIPMENT_DATA_FILE)
+        return {"store": "memory", "file": os.path.abspath(SHIPMENT_DATA_FILE),
+                "size": stat.st_size, "mtime": stat.st_mtime}
+    if kind == "replica" and CHANGE_FEED != "off":
+        # Without the change feed, writes made since the snapshot could not be caught up on.
+        return {"store": "replica", "endpoint": COSMOS_DB_ENDPOINT, "database": COSMOS_DB_DATABASE_ID,
+                "container": COSMOS_DB_CONTAINER_ID, "changeFeed": CHANGE_FEED}
+    return None
+
+
+def _load_snapshot(kind):
+    """Returns the store mapped from SNAPSHOT_FILE, or None to load it the usual way."""
+    global snapshot_header
+    source = _snapshot_source(kind) if SNAPSHOT_FILE else None
+    if source is None:
+        return None
+    from snapshot import load_snapshot
+    loaded = load_snapshot(SNAPSHOT_FILE, expected_source=source)
+    if loaded is None:
+        return None
+    store, header = loaded
+    if CHANGE_FEED != "off" and header.get("checkpoint") is None:
+        print(f"Ignoring snapshot {SNAPSHOT_FILE}: it has no change feed position to resume from.")
+        return None
+    snapshot_header = header
+    print(f"Mapped {len(store)} shipments from snapshot {SNAPSHOT_FILE} "
+          f"({time.time() - header['createdAt']:.0f}s old).")
+    return store
+
+
+def create_store(kind=SHIPMENT_STORE):
+    """Builds the ShipmentStore selected by SHIPMENT_STORE."""
+    cosmos_store = CosmosShipmentStore(get_shipments_container, single_flight=single_flight)
+    if kind == "cosmos":
+        return cosmos_store
+
+    # NumPy is only needed for the in-memory backends.
+    from columnar_store import ColumnarShipmentStore
+    store = _load_snapshot(kind)
+    if store is not None:
+        return store
+    if kind == "memory":
+        if SHIPMENT_DATA_FILE:
+            return ColumnarShipmentStore.from_file(SHIPMENT_DATA_FILE)
+        return ColumnarShipmentStore()
+    if kind == "replica":
+        if CHANGE_FEED == "cosmos":
+            # Pinned before the scan, so the changes made during it are replayed.
+            get_change_feed_source().pin()
+        with priority(BULK):
+            store = ColumnarShipmentStore(cosmos_store.iter_items())
+        print(f"Loaded {len(store)} shipments into the in-memory replica.")
+        return store
+    raise ValueError(f"Unknown SHIPMENT_STORE: {kind}")
+
+
+def get_store():
+    """Returns the process-wide ShipmentStore, creating it on first use."""
+    global shipment_store
+    if shipment_store is not None:
+        return shipment_store
+    with _store_lock:
+        if shipment_store is not None:
+            return shipment_store
+        store = create_store()
+        store.add_change_listener(data_version.bump)
+        store.add_change_listener(result_cache.on_store_change)
+        store.add_change_listener(dashboard_subscriptions.on_store_change)
+        store.add_change_listener(lane_index.apply)
+        sources = []
+        if shared_aggregates is not None:
+            # Worker process: the writer process maintains the aggregates.
+            sources = [live_aggregates, daily_rollups]
+        elif CHANGE_FEED != "off":
+            store.add_change_listener(live_aggregates.apply)
+            sources.append(live_aggregates)
+        if shared_aggregates is None and daily_rollups_enabled(store):
+            store.add_change_listener(daily_rollups.apply)
+            sources.append(daily_rollups)
+            if store.name != "cosmos":
+                daily_rollups.load(store.iter_items(fields=ROLLUP_FIELDS))
+                print(f"Daily rollups ready ({daily_rollups.bucket_count()} buckets).")
+        if shared_aggregates is None and distributions_maintained(store):
+            store.add_change_listener(_apply_distribution_change)
+            if store.name != "cosmos":
+                distribution_sketches.load(store.iter_items(fields=DISTRIBUTION_FIELDS))
+                print(f"Distribution sketches ready ({len(distribution_sketches)} shipments).")
+        if sources:
+            store = LiveAggregatingStore(store, *sources)
+        shipment_store = store
+    return shipment_store
+
+
+# --- Result Cache Configuration ---
+# Seconds each endpoint's results stay cached. Every write to the store
+# invalidates the cache, so these only bound staleness against writes made
+# outside this process (e.g. import_data.py).
+CACHE_TTLS = {
+    "dashboard_summary": 30,
+    "average_shipment_by_carrier": 60,
+    "priority_distribution_by_status": 60,
+    "delayed_last_3_months": 60,
+    "orders_last_3_months": 60,
+    "total_delayed": 60,
+    "shipments_count": 60,
+    "top_5_expensive": 60,
+    "unique_carriers": 300,
+    "facets": 300,
+    "weight_cost_express_correlation": 120,
+    "rollups": 60,
+    "cost_distribution": 60,
+}
+# Concurrent requests for the same uncached result, and concurrent identical
+# Cosmos queries, wait on one execution and share its result.
+single_flight = SingleFlight()
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", default=512)),
+    default_ttl=int(os.getenv("RESULT_CACHE_TTL", default=30)),
+    ttls=CACHE_TTLS,
+    single_flight=single_flight,
+)
+
+
+# --- Response Encoding ---
+# JSON is serialized with orjson when it is installed, and bodies of at least
+# RESPONSE_COMPRESS_MIN_BYTES are brotli/gzip-compressed. GET /api responses
+# carry an ETag; when every write reaches this process (memory/replica
+# stores, or CHANGE_FEED on) it comes from the data version and a matching
+# If-None-Match is answered with 304 without running the route.
+data_version = DataVersion()
+
+
+def _data_version():
+    store = get_store()
+    if store.name == "cosmos" and CHANGE_FEED == "off":
+        return None
+    return data_version.token()
+
+
+response_layer = ResponseLayer(
+    app,
+    _data_version,
+    min_compress_bytes=int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", default=1024)),
+)
+
+
+# --- Query Executor ---
+# Composite endpoints run their independent store queries concurrently on
+# this shared pool; QUERY_TIMEOUT_SECONDS is the deadline per request.
+query_executor = QueryExecutor(
+    max_workers=int(os.getenv("QUERY_WORKERS", default=16)),
+    default_timeout=float(os.getenv("QUERY_TIMEOUT_SECONDS", default=30)),
+)
+
+
+# --- Live Dashboard Updates ---
+# Clients on the /cosmos-db-nosql namespace subscribe to a filter set and get
+# a snapshot, then coalesced deltas at most every LIVE_UPDATE_INTERVAL_SECONDS.
+# Snapshots share the /api/dashboard_summary result cache entries.
+LIVE_UPDATES_NAMESPACE = "/cosmos-db-nosql"
+dashboard_subscriptions = DashboardSubscriptions(
+    lambda filters: _dashboard_summary(filters),
+    lambda event, message, room: socketio.emit(event, message, to=room, namespace=LIVE_UPDATES_NAMESPACE),
+    coalesce_seconds=float(os.getenv("LIVE_UPDATE_INTERVAL_SECONDS", default=0.5)),
+)
+live_updates_task = None
+# Subscribe handlers run concurrently; only the first may start the flush task.
+live_updates_lock = threading.Lock()
+
+
+# --- Daily Rollups Configuration ---
+# Per-day buckets (day x carrier x status x serviceType x priority) answer
+# date-range counts and /api/rollups without scanning shipments. They need
+# to see every write, so with the cosmos store they require CHANGE_FEED.
+#   auto - on for the memory/replica stores, or when CHANGE_FEED is on (default)
+#   off  - disabled
+DAILY_ROLLUPS = os.getenv("DAILY_ROLLUPS", "auto").lower()
+daily_rollups = DailyRollups()
+
+
+def daily_rollups_enabled(store):
+    return DAILY_ROLLUPS != "off" and (store.name != "cosmos" or CHANGE_FEED != "off")
+
+
+# --- Distribution Sketches ---
+# /api/cost_distribution merges per-cell KLL sketches of cost, weight and
+# delivery days (carrier x status x service type x priority). Like the daily
+# rollups they must see every write, so they are kept for the memory/replica
+# stores or with CHANGE_FEED on; otherwise each request scans the filtered
+# shipments into temporary sketches. Updates and deletes leave old values in
+# the sketches, so they are rebuilt from a bulk scan once that share grows.
+distribution_sketches = DistributionSketches()
+
+
+def distributions_maintained(store):
+    return store.name != "cosmos" or CHANGE_FEED != "off"
+
+
+def _rebuild_distributions():
+    try:
+        with priority(BULK):
+            distribution_sketches.rebuild(get_store().iter_items(fields=DISTRIBUTION_FIELDS))
+        print(f"Distribution sketches rebuilt ({len(distribution_sketches)} shipments).")
+    except Exception as e:
+        print(f"Error rebuilding distribution sketches: {e}")
+
+
+# --- Lane Search Index ---
+# /api/shipments and /api/export accept `origin`/`destination` search text
+# (match=prefix, the default, or match=contains). The index resolves it in
+# memory to the matching place names, which become IN filters the store
+# answers from its own index instead of scanning with CONTAINS. It is loaded
+# from one scan of Origin/Destination and then follows every write;
+# when writes bypass this process (cosmos store without CHANGE_FEED, or a
+# worker process) it is reloaded every LANE_INDEX_REFRESH_SECONDS.
+LANE_INDEX_REFRESH_SECONDS = float(os.getenv("LANE_INDEX_REFRESH_SECONDS", default=300))
+lane_index = LaneIndex()
+lane_index_loaded_at = None
+
+
+def get_lane_index():
+    """Returns the lane index, loading it on first use (and reloading it when it may be stale)."""
+    global lane_index, lane_index_loaded_at
+    store = get_store()
+    sees_writes = store.name != "cosmos" or (CHANGE_FEED != "off" and shared_aggregates is None)
+    if lane_index.ready and (sees_writes or time.monotonic() - lane_index_loaded_at < LANE_INDEX_REFRESH_SECONDS):
+        return lane_index
+
+    def load():
+        index = LaneIndex() if lane_index.ready else lane_index
+        with priority(BULK):
+            return index.load(store.iter_items(fields=SEARCH_FIELDS))
+
+    lane_index = single_flight.do(("lane_index",), load)
+    lane_index_loaded_at = time.monotonic()
+    return lane_index
+
+
+def _lane_filters_from_request():
+    """
+    Filters for the `origin`/`destination` search parameters: {} without a
+    search, None when nothing can match. Raises ValueError for a bad `match`.
+    """
+    origin = request.args.get('origin', '').strip()
+    destination = request.args.get('destination', '').strip()
+    if not origin and not destination:
+        return {}
+    return get_lane_index().resolve(origin, destination, request.args.get('match') or "prefix")
+
+
+def _apply_distribution_change(change_type, document):
+    distribution_sketches.apply(change_type, document)
+    if distribution_sketches.needs_rebuild():
+        distribution_sketches.rebuilding = True
+        threading.Thread(target=_rebuild_distributions, name="distribution-rebuild", daemon=True).start()
+
+
+# --- Change Feed Configuration ---
+# CHANGE_FEED keeps totals, delayed counts, carrier averages and the
+# priority-by-status matrix live in memory instead of querying for them:
+#   off    - disabled (default)
+#   cosmos - consume the container's change feed
+#   file   - replay the NDJSON change records in CHANGE_FEED_FILE (local testing)
+# CHANGE_FEED_MODE is the Cosmos change feed mode. AllVersionsAndDeletes
+# (default, needs the container's all versions and deletes policy) reports
+# deletes; LatestVersion does not, so deleted shipments stay counted until
+# the process restarts.
+CHANGE_FEED = os.getenv("CHANGE_FEED", "off").lower()
+CHANGE_FEED_FILE = os.getenv("CHANGE_FEED_FILE")
+CHANGE_FEED_MODE = os.getenv("CHANGE_FEED_MODE", ALL_VERSIONS_AND_DELETES)
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", default=1.0))
+live_aggregates = LiveAggregates()
+change_feed_source = None
+change_feed_consumer = None
+
+
+def get_change_feed_source():
+    """The change feed source selected by CHANGE_FEED, created on first use."""
+    global change_feed_source
+    if change_feed_source is None:
+        if CHANGE_FEED == "file":
+            change_feed_source = FileChangeFeed(CHANGE_FEED_FILE)
+        elif SHIPMENT_STORE == "cosmos" and CHANGE_FEED_MODE != ALL_VERSIONS_AND_DELETES:
+            # Reading the feed from the beginning replays every current document.
+            change_feed_source = CosmosChangeFeed(get_shipments_container, start_time="Beginning",
+                                                  mode=CHANGE_FEED_MODE)
+        else:
+            change_feed_source = CosmosChangeFeed(get_shipments_container, mode=CHANGE_FEED_MODE)
+    return change_feed_source
+
+
+# --- Multi-Process Serving ---
+# SERVE_WORKERS > 1 runs `python app.py` as one writer process plus that
+# many worker processes accepting connections on the same port. The writer
+# owns the change feed, live aggregates and daily rollups and publishes them
+# to a shared memory segment of SHARED_AGGREGATES_BYTES; workers read the
+# segment lock-free and answer dashboard aggregates from it, so adding
+# workers adds no database queries. The writer passes the segment name to
+# its workers in SHARED_AGGREGATES_SEGMENT.
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", default=1))
+SHARED_AGGREGATES_BYTES = int(os.getenv("SHARED_AGGREGATES_BYTES", default=DEFAULT_SEGMENT_BYTES))
+SHARED_AGGREGATES_SEGMENT = os.getenv("SHARED_AGGREGATES_SEGMENT")
+shared_aggregates = None
+aggregate_publisher = None
+if SHARED_AGGREGATES_SEGMENT:
+    # A refresh counts as a write: it moves ETags, clears cached results and
+    # marks dashboard rooms for a delta.
+    shared_aggregates = SharedAggregates(
+        AggregateSegment(SHARED_AGGREGATES_SEGMENT),
+        on_update=lambda: get_store().notify_change("refresh", {}),
+    )
+    live_aggregates = shared_aggregates.live
+    daily_rollups = shared_aggregates.rollups
+    distribution_sketches = shared_aggregates.distributions
+
+
+def _apply_feed_change(change_type, document):
+    """Routes a change feed record through the store so every listener sees it."""
+    store = get_store()
+    if store.name == "cosmos":
+        # The write already happened in the container; only notify listeners.
+        store.notify_change(change_type, document)
+    elif change_type == "delete":
+        store.delete(document["id"])
+    else:
+        store.upsert(document)
+
+
+def start_change_feed():
+    """Starts the background change feed consumer selected by CHANGE_FEED."""
+    global change_feed_consumer
+    if CHANGE_FEED == "off" or change_feed_consumer is not None:
+        return None
+    store = get_store()
+    if shared_aggregates is not None and store.name == "cosmos":
+        # Only the writer process reads the feed; workers get its aggregates.
+        return None
+    source = get_change_feed_source()
+    if snapshot_header is not None:
+        # Catch up on the changes made after the snapshot was taken.
+        source.restore(snapshot_header["checkpoint"])
+
+    on_caught_up = bootstrap = None
+    if store.name == "cosmos" and getattr(source, "start_time", None) == "Now":
+        def bootstrap():
+            # The feed only has changes from now on, so the current documents
+            # come from a scan taken after pinning its position.
+            pinned = source.pin()
+            with priority(BULK):
+                for document in store.iter_items():
+                    store.notify_change("upsert", document)
+            for record in pinned:
+                _apply_feed_change(*parse_change(record))
+    if store.name == "cosmos":
+        def on_caught_up():
+            live_aggregates.ready = True
+            print(f"Live aggregates ready ({len(live_aggregates)} shipments).")
+            if daily_rollups_enabled(store):
+                daily_rollups.ready = True
+                print(f"Daily rollups ready ({daily_rollups.bucket_count()} buckets).")
+            distribution_sketches.ready = True
+            print(f"Distribution sketches ready ({len(distribution_sketches)} shipments).")
+    elif shared_aggregates is None:
+        # The in-memory store already holds every document, so bootstrap from it.
+        live_aggregates.load(store.iter_items())
+    change_feed_consumer = ChangeFeedConsumer(source, _apply_feed_change,
+                                              poll_interval=CHANGE_FEED_POLL_SECONDS,
+                                              on_caught_up=on_caught_up, bootstrap=bootstrap)
+    return change_feed_consumer.start()
+
+
+def start_snapshot_writer():
+    """Starts writing SNAPSHOT_FILE periodically for the memory/replica stores."""
+    global snapshot_writer
+    if not SNAPSHOT_FILE or snapshot_writer is not None or _snapshot_source(SHIPMENT_STORE) is None:
+        return None
+    from snapshot import SnapshotWriter
+    store = get_store()
+    if isinstance(store, LiveAggregatingStore):
+        store = store.store
+    snapshot_writer = SnapshotWriter(
+        store,
+        SNAPSHOT_FILE,
+        SNAPSHOT_INTERVAL_SECONDS,
+        version=data_version.token,
+        checkpoint=lambda: change_feed_consumer.checkpoint if change_feed_consumer else None,
+        source=_snapshot_source(SHIPMENT_STORE),
+        written_version=data_version.token() if snapshot_header is not None else None,
+    )
+    return snapshot_writer.start()
+
+
+# --- Startup and Warm-up ---
+# Importing app.py only configures it. Connecting to Cosmos DB, loading the
+# store and starting the background consumers run as timed phases on a
+# warm-up thread started by the entry points (start_warm_up()), which then requests each of WARMUP_PATHS (comma-separated,
+# the dashboard's first requests by default) so their queries have run and
+# their results are cached before traffic arrives. /healthz answers as soon
+# as the process is up; /readyz only once warm-up has finished, so an
+# orchestrator should route traffic on /readyz and restart on /healthz.
+WARMUP_PATHS = [path.strip() for path in os.getenv(
+    "WARMUP_PATHS",
+    default="/api/dashboard_summary,/api/facets,/api/unique_carriers,/api/priority_distribution_by_status,"
+            "/api/shipments",
+).split(",") if path.strip()]
+
+
+def connect_with_backoff():
+    """Connects to Cosmos DB, retrying until it succeeds."""
+    delay = 1.0
+    while connect_cosmos_db() is None:
+        print(f"Retrying the Cosmos DB connection in {delay:.0f}s.")
+        time.sleep(delay)
+        delay = min(delay * 2, COSMOS_CONNECT_MAX_BACKOFF_SECONDS)
+
+
+def read_container_metadata():
+    """
+    Reads the container properties and partition key ranges, which the SDK
+    caches, so the first queries do not pay for that metadata discovery.
+    """
+    shipments_container.read()
+    ranges = list(shipments_container.read_feed_ranges())
+    print(f"Read container metadata ({len(ranges)} partition key ranges).")
+
+
+def prime(path):
+    """Requests `path` in-process, running its queries and caching its result."""
+    response = app.test_client().get(path)
+    if response.status_code >= 400:
+        print(f"Warm-up request {path} returned {response.status_code}.")
+
+
+def warm_up_phases(serving=True):
+    """
+    The (name, function) startup phases, in order. A process that does not
+    serve requests (the multi-process writer) skips the lane index and priming.
+    """
+    phases = []
+    if SHIPMENT_STORE != "memory":
+        phases += [("connect", connect_with_backoff), ("metadata", read_container_metadata)]
+    phases += [("store", get_store), ("change_feed", start_change_feed), ("snapshot_writer", start_snapshot_writer)]
+    if shared_aggregates is not None:
+        phases.append(("shared_aggregates", shared_aggregates.start))
+    if serving:
+        phases.append(("lane_index", get_lane_index))
+        phases += [(f"prime {path}", lambda path=path: prime(path)) for path in WARMUP_PATHS]
+    return phases
+
+
+def start_warm_up():
+    """
+    Starts the warm-up thread of a serving process. Called by the entry
+    points below; another server importing `app` must call it as well.
+    """
+    return startup.start(warm_up_phases())
+
+
+
+STORE_UNAVAILABLE_ERROR = "Cosmos DB not initialized. Check configuration."
+
+
+def _with_timing(response, timing):
+    """Adds the sub-query timings of a fan-out (if one ran) as a Server-Timing header."""
+    if timing:
+        response.headers["Server-Timing"] = timing[0]
+    return response
+
+
+def _budget_exhausted(e):
+    """503 for a request shed because its RU budget ran out."""
+    response = jsonify({"error": f"The database is busy, please retry: {e}"})
+    response.headers["Retry-After"] = str(max(1, int(e.retry_after + 0.999)))
+    return response, 503
 
 
-def _build_where_clause(carrier, status, service_type):
+def _filters_from_request():
+    """Returns the carrier/status/serviceType query parameters keyed by document field."""
+    return {
+        "Carrier": request.args.get('carrier'),
+        "DeliveryStatus": request.args.get('status'),
+        "ServiceType": request.args.get('serviceType'),
+    }
+
+
+def _dashboard_summary(filters, timing=None):
+    """
+    The dashboard payload for `filters`, from the result cache; shared by
+    /api/dashboard_summary and the live update rooms. Counts and carrier
+    averages are computed by the store as aggregates, so only their rows and
+    the top 5 documents are read. The queries are independent and run
+    concurrently; their timings are appended to `timing` when one is given.
+    """
+    store = get_store()
+
+    def compute():
+        queries = dashboard_queries(store, filters, _three_months_ago_iso())
+        queries["topExpensive"] = lambda: store.top_expensive(filters, 5)
+        results = query_executor.run(queries)
+        if timing is not None:
+            timing.append(results.server_timing())
+        return build_dashboard_summary(results.results, results["topExpensive"])
+
+    return result_cache.get_or_compute("dashboard_summary", filters, compute)
+
+
+def _three_months_ago_iso():
+    """
+    ISO 8601 timestamp (matching the stored ShipmentDate format) for the first
+    midnight in the last 90 days. Shipment dates are whole days, so this
+    selects the same shipments as "now - 90 days" while staying day-aligned
+    for the daily rollups.
+    """
+    first_day = (datetime.utcnow() - timedelta(days=89)).date()
+    return first_day.isoformat() + "T00:00:00Z"
+
+
+def _date_range_from_request():
     """
-    Builds a list of WHERE clause strings based on filter parameters.
-    This helper function no longer adds the 'WHERE' keyword.
+    Returns (since, until) ShipmentDate bounds from the `from`/`to` query
+    parameters (YYYY-MM-DD, both inclusive), or (None, None) when neither is
+    given. Raises ValueError for malformed dates.
     """
-    where_clauses = []
-    if carrier:
-        where_clauses.append(f"c.Carrier = '{carrier}'")
-    if status:
-        where_clauses.append(f"c.DeliveryStatus = '{status}'")
-    if service_type:
-        where_clauses.append(f"c.ServiceType = '{service_type}'")
-    return where_clauses
+    start, end = request.args.get('from'), request.args.get('to')
+    since = datetime.strptime(start, "%Y-%m-%d").date().isoformat() + "T00:00:00Z" if start else None
+    until = next_day(datetime.strptime(end, "%Y-%m-%d").date().isoformat()) + "T00:00:00Z" if end else None
+    return since, until
 
 
 # --- API Endpoints ---
@@ -86,84 +695,41 @@ def index():
     return jsonify({"index": "index page"})
 
 
+@app.route("/healthz")
+def healthz():
+    """Liveness: 200 while the process is up, 500 once warm-up has failed (restart it)."""
+    if startup.failed:
+        return jsonify({"status": "failed", "error": startup.failed}), 500
+    return jsonify({"status": "ok", "uptimeSeconds": round(startup.elapsed(), 3)})
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: 503 until warm-up has finished and while the store is unavailable, then 200."""
+    stats = startup.stats()
+    ready = startup.ready and shipment_store is not None and shipment_store.available()
+    return jsonify(dict(stats, ready=ready)), 200 if ready else 503
+
+
 @app.route("/api/dashboard_summary")
 def get_dashboard_summary():
     """
     Unified endpoint to get all dashboard data with filters.
     Accepts: carrier, status, serviceType as query parameters.
     """
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
-
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: we join the list into a string.
-    where_string = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
 
+    filters = _filters_from_request()
     try:
-        # Step 1: Fetch all data for the given filters in one go
-        all_shipments_query = f"SELECT * FROM c{where_string}"
-        all_shipments_data = list(container.query_items(
-            query=all_shipments_query,
-            enable_cross_partition_query=True
-        ))
-
-        # If no data found, return empty metrics
-        if not all_shipments_data:
-            return jsonify({
-                "totalShipments": 0,
-                "totalDelayedShipments": 0,
-                "ordersPast3Months": 0,
-                "delayedPast3Months": 0,
-                "avgCostByCarrierData": [],
-                "top5ExpensiveShipments": []
-            })
-
-        # Step 2: Calculate all metrics from the fetched data
-
-        # a) Total shipments and total delayed
-        total_shipments = len(all_shipments_data)
-        total_delayed_shipments = sum(1 for item in all_shipments_data if item.get('DeliveryStatus') == 'Delayed')
-
-        # b) Past 3 months metrics
-        three_months_ago = datetime.utcnow() - timedelta(days=90)
-        past_3_months_shipments = [
-            item for item in all_shipments_data
-            if item.get('ShipmentDate') and datetime.fromisoformat(item['ShipmentDate'].rstrip('Z')) >= three_months_ago
-        ]
-        orders_past_3_months = len(past_3_months_shipments)
-        delayed_past_3_months = sum(1 for item in past_3_months_shipments if item.get('DeliveryStatus') == 'Delayed')
-
-        # c) Average cost by carrier
-        carrier_costs = defaultdict(lambda: {'total_cost': 0, 'count': 0})
-        for item in all_shipments_data:
-            carrier_name = item.get('Carrier')
-            cost = item.get('CostUSD')
-            if carrier_name and isinstance(cost, (int, float)):
-                carrier_costs[carrier_name]['total_cost'] += cost
-                carrier_costs[carrier_name]['count'] += 1
-        avg_cost_by_carrier_data = [
-            {"carrier": carrier_name, "averageCost": round(data['total_cost'] / data['count'], 2)}
-            for carrier_name, data in carrier_costs.items() if data['count'] > 0
-        ]
-
-        # d) Top 5 expensive shipments
-        top_5_expensive_shipments = sorted(all_shipments_data, key=lambda x: x.get('CostUSD', 0), reverse=True)[:5]
-
-        # Return all data in one response
-        return jsonify({
-            "totalShipments": total_shipments,
-            "totalDelayedShipments": total_delayed_shipments,
-            "ordersPast3Months": orders_past_3_months,
-            "delayedPast3Months": delayed_past_3_months,
-            "avgCostByCarrierData": avg_cost_by_carrier_data,
-            "top5ExpensiveShipments": top_5_expensive_shipments
-        })
-
+        timing = []
+        summary = _dashboard_summary(filters, timing)
+        return _with_timing(jsonify(summary), timing)
+    except QueryTimeout as e:
+        return jsonify({"error": f"Dashboard summary timed out: {e}"}), 504
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         print(f"Error fetching dashboard summary: {e}")
         return jsonify({"error": f"Failed to query dashboard summary: {e}"}), 500
@@ -171,45 +737,25 @@ def get_dashboard_summary():
 
 @app.route("/api/average_shipment_by_carrier")
 def average_shipment_by_carrier():
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
-
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: properly join the list and prefix 'WHERE'
-    where_string = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-
-    # Correct the query to prevent a second WHERE clause
-    query = f"SELECT c.Carrier, c.CostUSD FROM c{where_string} WHERE IS_DEFINED(c.Carrier) AND IS_DEFINED(c.CostUSD)"
-    # The previous line had a bug. It would create a double WHERE.
-    # The correct way is to add these conditions to the list before building the string.
-    where_clauses.extend(["IS_DEFINED(c.Carrier)", "IS_DEFINED(c.CostUSD)"])
-    where_string = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-    query = f"SELECT c.Carrier, c.CostUSD FROM c{where_string}"
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
 
+    filters = _filters_from_request()
     try:
-        all_shipments_data = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-
-        carrier_costs = defaultdict(lambda: {'total_cost': 0, 'count': 0})
-        for item in all_shipments_data:
-            carrier_name = item.get('Carrier')
-            cost = item.get('CostUSD')
-            if carrier_name and isinstance(cost, (int, float)):
-                carrier_costs[carrier_name]['total_cost'] += cost
-                carrier_costs[carrier_name]['count'] += 1
+        rows = result_cache.get_or_compute("average_shipment_by_carrier", filters,
+                                           lambda: store.aggregate(carrier_cost_plan(filters)))
 
         results = []
-        for carrier_name, data in carrier_costs.items():
-            if data['count'] > 0:
+        for row in rows:
+            carrier_name = row.get('Carrier')
+            count = row.get('ShipmentCount') or 0
+            if not carrier_name:
+                continue
+            if count > 0:
                 results.append({
                     "Carrier": carrier_name,
-                    "AverageCost": round(data['total_cost'] / data['count'], 2)
+                    "AverageCost": round((row.get('TotalCost') or 0) / count, 2)
                 })
             else:
                 results.append({
@@ -218,36 +764,30 @@ def average_shipment_by_carrier():
                 })
         results.sort(key=lambda x: x['Carrier'])
         return jsonify(results)
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         return jsonify({"error": f"Failed to query and process average shipment cost by carrier: {e}"}), 500
 
 
 @app.route('/api/delayed_last_3_months')
 def get_delayed_last_3_months():
-    container = initialize_cosmos_db()
-    if not container:
+    store = get_store()
+    if not store.available():
         return jsonify({"error": "cosmos db not initialized. check configuration."}), 500
 
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: append to the list, then join.
-    where_clauses.append("c.DeliveryStatus = 'Delayed'")
-
-    three_months_ago = datetime.utcnow() - timedelta(days=90)
-    three_months_ago_iso = three_months_ago.isoformat(timespec='seconds') + "Z"
-    where_clauses.append(f"c.ShipmentDate >= '{three_months_ago_iso}'")
-
-    where_string = " WHERE " + " AND ".join(where_clauses)
-    query = f"select value count(1) from c{where_string}"
-
+    filters = narrow_filters(_filters_from_request(), "DeliveryStatus", "Delayed")
     try:
-        count = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))[0]
+        since, until = _date_range_from_request()
+    except ValueError:
+        return jsonify({"error": "from and to must be dates in YYYY-MM-DD format."}), 400
+    try:
+        count = result_cache.get_or_compute("delayed_last_3_months", filters,
+                                            lambda: store.count(filters, since=since or _three_months_ago_iso(),
+                                                                until=until), since, until)
         return jsonify({"count": count})
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         print(f"error querying delayed shipments past 3 months: {e}")
         return jsonify({"error": f"failed to query delayed shipments past 3 months: {e}"}), 500
@@ -255,28 +795,22 @@ def get_delayed_last_3_months():
 
 @app.route('/api/orders_last_3_months')
 def get_orders_last_3_months():
-    container = initialize_cosmos_db()
-    if not container:
+    store = get_store()
+    if not store.available():
         return jsonify({"error": "cosmos db not initialized. check configuration."}), 500
 
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-
-    three_months_ago = datetime.utcnow() - timedelta(days=90)
-    three_months_ago_iso = three_months_ago.isoformat(timespec='seconds') + "Z"
-    where_clauses.append(f"c.ShipmentDate >= '{three_months_ago_iso}'")
-
-    where_string = " WHERE " + " AND ".join(where_clauses)
-    query = f"select value count(1) from c{where_string}"
-
+    filters = _filters_from_request()
+    try:
+        since, until = _date_range_from_request()
+    except ValueError:
+        return jsonify({"error": "from and to must be dates in YYYY-MM-DD format."}), 400
     try:
-        count = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))[0]
+        count = result_cache.get_or_compute("orders_last_3_months", filters,
+                                            lambda: store.count(filters, since=since or _three_months_ago_iso(),
+                                                                until=until), since, until)
         return jsonify({"count": count})
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         print(f"error querying shipments from the past 3 months: {e}")
         return jsonify({"error": f"failed to query shipments from the past 3 months: {e}"}), 500
@@ -284,50 +818,32 @@ def get_orders_last_3_months():
 
 @app.route('/api/total_delayed')
 def get_total_delayed():
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
-
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: append to the list, then join.
-    where_clauses.append("c.DeliveryStatus = 'Delayed'")
-    where_string = " WHERE " + " AND ".join(where_clauses)
-
-    query = f"SELECT VALUE COUNT(1) FROM c{where_string}"
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    filters = narrow_filters(_filters_from_request(), "DeliveryStatus", "Delayed")
     try:
-        count = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))[0]
+        count = result_cache.get_or_compute("total_delayed", filters, lambda: store.count(filters))
         return jsonify({"count": count})
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         return jsonify({"error": f"Failed to query delayed shipments: {e}"}), 500
 
 
 @app.route('/api/top_5_expensive')
 def get_top_5_expensive():
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
-
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: join the list into a string
-    where_string = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-
-    # This is the optimal query for 'Top 5 expensive'
-    query = f"SELECT TOP 5 * FROM c{where_string} ORDER BY c.CostUSD DESC"
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    filters = _filters_from_request()
     try:
-        items = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
+        items = result_cache.get_or_compute("top_5_expensive", filters, lambda: store.top_expensive(filters, 5))
         return jsonify(items)
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         return jsonify({"error": f"Failed to query top 5 expensive shipments: {e}"}), 500
 
@@ -335,115 +851,195 @@ def get_top_5_expensive():
 # Unmodified endpoints for uniqueness and table
 @app.route('/api/unique_carriers')
 def get_unique_carriers():
-    container = initialize_cosmos_db()
-    if not container:
+    store = get_store()
+    if not store.available():
         return jsonify({"error": "cosmos db not initialized. check configuration."}), 500
 
-    query = "select distinct value c.Carrier from c where is_defined(c.Carrier)"
     try:
-        carriers = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-        carriers = [c for c in carriers if c and isinstance(c, str)]
-        carriers.sort()
+        carriers = result_cache.get_or_compute("unique_carriers", {}, lambda: sorted(store.distinct("Carrier")))
         return jsonify(carriers)
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         print(f"error querying unique carriers: {e}")
         return jsonify({"error": f"failed to query unique carriers: {e}"}), 500
 
 
+@app.route('/api/facets')
+def get_facets():
+    """
+    Distinct Carrier, DeliveryStatus, ServiceType and Priority values with
+    shipment counts for the carrier/status/serviceType/priority filters.
+    Each field's counts ignore that field's own filter.
+    """
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    filters = _filters_from_request()
+    filters["Priority"] = request.args.get('priority')
+
+    def compute_cube():
+        # One grouped pass serves every filter combination. The live
+        # aggregates answer it when maintained; the daily rollups cannot,
+        # since they leave out shipments without a ShipmentDate.
+        return store.aggregate(facet_cube_plan())
+
+    try:
+        cube = result_cache.get_or_compute("facets", {}, compute_cube)
+        return jsonify(facet_counts(cube, filters))
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
+    except Exception as e:
+        print(f"error querying facets: {e}")
+        return jsonify({"error": f"failed to query facets: {e}"}), 500
+
+
 @app.route('/api/shipments')
 def get_shipments_table():
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
+    """
+    One page of the shipments table. Pass the `nextCursor` from the previous
+    response as `cursor` to fetch the following page with a keyset query;
+    `page` alone falls back to OFFSET paging (used when jumping to a page).
+    """
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
 
     page = int(request.args.get('page', 1))
     limit = int(request.args.get('limit', 10))
     offset = (page - 1) * limit
+    cursor = request.args.get('cursor')
 
     # get filter parameters
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
+    filters = _filters_from_request()
+    # cursors are tied to the search text, not to the place names it resolves to
+    cursor_filters = dict(filters, origin=request.args.get('origin'), destination=request.args.get('destination'),
+                          match=request.args.get('match'))
 
     # get sort parameters from frontend request
     sort_by = request.args.get('sortBy')
     sort_order = request.args.get('sortOrder')
+    if sort_by and sort_by not in SORTABLE_COLUMNS:
+        print(f"warning: invalid sort_by column requested: {sort_by}")
+        sort_by = None
+    sort_field, direction = sort_spec(sort_by, sort_order)
 
-    # build where clause
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    where_string = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-
-    # build order by clause
-    order_by_string = ""
-    if sort_by:
-        allowed_sort_columns = [
-            "ShipmentID", "Origin", "Destination", "Carrier", "DeliveryStatus",
-            "ServiceType", "WeightKG", "CostUSD", "ShipmentDate", "DeliveryDate", "Priority"
-        ]
-        if sort_by in allowed_sort_columns:
-            order_direction = "asc" if sort_order == "asc" else "desc"
-            order_by_string = f" order by c.{sort_by} {order_direction}"
-        else:
-            print(f"warning: invalid sort_by column requested: {sort_by}")
-
-    # construct the full query
-    query = f"select * from c{where_string}{order_by_string} offset {offset} limit {limit}"
-    count_query = f"select value count(1) from c{where_string}"
     try:
-        shipments = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
+        after = decode_cursor(cursor, sort_field, direction, cursor_filters) if cursor else None
+    except InvalidCursor as e:
+        return jsonify({"error": f"invalid cursor: {e}"}), 400
 
-        total_count = list(container.query_items(
-            query=count_query,
-            enable_cross_partition_query=True
-        ))[0]
+    try:
+        lane_filters = _lane_filters_from_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
+    if lane_filters is None:
+        return jsonify({"shipments": [], "totalCount": 0, "nextCursor": None})
+    filters.update(lane_filters)
 
-        return jsonify({"shipments": shipments, "totalCount": total_count})
+    try:
+        if cursor or offset == 0:
+            page_query = lambda: store.page_after(filters, sort_by, sort_order, after, limit)
+        else:
+            page_query = lambda: store.page(filters, sort_by, sort_order, offset, limit)
+        # The total only depends on the filters, so it is cached rather than
+        # recounted for every page. On a miss it runs alongside the page query.
+        results = query_executor.run({
+            "page": page_query,
+            "count": lambda: result_cache.get_or_compute("shipments_count", filters, lambda: store.count(filters)),
+        })
+        shipments, total_count = results["page"], results["count"]
+
+        next_cursor = None
+        if len(shipments) == limit:
+            next_cursor = encode_cursor(shipments[-1], sort_field, direction, cursor_filters)
+        response = jsonify({"shipments": shipments, "totalCount": total_count, "nextCursor": next_cursor})
+        return _with_timing(response, [results.server_timing()])
+    except QueryTimeout as e:
+        return jsonify({"error": f"shipments query timed out: {e}"}), 504
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         print(f"error querying shipments: {e}")
         return jsonify({"error": f"failed to query shipments: {e}"}), 500
 
 
-@app.route('/api/priority_distribution_by_status')
-def get_priority_distribution_by_status():
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
+@app.route('/api/export')
+def export_shipments():
+    """
+    Streams every shipment matching the carrier/status/serviceType/priority
+    filters and origin/destination search, in sortBy/sortOrder order, as
+    `format`=csv (default) or ndjson.
+    Runs on the bulk RU budget and never holds more than one page in memory.
+    """
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be 'csv' or 'ndjson'."}), 400
+    filters = _filters_from_request()
+    filters["Priority"] = request.args.get('priority')
+    sort_by = request.args.get('sortBy')
+    if sort_by and sort_by not in SORTABLE_COLUMNS:
+        sort_by = None
+    sort_order = request.args.get('sortOrder')
+    try:
+        lane_filters = _lane_filters_from_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
+    if lane_filters is None:
+        # Nothing matches the search: export just the header.
+        documents = iter(())
+    else:
+        documents = store.iter_sorted(dict(filters, **lane_filters), sort_by, sort_order, fields=EXPORT_FIELDS)
+
+    source = iter_with_priority(documents, BULK)
+    try:
+        # Fetch the first page before answering, so a failure still gets a proper status.
+        first = next(source, None)
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
+    except Exception as e:
+        print(f"error exporting shipments: {e}")
+        return jsonify({"error": f"failed to export shipments: {e}"}), 500
+
+    documents = itertools.chain([first], source) if first is not None else source
+    filename = f"shipments.{export_format}"
+    return Response(
+        stream_export(documents, export_format, on_close=source.close),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: append to the list, then join.
-    where_clauses.extend(["IS_DEFINED(c.DeliveryStatus)", "IS_DEFINED(c.Priority)"])
-    where_string = " WHERE " + " AND ".join(where_clauses)
 
-    query = f"SELECT c.DeliveryStatus, c.Priority FROM c{where_string}"
+@app.route('/api/priority_distribution_by_status')
+def get_priority_distribution_by_status():
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
 
+    filters = _filters_from_request()
     try:
-        all_shipments_data = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-
-        distribution_counts = defaultdict(int)
-        for item in all_shipments_data:
-            status_item = item.get('DeliveryStatus')
-            priority = item.get('Priority')
-            if status_item and priority:
-                distribution_counts[(status_item, priority)] += 1
+        rows = result_cache.get_or_compute("priority_distribution_by_status", filters,
+                                           lambda: store.aggregate(priority_status_plan(filters)))
 
         results = []
-        for (status_item, priority), count in distribution_counts.items():
+        for row in rows:
+            status_item = row.get('DeliveryStatus')
+            priority = row.get('Priority')
+            if not (status_item and priority):
+                continue
             results.append({
                 "DeliveryStatus": status_item,
                 "Priority": priority,
-                "Count": count
+                "Count": row.get('ShipmentCount', 0)
             })
 
         status_order = {
@@ -458,35 +1054,155 @@ def get_priority_distribution_by_status():
             priority_order.get(x['Priority'], 99)
         ))
         return jsonify(results)
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         return jsonify({"error": f"Failed to query and process priority distribution: {e}"}), 500
 
 
 @app.route('/api/weight_cost_express_correlation')
 def get_weight_cost_express_correlation():
-    container = initialize_cosmos_db()
-    if not container:
-        return jsonify({"error": "Cosmos DB not initialized. Check configuration."}), 500
-
-    carrier = request.args.get('carrier')
-    status = request.args.get('status')
-    service_type = request.args.get('serviceType')
-    where_clauses = _build_where_clause(carrier, status, service_type)
-    # The fix is here: append to the list, then join.
-    where_clauses.append("c.ServiceType = 'Express'")
-    where_string = " WHERE " + " AND ".join(where_clauses)
-
-    query = f"SELECT c.WeightKG, c.CostUSD FROM c{where_string}"
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    filters = narrow_filters(_filters_from_request(), "ServiceType", "Express")
+    # mode=bins returns a 2D histogram, mode=sample a stratified sample; both
+    # include regression/correlation stats. Without mode every point is returned.
+    mode = request.args.get('mode')
+    if mode not in (None, "bins", "sample"):
+        return jsonify({"error": "mode must be 'bins' or 'sample'."}), 400
     try:
-        items = list(container.query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
+        bins = min(max(int(request.args.get('bins', DEFAULT_BINS)), 1), MAX_BINS)
+        sample_size = min(max(int(request.args.get('limit', DEFAULT_SAMPLE_SIZE)), 1), MAX_SAMPLE_SIZE)
+    except ValueError:
+        return jsonify({"error": "bins and limit must be integers."}), 400
+    # Part of the cache key: parameters the mode ignores must not split its entries.
+    if mode != "bins":
+        bins = None
+    if mode != "sample":
+        sample_size = None
+
+    def compute():
+        # Scans every Express shipment, so it runs on the bulk RU budget.
+        with priority(BULK):
+            if mode is None:
+                if filters is None:
+                    return []
+                return list(store.iter_items(filters, fields=("WeightKG", "CostUSD")))
+            return summarize(store, filters, mode, bins=bins, sample_size=sample_size)
+
+    try:
+        items = result_cache.get_or_compute("weight_cost_express_correlation", filters, compute,
+                                            mode, bins, sample_size)
         return jsonify(items)
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
     except Exception as e:
         return jsonify({"error": f"Failed to query weight-cost correlation for Express: {e}"}), 500
 
 
+@app.route('/api/rollups')
+def get_rollups():
+    """
+    Shipment count, cost, weight and delivery-time totals for a `from`/`to`
+    date range (YYYY-MM-DD, inclusive; default: all dates), grouped by the
+    comma-separated `groupBy` fields (day, Carrier, DeliveryStatus,
+    ServiceType, Priority). Answered from the daily rollups when enabled.
+    """
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    filters = _filters_from_request()
+    filters["Priority"] = request.args.get('priority')
+    group_by = tuple(field for field in request.args.get('groupBy', '').split(',') if field)
+    try:
+        since, until = _date_range_from_request()
+    except ValueError:
+        return jsonify({"error": "from and to must be dates in YYYY-MM-DD format."}), 400
+    start_day = since[:10] if since else None
+    end_day = request.args.get('to')
+
+    def compute():
+        if daily_rollups.ready:
+            return daily_rollups.query(start_day, end_day, filters, group_by)
+        # Rollups are off (or still loading): build a temporary one from a scan.
+        scanned = DailyRollups()
+        with priority(BULK):
+            for document in store.iter_items(filters, fields=ROLLUP_FIELDS):
+                scanned.apply("upsert", document)
+        return scanned.query(start_day, end_day, filters, group_by)
+
+    try:
+        rows = result_cache.get_or_compute("rollups", filters, compute, start_day, end_day, group_by)
+        return jsonify(rows)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
+    except Exception as e:
+        print(f"error querying rollups: {e}")
+        return jsonify({"error": f"failed to query rollups: {e}"}), 500
+
+
+@app.route('/api/cost_distribution')
+def get_cost_distribution():
+    """
+    p50/p90/p99, min/max and a histogram of CostUSD, WeightKG and delivery
+    days (DeliveryDate - ShipmentDate) per `groupBy` value (Carrier,
+    ServiceType or Priority; default: one group for everything), filtered by
+    carrier, status, serviceType and priority. `bins` sets the histogram
+    resolution. Merged from the distribution sketches when they are kept.
+    """
+    store = get_store()
+    if not store.available():
+        return jsonify({"error": STORE_UNAVAILABLE_ERROR}), 500
+
+    filters = _filters_from_request()
+    filters["Priority"] = request.args.get('priority')
+    group_by = request.args.get('groupBy') or None
+    if group_by is not None and group_by not in GROUP_FIELDS:
+        return jsonify({"error": f"groupBy must be one of: {', '.join(GROUP_FIELDS)}."}), 400
+    try:
+        bins = min(max(int(request.args.get('bins', DISTRIBUTION_BINS)), 1), MAX_DISTRIBUTION_BINS)
+    except ValueError:
+        return jsonify({"error": "bins must be an integer."}), 400
+
+    def compute():
+        if distribution_sketches.ready:
+            return distribution_sketches.query(filters, group_by, bins)
+        # Sketches are not kept (or still loading): build temporary ones from a scan.
+        scanned = DistributionSketches()
+        with priority(BULK):
+            scanned.load(store.iter_items(filters, fields=DISTRIBUTION_FIELDS))
+        return scanned.query(filters, group_by, bins)
+
+    try:
+        groups = result_cache.get_or_compute("cost_distribution", filters, compute, group_by, bins)
+        return jsonify({"groupBy": group_by, "groups": groups})
+    except BudgetExhausted as e:
+        return _budget_exhausted(e)
+    except Exception as e:
+        print(f"error querying cost distribution: {e}")
+        return jsonify({"error": f"failed to query cost distribution: {e}"}), 500
+
+
+@app.route('/api/cache_stats')
+def get_cache_stats():
+    return jsonify(dict(result_cache.stats(), queryExecutor=query_executor.stats(), querySpecs=spec_cache_stats(),
+                        responses=response_layer.stats(), singleFlight=single_flight.stats(),
+                        ruBudget=budget.stats(),
+                        snapshot=snapshot_writer.stats() if snapshot_writer else None,
+                        sharedAggregates=shared_aggregates.stats() if shared_aggregates else None,
+                        laneIndex=lane_index.stats(), startup=startup.stats()))
+
+
+@app.route('/api/live_update_stats')
+def get_live_update_stats():
+    return jsonify(dashboard_subscriptions.stats())
+
+
 # --- Socket Events ---
 
 @socketio.on('connect')
@@ -512,11 +1228,120 @@ def demo_task():
     print("Running a simulated background task...")
 
 
+@socketio.on("subscribe", namespace=LIVE_UPDATES_NAMESPACE)
+def subscribe_dashboard(data):
+    """
+    Subscribes this client to live dashboard updates for a filter set
+    ({carrier, status, serviceType}; missing or "All" means no filter).
+    Replies with a 'dashboard_snapshot' and later pushes 'dashboard_delta'.
+    """
+    global live_updates_task
+    store = get_store()
+    if not store.available():
+        emit("dashboard_error", {"error": STORE_UNAVAILABLE_ERROR})
+        return
+    data = data or {}
+    filters = {
+        field: value if value != "All" else None
+        for field, value in (("Carrier", data.get("carrier")),
+                             ("DeliveryStatus", data.get("status")),
+                             ("ServiceType", data.get("serviceType")))
+    }
+    previous_room = dashboard_subscriptions.unsubscribe(request.sid)
+    if previous_room:
+        leave_room(previous_room)
+    try:
+        room, snapshot = dashboard_subscriptions.subscribe(request.sid, filters)
+    except Exception as e:
+        print(f"Error subscribing to dashboard updates: {e}")
+        emit("dashboard_error", {"error": f"Failed to subscribe: {e}"})
+        return
+    join_room(room)
+    emit("dashboard_snapshot", snapshot)
+    with live_updates_lock:
+        if live_updates_task is None:
+            live_updates_task = socketio.start_background_task(target=dashboard_subscriptions.run)
+
+
+@socketio.on("unsubscribe", namespace=LIVE_UPDATES_NAMESPACE)
+def unsubscribe_dashboard(data=None):
+    room = dashboard_subscriptions.unsubscribe(request.sid)
+    if room:
+        leave_room(room)
+
+
+@socketio.on("disconnect", namespace=LIVE_UPDATES_NAMESPACE)
+def disconnect_dashboard():
+    dashboard_subscriptions.unsubscribe(request.sid)
+
+
+
+def serve_worker(listener):
+    """Worker process entry point: serves requests accepted on the writer's listening socket."""
+    from werkzeug.serving import make_server
+    host, port = listener.getsockname()[:2]
+    print(f"Worker {os.getpid()} serving on {host}:{port}.")
+    start_warm_up()
+    make_server(host, port, app, threaded=True, fd=listener.fileno()).serve_forever()
+
+
+def serve_workers(workers, host, port):
+    """
+    Runs this process as the aggregate writer and `workers` worker processes
+    (see Multi-Process Serving). Socket.IO sessions live in one worker, so
+    clients must use the websocket transport (the dashboard tries it first).
+    """
+    import multiprocessing
+    import socket
+    global aggregate_publisher
+    # The writer serves no requests, so it warms up before anything else
+    # (a replica store needs the connection before it can be loaded).
+    startup.run(warm_up_phases(serving=False))
+    if not startup.ready:
+        return
+    store = get_store()
+    segment = AggregateSegment(size=SHARED_AGGREGATES_BYTES, create=True)
+    aggregate_publisher = AggregatePublisher(segment, live_aggregates, daily_rollups, distribution_sketches)
+    store.add_change_listener(aggregate_publisher.on_change)
+    aggregate_publisher.start()
+
+    listener = socket.create_server((host, port), backlog=128)
+    # Workers are started fresh (not forked) and read this to become readers.
+    os.environ["SHARED_AGGREGATES_SEGMENT"] = segment.name
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=serve_worker, args=(listener,), name=f"worker-{number}")
+                 for number in range(workers)]
+    for process in processes:
+        process.start()
+    print(f"Serving on {host}:{port} with {workers} workers; aggregates in segment {segment.name}.")
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        aggregate_publisher.stop(timeout=1)
+        segment.close()
+
+
+startup.mark("configuration")
+
+
 # --- Main Run Block ---
 if __name__ == "__main__":
-    socketio.run(
-        app,
-        port=int(os.getenv("PORT", default=5000)),
-        debug=os.getenv("FLASK_DEBUG", default="True").lower() == "true",
-        allow_unsafe_werkzeug=True
-    )
+    if SERVE_WORKERS > 1:
+        serve_workers(SERVE_WORKERS, os.getenv("HOST", default="127.0.0.1"), int(os.getenv("PORT", default=5000)))
+    else:
+        debug = os.getenv("FLASK_DEBUG", default="True").lower() == "true"
+        # With the reloader, this process only watches files; the child it
+        # starts (WERKZEUG_RUN_MAIN set) serves, so only that one warms up.
+        if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_warm_up()
+        socketio.run(
+            app,
+            port=int(os.getenv("PORT", default=5000)),
+            debug=debug,
+            allow_unsafe_werkzeug=True
+        )
@@ -0,0 +1,221 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import generate_shipments
+from bulk_import import BulkImporter, FakeThrottlingContainer
+from ingest_pipeline import convert_chunk, read_chunks, run_pipeline
+
+DEFAULT_ROWS = 100000
+DEFAULT_REPEAT = 20
+
+# Requests driven against every route: (label, path with query string).
+# Routes missing from this list are still benchmarked with no parameters.
+BENCHMARK_REQUESTS = [
+    ("dashboard_summary", "/api/dashboard_summary"),
+    ("dashboard_summary carrier", "/api/dashboard_summary?carrier=UPS"),
+    ("dashboard_summary carrier+status", "/api/dashboard_summary?carrier=DHL&status=Delayed"),
+    ("average_shipment_by_carrier", "/api/average_shipment_by_carrier"),
+    ("delayed_last_3_months", "/api/delayed_last_3_months"),
+    ("orders_last_3_months", "/api/orders_last_3_months"),
+    ("orders_last_3_months range", "/api/orders_last_3_months?from=2024-01-01&to=2024-12-31"),
+    ("total_delayed", "/api/total_delayed?serviceType=Express"),
+    ("top_5_expensive", "/api/top_5_expensive"),
+    ("unique_carriers", "/api/unique_carriers"),
+    ("shipments first page", "/api/shipments?limit=50&sortBy=CostUSD&sortOrder=desc"),
+    ("shipments deep offset", "/api/shipments?page=200&limit=50&sortBy=ShipmentDate&sortOrder=asc"),
+    ("shipments filtered", "/api/shipments?carrier=FedEx&status=Delivered&limit=50&sortBy=WeightKG"),
+    ("priority_distribution_by_status", "/api/priority_distribution_by_status"),
+    ("weight_cost_express_correlation", "/api/weight_cost_express_correlation"),
+    ("weight_cost_express_correlation bins", "/api/weight_cost_express_correlation?mode=bins"),
+    ("weight_cost_express_correlation sample", "/api/weight_cost_express_correlation?mode=sample"),
+    ("rollups by carrier", "/api/rollups?from=2024-01-01&to=2025-06-30&groupBy=Carrier"),
+    ("rollups by day", "/api/rollups?from=2025-01-01&to=2025-03-31&groupBy=day"),
+]
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def latency_summary(samples, elapsed):
+    milliseconds = np.array(samples) * 1000
+    return {
+        "requests": len(samples),
+        "p50Ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p95Ms": round(float(np.percentile(milliseconds, 95)), 3),
+        "p99Ms": round(float(np.percentile(milliseconds, 99)), 3),
+        "maxMs": round(float(milliseconds.max()), 3),
+        "throughputPerSecond": round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Phases ---
+
+def benchmark_generate(csv_path, rows, seed):
+    start = time.perf_counter()
+    generate_shipments.write_csv(csv_path, rows, seed)
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(elapsed, 3), "rowsPerSecond": round(rows / elapsed, 1),
+            "peakMemoryMB": peak_memory_mb()}
+
+
+def benchmark_import(csv_path, rows, workers):
+    """Runs the chunked importer into an unthrottled in-memory container."""
+    container = FakeThrottlingContainer(ru_per_second=1e12, latency=0)
+
+    def write_chunk(documents):
+        BulkImporter(container, max_workers=workers, initial_concurrency=workers,
+                     progress_every=0).import_items(documents)
+
+    start = time.perf_counter()
+    run_pipeline(csv_path, write_chunk)
+    elapsed = time.perf_counter() - start
+    return {"rows": len(container.items), "seconds": round(elapsed, 3),
+            "rowsPerSecond": round(rows / elapsed, 1), "peakMemoryMB": peak_memory_mb()}
+
+
+def write_ndjson(csv_path, ndjson_path):
+    """Converts the CSV into the NDJSON documents the memory store loads."""
+    with open(ndjson_path, 'w', encoding='utf-8') as f:
+        for header, chunk_rows, _, _ in read_chunks(csv_path):
+            documents, _ = convert_chunk(header, chunk_rows)
+            f.writelines(json.dumps(document) + "\n" for document in documents)
+
+
+def load_app(ndjson_path):
+    """Imports app.py against a memory store loaded from `ndjson_path` and waits for its warm-up."""
+    os.environ["SHIPMENT_STORE"] = "memory"
+    os.environ["SHIPMENT_DATA_FILE"] = ndjson_path
+    start = time.perf_counter()
+    import app as api
+    api.startup.run(api.warm_up_phases())
+    return api, {"seconds": round(time.perf_counter() - start, 3), "peakMemoryMB": peak_memory_mb(),
+                 "phases": api.startup.stats()["phases"]}
+
+
+def benchmark_routes(api, repeat, concurrency, warm_cache):
+    """Requests every route `repeat` times; returns {label: latency summary}."""
+    client = api.app.test_client()
+    requests = list(BENCHMARK_REQUESTS)
+    covered = {path.split("?")[0] for _, path in requests}
+    for rule in api.app.url_map.iter_rules():
+        if rule.rule.startswith("/api/") and "GET" in rule.methods and rule.rule not in covered:
+            requests.append((rule.rule[len("/api/"):], rule.rule))
+
+    def timed_get(path):
+        if not warm_cache:
+            api.result_cache.invalidate()
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return elapsed
+
+    results = {}
+    for label, path in requests:
+        timed_get(path)  # warm-up
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = list(pool.map(timed_get, [path] * repeat))
+        else:
+            samples = [timed_get(path) for _ in range(repeat)]
+        results[label] = dict(latency_summary(samples, time.perf_counter() - start), path=path)
+        print(f"{label:45s} p50 {results[label]['p50Ms']:9.2f} ms  p95 {results[label]['p95Ms']:9.2f} ms  "
+              f"p99 {results[label]['p99Ms']:9.2f} ms")
+    return results
+
+
+def compare(current, baseline, threshold=0.2):
+    """Prints routes whose p95 moved by more than `threshold` against a previous run."""
+    regressions = 0
+    for label, result in current["routes"].items():
+        previous = baseline.get("routes", {}).get(label)
+        if not previous or not previous.get("p95Ms"):
+            continue
+        change = result["p95Ms"] / previous["p95Ms"] - 1
+        if abs(change) >= threshold:
+            kind = "slower" if change > 0 else "faster"
+            regressions += change > 0
+            print(f"{label}: p95 {previous['p95Ms']} -> {result['p95Ms']} ms ({change:+.0%}, {kind})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the importer and every /api route on a local store.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--seed", type=int, default=generate_shipments.DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel clients per route")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="keep the result cache between requests (default: measure uncached)")
+    parser.add_argument("--import-workers", type=int, default=8)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = os.path.join(work_dir, "shipments.csv")
+        ndjson_path = os.path.join(work_dir, "shipments.ndjson")
+
+        print(f"Generating {args.rows} shipments...")
+        generate = benchmark_generate(csv_path, args.rows, args.seed)
+        print("Benchmarking the chunked importer...")
+        importer = benchmark_import(csv_path, args.rows, args.import_workers)
+        write_ndjson(csv_path, ndjson_path)
+        print("Loading the API on the memory store...")
+        api, startup = load_app(ndjson_path)
+        print("Benchmarking routes...")
+        routes = benchmark_routes(api, args.repeat, args.concurrency, args.warm_cache)
+
+    results = {
+        "meta": {
+            "rows": args.rows,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "concurrency": args.concurrency,
+            "warmCache": args.warm_cache,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "generate": generate,
+        "import": importer,
+        "startup": startup,
+        "routes": routes,
+        "peakMemoryMB": peak_memory_mb(),
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nImport: {importer['rowsPerSecond']} rows/s. Peak memory: {results['peakMemoryMB']} MB.")
+    print(f"Results written to {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            slower = compare(results, json.load(f))
+        sys.exit(1 if slower else 0)
@@ -0,0 +1,296 @@
+# bulk_import.py
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+THROTTLED_STATUS_CODE = 429
+# Fallback wait when a 429 response carries no retry-after hint.
+DEFAULT_RETRY_AFTER_MS = 100
+
+
+def retry_after_seconds(error):
+    headers = getattr(error, 'headers', None) or {}
+    retry_after_ms = headers.get('x-ms-retry-after-ms') or DEFAULT_RETRY_AFTER_MS
+    return float(retry_after_ms) / 1000.0
+
+
+def is_throttled(error):
+    return getattr(error, 'status_code', None) == THROTTLED_STATUS_CODE
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted by additive-increase / multiplicative-decrease:
+    every throttled request halves the limit, every `increase_after`
+    consecutive successes raise it by one, within [min_limit, max_limit].
+    """
+
+    def __init__(self, initial, min_limit=1, max_limit=64, increase_after=20):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttle(self):
+        with self._condition:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+
+    def cap(self, limit):
+        """Lowers the limit to at most `limit` (used by the RU budget)."""
+        with self._condition:
+            self.limit = max(self.min_limit, min(self.limit, limit))
+
+
+class RUMeter:
+    """Request units consumed over a sliding one-second window."""
+
+    def __init__(self, window=1.0, clock=time.monotonic):
+        self.window = window
+        self._clock = clock
+        self._charges = deque()
+        self._lock = threading.Lock()
+        self.total = 0.0
+
+    def record(self, charge):
+        now = self._clock()
+        with self._lock:
+            self._charges.append((now, charge))
+            self.total += charge
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._charges and self._charges[0][0] <= now - self.window:
+            self._charges.popleft()
+
+    def rate(self):
+        with self._lock:
+            self._trim(self._clock())
+            return sum(charge for _, charge in self._charges) / self.window
+
+
+class BulkImportReport:
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.throttled = 0
+        self.retries = 0
+        self.request_units = 0.0
+        self.duration = 0.0
+        self.final_concurrency = 0
+        self.errors = []
+
+    @property
+    def rows_per_second(self):
+        return self.succeeded / self.duration if self.duration else 0.0
+
+    @property
+    def ru_per_second(self):
+        return self.request_units / self.duration if self.duration else 0.0
+
+    def as_dict(self):
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "requestUnits": round(self.request_units, 2),
+            "durationSeconds": round(self.duration, 3),
+            "rowsPerSecond": round(self.rows_per_second, 1),
+            "ruPerSecond": round(self.ru_per_second, 1),
+            "finalConcurrency": self.final_concurrency,
+        }
+
+    def print_summary(self):
+        print("\n--- Bulk Import Summary ---")
+        print(f"Total items upserted: {self.succeeded}")
+        print(f"Total items failed: {self.failed}")
+        print(f"Throttled responses (429): {self.throttled}, retries: {self.retries}")
+        print(f"Total duration: {self.duration:.2f} seconds")
+        print(f"Throughput: {self.rows_per_second:.1f} rows/s, {self.ru_per_second:.1f} RU/s "
+              f"({self.request_units:.0f} RU total)")
+        print(f"Final concurrency: {self.final_concurrency}")
+
+
+class BulkImporter:
+    """
+    Upserts documents from a bounded pool of worker threads.
+
+    Upserts are idempotent (keyed on id / ShipmentID), so a rerun after a
+    failure never creates duplicates. Throttled (429) writes are retried after
+    the server's x-ms-retry-after-ms hint, and the number of in-flight writes
+    adapts to throttling and to the optional `ru_budget` (RU/s) target.
+    """
+
+    def __init__(self, container, max_workers=16, initial_concurrency=4, ru_budget=None,
+                 max_retries=20, progress_every=1000):
+        self.container = container
+        self.max_workers = max_workers
+        self.ru_budget = ru_budget
+        self.max_retries = max_retries
+        self.progress_every = progress_every
+        self.limiter = AdaptiveLimiter(initial_concurrency, max_limit=max_workers)
+        self.meter = RUMeter()
+        self.report = BulkImportReport()
+        self._lock = threading.Lock()
+        # A 429 pauses every worker, not just the throttled one, until the
+        # server's retry-after has elapsed.
+        self._resume_at = 0.0
+
+    def _upsert_once(self, item):
+        charges = []
+
+        def capture_charge(headers, _):
+            charges.append(float(headers.get('x-ms-request-charge', 0) or 0))
+
+        self.container.upsert_item(body=item, response_hook=capture_charge)
+        return sum(charges)
+
+    def _wait_for_backoff(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _back_off(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _respect_budget(self):
+        if not self.ru_budget:
+            return
+        rate = self.meter.rate()
+        if rate > self.ru_budget:
+            # Over budget: shrink concurrency proportionally and let the window drain.
+            self.limiter.cap(max(1, int(self.limiter.limit * self.ru_budget / rate)))
+            time.sleep(min(1.0, (rate - self.ru_budget) / self.ru_budget))
+
+    def _write(self, item):
+        try:
+            attempts = 0
+            while True:
+                self._wait_for_backoff()
+                self._respect_budget()
+                try:
+                    charge = self._upsert_once(item)
+                except Exception as e:
+                    if not is_throttled(e):
+                        raise
+                    attempts += 1
+                    self.limiter.on_throttle()
+                    with self._lock:
+                        self.report.throttled += 1
+                    if attempts > self.max_retries:
+                        raise
+                    with self._lock:
+                        self.report.retries += 1
+                    # Honour the hint, stretched on repeated throttles and jittered so
+                    # the waiting workers do not all retry at the same instant.
+                    self._back_off(retry_after_seconds(e) * attempts * random.uniform(1.0, 1.5))
+                    continue
+                self.meter.record(charge)
+                self.limiter.on_success()
+                with self._lock:
+                    self.report.succeeded += 1
+                    self.report.request_units += charge
+                    if self.progress_every and self.report.succeeded % self.progress_every == 0:
+                        print(f"Upserted {self.report.succeeded} items "
+                              f"(concurrency {self.limiter.limit}, {self.meter.rate():.0f} RU/s)...")
+                return
+        except Exception as e:
+            with self._lock:
+                self.report.failed += 1
+                if len(self.report.errors) < 100:
+                    self.report.errors.append((item.get('id'), str(e)))
+        finally:
+            self.limiter.release()
+
+    def import_items(self, items):
+        """Upserts every document from the `items` iterable and returns a BulkImportReport."""
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-import") as pool:
+            for item in items:
+                # Blocks while the adaptive limit is reached, so at most
+                # `limit` documents are buffered regardless of input size.
+                self.limiter.acquire()
+                pool.submit(self._write, item)
+        self.report.duration = time.time() - start_time
+        self.report.final_concurrency = self.limiter.limit
+        return self.report
+
+
+# --- Local stand-in for a Cosmos container ---
+
+class FakeThrottleError(Exception):
+    """Mimics azure.cosmos.exceptions.CosmosHttpResponseError for a 429 response."""
+
+    def __init__(self, retry_after_ms):
+        super().__init__(f"Request rate is large. Retry after {retry_after_ms} ms.")
+        self.status_code = THROTTLED_STATUS_CODE
+        self.headers = {'x-ms-retry-after-ms': str(retry_after_ms)}
+
+
+class FakeThrottlingContainer:
+    """
+    In-memory container that enforces a provisioned RU/s throughput with a
+    token bucket and answers with 429s (plus a retry-after hint) when the
+    bucket is empty, like a Cosmos container under load.
+    """
+
+    def __init__(self, ru_per_second=1000, ru_per_write=6.0, latency=0.002, clock=time.monotonic):
+        self.ru_per_second = ru_per_second
+        self.ru_per_write = ru_per_write
+        self.latency = latency
+        self._clock = clock
+        self._tokens = float(ru_per_second)
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+        self.items = {}
+        self.throttled = 0
+
+    def _take(self, charge):
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.ru_per_second, self._tokens + (now - self._last_refill) * self.ru_per_second)
+            self._last_refill = now
+            if self._tokens < charge:
+                self.throttled += 1
+                wait_ms = int((charge - self._tokens) / self.ru_per_second * 1000) + 1
+                raise FakeThrottleError(wait_ms)
+            self._tokens -= charge
+
+    def upsert_item(self, body, response_hook=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self._take(self.ru_per_write)
+        with self._lock:
+            self.items[body['id']] = dict(body)
+        if response_hook:
+            response_hook({'x-ms-request-charge': str(self.ru_per_write)}, body)
+        return body
+
+    def create_item(self, body, **kwargs):
+        return self.upsert_item(body, **kwargs)
@@ -0,0 +1,395 @@
+# change_feed.py
+import json
+import threading
+
+from shipment_store import ShipmentStore, normalize_filters
+
+# Dimensions the live aggregates are keyed by. Any filter or GROUP BY over a
+# subset of these can be answered by summing a handful of keys.
+DIMENSIONS = ("Carrier", "DeliveryStatus", "ServiceType", "Priority")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_change(record):
+    """
+    Normalizes a change feed record to (change_type, document).
+
+    Accepts plain documents (latest-version mode), all-versions-and-deletes
+    records ({"current": ..., "previous": ..., "metadata": {"operationType": ...}})
+    and the replay format used by FileChangeFeed ({"operationType": ..., "document": ...}).
+    """
+    if "metadata" in record and ("current" in record or "previous" in record):
+        operation = record["metadata"].get("operationType", "").lower()
+        if operation == "delete":
+            previous = record.get("previous") or {}
+            return "delete", {"id": previous.get("id") or record["metadata"].get("id")}
+        return "upsert", record["current"]
+    if "operationType" in record and "document" in record:
+        operation = record["operationType"].lower()
+        document = record["document"]
+        if operation == "delete":
+            return "delete", {"id": document.get("id") or document.get("ShipmentID")}
+        return "upsert", document
+    return "upsert", record
+
+
+class LiveAggregates:
+    """
+    Totals, delayed counts, carrier cost sums and the priority-by-status
+    matrix, kept up to date from individual document changes.
+
+    Each document's previous contribution is remembered by id so an update
+    (e.g. In Transit -> Delayed) retracts the old values before adding the new
+    ones, and deletes can be retracted exactly (when the feed reports them,
+    see CosmosChangeFeed).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (Carrier, DeliveryStatus, ServiceType, Priority) -> [count, cost count, cost sum]
+        self._cells = {}
+        # id -> (cell key, cost or None)
+        self._contributions = {}
+        self.ready = False
+        self.changes_applied = 0
+
+    def __len__(self):
+        return len(self._contributions)
+
+    def _retract(self, shipment_id):
+        previous = self._contributions.pop(shipment_id, None)
+        if previous is None:
+            return
+        key, cost = previous
+        cell = self._cells[key]
+        cell[0] -= 1
+        if cost is not None:
+            cell[1] -= 1
+            cell[2] -= cost
+        if cell[0] == 0:
+            del self._cells[key]
+
+    def _add(self, shipment_id, document):
+        key = tuple(document.get(field) or None for field in DIMENSIONS)
+        cost = document.get('CostUSD')
+        cost = cost if _is_number(cost) else None
+        cell = self._cells.setdefault(key, [0, 0, 0.0])
+        cell[0] += 1
+        if cost is not None:
+            cell[1] += 1
+            cell[2] += cost
+        self._contributions[shipment_id] = (key, cost)
+
+    def apply(self, change_type, document):
+        """Applies one change. Usable directly as a ShipmentStore change listener."""
+        shipment_id = document.get('id') or document.get('ShipmentID')
+        if not shipment_id:
+            return
+        with self._lock:
+            self._retract(shipment_id)
+            if change_type != "delete":
+                self._add(shipment_id, document)
+            self.changes_applied += 1
+
+    def load(self, documents):
+        """Bootstraps the state from a full scan and marks it ready."""
+        for document in documents:
+            self.apply("upsert", document)
+        self.ready = True
+        return self
+
+    def export_state(self):
+        """The cells as plain lists, for from_state() in another process (see shared_aggregates.py)."""
+        with self._lock:
+            cells = [[list(key)] + list(cell) for key, cell in self._cells.items()]
+        return {"ready": self.ready, "cells": cells}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Read-only aggregates rebuilt from export_state(). Per-document
+        contributions are not carried over, so apply() must not be used.
+        """
+        aggregates = cls()
+        aggregates._cells = {tuple(key): cell for key, *cell in state["cells"]}
+        aggregates.ready = state["ready"]
+        return aggregates
+
+    def answer(self, plan):
+        """
+        Evaluates an AggregatePlan from the live state. Returns None when the
+        plan needs something not tracked here (date bounds, other fields).
+        """
+        fields = set(plan.filters) | set(plan.group_by) | set(plan.defined)
+        if plan.since or plan.until or not fields.issubset(DIMENSIONS) or not set(plan.numeric).issubset({"CostUSD"}):
+            return None
+        for aggregate in plan.aggregates:
+            if aggregate.function not in ("COUNT", "SUM", "AVG") or aggregate.field not in (None, "CostUSD"):
+                return None
+
+        filters = [(DIMENSIONS.index(field), value) for field, value in normalize_filters(plan.filters).items()]
+        defined = [DIMENSIONS.index(field) for field in plan.defined]
+        group_positions = [DIMENSIONS.index(field) for field in plan.group_by]
+        cost_only = "CostUSD" in plan.numeric
+
+        groups = {}
+        with self._lock:
+            for key, (count, cost_count, cost_sum) in self._cells.items():
+                if any(key[position] != value for position, value in filters):
+                    continue
+                if any(key[position] is None for position in defined):
+                    continue
+                if cost_only:
+                    if not cost_count:
+                        continue
+                    count = cost_count
+                group = groups.setdefault(tuple(key[p] for p in group_positions), [0, 0, 0.0])
+                group[0] += count
+                group[1] += cost_count
+                group[2] += cost_sum
+
+        if not plan.group_by and not groups:
+            groups[()] = [0, 0, 0.0]
+        rows = []
+        for group_key, (count, cost_count, cost_sum) in groups.items():
+            row = {field: value for field, value in zip(plan.group_by, group_key) if value is not None}
+            for aggregate in plan.aggregates:
+                if aggregate.function == "COUNT":
+                    row[aggregate.alias] = count
+                elif not cost_count:
+                    row[aggregate.alias] = None
+                elif aggregate.function == "SUM":
+                    row[aggregate.alias] = cost_sum
+                else:
+                    row[aggregate.alias] = cost_sum / cost_count
+            rows.append(row)
+        return rows
+
+
+class LiveAggregatingStore(ShipmentStore):
+    """
+    Wraps a ShipmentStore so aggregate plans are answered from in-memory
+    sources (LiveAggregates, DailyRollups: anything with `ready` and
+    answer(plan)) once they are ready; everything else goes to the wrapped store.
+    """
+
+    def __init__(self, store, *sources):
+        super().__init__()
+        self.store = store
+        self.sources = sources
+        self.name = store.name
+
+    def add_change_listener(self, callback):
+        self.store.add_change_listener(callback)
+
+    def notify_change(self, change_type, document):
+        self.store.notify_change(change_type, document)
+
+    def available(self):
+        return self.store.available()
+
+    def aggregate(self, plan):
+        for source in self.sources:
+            if source.ready:
+                rows = source.answer(plan)
+                if rows is not None:
+                    return rows
+        return self.store.aggregate(plan)
+
+    def top_expensive(self, filters, limit=5):
+        return self.store.top_expensive(filters, limit)
+
+    def distinct(self, field, filters=None):
+        return self.store.distinct(field, filters)
+
+    def page(self, filters, sort_by=None, sort_order=None, offset=0, limit=10):
+        return self.store.page(filters, sort_by, sort_order, offset, limit)
+
+    def page_after(self, filters, sort_by=None, sort_order=None, after=None, limit=10):
+        return self.store.page_after(filters, sort_by, sort_order, after, limit)
+
+    def iter_items(self, filters=None, fields=None):
+        return self.store.iter_items(filters, fields)
+
+    def iter_sorted(self, filters=None, sort_by=None, sort_order=None, fields=None):
+        return self.store.iter_sorted(filters, sort_by, sort_order, fields)
+
+    def upsert(self, document):
+        return self.store.upsert(document)
+
+    def delete(self, shipment_id):
+        return self.store.delete(shipment_id)
+
+
+# --- Change feed sources ---
+
+ALL_VERSIONS_AND_DELETES = "AllVersionsAndDeletes"
+LATEST_VERSION = "LatestVersion"
+CHANGE_FEED_MODES = (ALL_VERSIONS_AND_DELETES, LATEST_VERSION)
+
+
+class CosmosChangeFeed:
+    """
+    Reads the container's change feed, resuming from the last continuation token.
+
+    In AllVersionsAndDeletes mode (the default) deletes are reported too, so
+    listeners retract them. The container needs the all versions and deletes
+    change feed policy, and this mode can only start from "Now": pin() the
+    position, then bootstrap from a scan. LatestVersion mode can start from
+    the "Beginning" and so replay every current document, but it never
+    reports deletes, so deleted shipments stay counted.
+    """
+
+    def __init__(self, container_provider, start_time="Now", page_size=1000, mode=ALL_VERSIONS_AND_DELETES):
+        if mode not in CHANGE_FEED_MODES:
+            raise ValueError(f"Unknown change feed mode: {mode}")
+        if mode == ALL_VERSIONS_AND_DELETES and start_time != "Now":
+            raise ValueError("The AllVersionsAndDeletes change feed can only start from 'Now'.")
+        self._container_provider = container_provider
+        self.start_time = start_time
+        self.page_size = page_size
+        self.mode = mode
+        self.continuation = None
+
+    def read_changes(self):
+        """
+        Returns the next page (at most `page_size` records) changed since the
+        previous call, or an empty list when caught up. Only one page is read
+        per call, so a long backlog is consumed, and checkpointed, page by page.
+        """
+        container = self._container_provider()
+        if not container:
+            return []
+        # The headers of this call's own responses, not the connection's
+        # last_response_headers, which every other thread's requests overwrite.
+        # The SDK rewrites their etag to the feed's full continuation token.
+        responses = []
+        kwargs = {"max_item_count": self.page_size,
+                  "response_hook": lambda headers, result: responses.append(headers)}
+        if self.continuation:
+            kwargs["continuation"] = self.continuation
+        else:
+            kwargs["start_time"] = self.start_time
+            kwargs["mode"] = self.mode
+        pages = container.query_items_change_feed(**kwargs).by_page()
+        records = list(next(pages, []))
+        if responses:
+            self.continuation = responses[-1].get('etag', self.continuation)
+        return records
+
+    def pin(self):
+        """
+        Fixes the starting position with a first read, so changes made while
+        a bootstrap scan runs afterwards are still read. Returns the records
+        of that first page (changes the scan will see as well).
+        """
+        if self.continuation:
+            return []
+        return self.read_changes()
+
+    def checkpoint(self):
+        """Position after the records read so far, for restore()."""
+        return self.continuation
+
+    def restore(self, checkpoint):
+        """Resumes reading after a checkpoint() taken earlier (e.g. by another process)."""
+        self.continuation = checkpoint
+
+
+class FileChangeFeed:
+    """
+    Local stand-in for the Cosmos change feed: replays a newline-delimited
+    JSON file of change records, picking up lines appended after each read.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.offset = 0
+
+    def read_changes(self):
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                f.seek(self.offset)
+                while len(records) < self.batch_size:
+                    line = f.readline()
+                    if not line or not line.endswith("\n"):
+                        break
+                    self.offset = f.tell()
+                    if line.strip():
+                        records.append(json.loads(line))
+        except FileNotFoundError:
+            print(f"Change feed file not found: {self.path}")
+        return records
+
+    def checkpoint(self):
+        return self.offset
+
+    def restore(self, checkpoint):
+        self.offset = checkpoint or 0
+
+
+class ChangeFeedConsumer:
+    """
+    Background thread that drains a change feed source and hands every
+    change to `apply(change_type, document)`. `bootstrap()`, if given, runs
+    first on the same thread (e.g. a scan of the current documents) and is
+    retried until it succeeds.
+    """
+
+    def __init__(self, source, apply, poll_interval=1.0, on_caught_up=None, bootstrap=None):
+        self.source = source
+        self.apply = apply
+        self.poll_interval = poll_interval
+        self.on_caught_up = on_caught_up
+        self.bootstrap = bootstrap
+        self.caught_up = False
+        self.changes_consumed = 0
+        # Source position up to which every change has been applied.
+        self.checkpoint = source.checkpoint()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_once(self):
+        """Reads and applies one batch. Returns the number of changes applied."""
+        records = self.source.read_changes()
+        for record in records:
+            change_type, document = parse_change(record)
+            self.apply(change_type, document)
+        self.changes_consumed += len(records)
+        self.checkpoint = self.source.checkpoint()
+        if not records and not self.caught_up:
+            self.caught_up = True
+            if self.on_caught_up:
+                self.on_caught_up()
+        return len(records)
+
+    def run(self):
+        while self.bootstrap is not None and not self._stop.is_set():
+            try:
+                self.bootstrap()
+                self.bootstrap = None
+            except Exception as e:
+                print(f"Error bootstrapping the change feed consumer: {e}")
+                self._stop.wait(self.poll_interval)
+        while not self._stop.is_set():
+            try:
+                if self.poll_once():
+                    continue
+            except Exception as e:
+                print(f"Error reading change feed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="change-feed-consumer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
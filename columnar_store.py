@@ -0,0 +1,490 @@
+# columnar_store.py
+import calendar
+import json
+import operator
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from shipment_store import ShipmentStore, normalize_filters, sort_spec
+
+# Schema from CosmosDBSchema.md, split by physical column type.
+CATEGORICAL_FIELDS = ("Origin", "Destination", "Carrier", "DeliveryStatus", "ServiceType", "Priority")
+NUMERIC_FIELDS = ("WeightKG", "CostUSD", "DistanceKM")
+DATE_FIELDS = ("ShipmentDate", "DeliveryDate")
+
+# Sentinel for a missing date in the int64 epoch-second columns.
+MISSING_DATE = np.iinfo(np.int64).min
+# Code stored for a missing categorical value.
+MISSING_CODE = -1
+
+_INITIAL_CAPACITY = 1024
+# Documents built per hold of the write lock while streaming (iter_items, iter_sorted).
+_READ_BATCH = 1000
+
+
+def iso_to_epoch(value):
+    """Converts a stored ISO 8601 string ("2024-01-31T00:00:00Z") to epoch seconds."""
+    if not value:
+        return MISSING_DATE
+    parsed = datetime.fromisoformat(value.rstrip('Z'))
+    return calendar.timegm(parsed.timetuple())
+
+
+def epoch_to_iso(value):
+    if value == MISSING_DATE:
+        return None
+    return datetime.utcfromtimestamp(int(value)).isoformat() + "Z"
+
+
+class Dictionary:
+    """Dictionary encoding for a low-cardinality string column."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        if value is None or value == "":
+            return MISSING_CODE
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    @classmethod
+    def from_values(cls, values):
+        dictionary = cls()
+        for value in values:
+            dictionary.encode(value)
+        return dictionary
+
+    def lookup(self, value):
+        """Returns the code for `value`, or None if it never occurs."""
+        return self.codes.get(value)
+
+    def decode(self, code):
+        return self.values[code] if code >= 0 else None
+
+    def sort_ranks(self):
+        """Array mapping each code to the rank of its value in sorted order."""
+        ranks = np.empty(len(self.values), dtype=np.int64)
+        for rank, code in enumerate(sorted(range(len(self.values)), key=self.values.__getitem__)):
+            ranks[code] = rank
+        return ranks
+
+
+class ColumnarShipmentStore(ShipmentStore):
+    """
+    In-memory ShipmentStore holding each schema field as a NumPy array.
+    Filters become boolean masks and aggregates are computed with bincount,
+    so a dashboard query touches a handful of contiguous arrays.
+
+    Reads and writes share one lock: a write can grow (reallocate) the
+    arrays or move the last row into a deleted one, so a read must not see
+    it half-done. Streaming reads only hold the lock per batch of documents.
+    """
+
+    name = "memory"
+
+    def __init__(self, documents=None):
+        super().__init__()
+        self._size = 0
+        self._capacity = _INITIAL_CAPACITY
+        self.ids = np.empty(self._capacity, dtype=object)
+        self.dictionaries = {field: Dictionary() for field in CATEGORICAL_FIELDS}
+        self.columns = {}
+        for field in CATEGORICAL_FIELDS:
+            self.columns[field] = np.full(self._capacity, MISSING_CODE, dtype=np.int32)
+        for field in NUMERIC_FIELDS:
+            self.columns[field] = np.full(self._capacity, np.nan, dtype=np.float64)
+        for field in DATE_FIELDS:
+            self.columns[field] = np.full(self._capacity, MISSING_DATE, dtype=np.int64)
+        self._row_by_id = {}
+        # Serializes writes against reads and export_arrays (snapshots).
+        self._write_lock = threading.RLock()
+        # Incremented by every write; lets streaming reads detect moved rows.
+        self._version = 0
+        if documents is not None:
+            self.load(documents)
+
+    @classmethod
+    def from_arrays(cls, ids, columns, dictionaries, size):
+        """
+        Builds a store directly on existing arrays (e.g. memory-mapped from a
+        snapshot, see snapshot.py). The arrays' length is the capacity and
+        the first `size` rows are live. `ids` may be a fixed-width string
+        array; it becomes an object array on the first write that needs it.
+        """
+        store = cls.__new__(cls)
+        ShipmentStore.__init__(store)
+        store._size = size
+        store._capacity = len(ids)
+        store.ids = ids
+        store.columns = dict(columns)
+        store.dictionaries = {field: Dictionary.from_values(dictionaries.get(field, ()))
+                              for field in CATEGORICAL_FIELDS}
+        # The id index costs a pass over every row, so it is built on the first write.
+        store._row_by_id = None
+        store._write_lock = threading.RLock()
+        store._version = 0
+        return store
+
+    def export_arrays(self):
+        """Copies of (ids, columns, dictionary values) for the live rows, consistent with respect to writes."""
+        with self._write_lock:
+            size = self._size
+            ids = self.ids[:size].copy()
+            columns = {field: column[:size].copy() for field, column in self.columns.items()}
+            dictionaries = {field: list(dictionary.values) for field, dictionary in self.dictionaries.items()}
+        return ids, columns, dictionaries
+
+    @classmethod
+    def from_file(cls, path):
+        """Loads documents from a JSON array or newline-delimited JSON file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            first = f.read(1)
+            f.seek(0)
+            if first == '[':
+                return cls(json.load(f))
+            return cls(json.loads(line) for line in f if line.strip())
+
+    def __len__(self):
+        return self._size
+
+    # --- Writes ---
+
+    def _grow(self, needed):
+        if needed <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        ids = np.empty(capacity, dtype=object)
+        ids[:self._capacity] = self.ids
+        self.ids = ids
+        for field, column in self.columns.items():
+            grown = np.full(capacity, self._fill_value(field), dtype=column.dtype)
+            grown[:self._capacity] = column
+            self.columns[field] = grown
+        self._capacity = capacity
+
+    @staticmethod
+    def _fill_value(field):
+        if field in CATEGORICAL_FIELDS:
+            return MISSING_CODE
+        if field in NUMERIC_FIELDS:
+            return np.nan
+        return MISSING_DATE
+
+    def _rows(self):
+        if self._row_by_id is None:
+            self._row_by_id = {str(shipment_id): row for row, shipment_id in enumerate(self.ids[:self._size].tolist())}
+        return self._row_by_id
+
+    def _write_row(self, row, document):
+        shipment_id = document.get('ShipmentID') or document.get('id')
+        if self.ids.dtype != object and len(shipment_id) > self.ids.itemsize // 4:
+            # Longer than the fixed-width ids of a snapshot: switch to Python strings.
+            self.ids = self.ids.astype(object)
+        self.ids[row] = shipment_id
+        for field in CATEGORICAL_FIELDS:
+            self.columns[field][row] = self.dictionaries[field].encode(document.get(field))
+        for field in NUMERIC_FIELDS:
+            value = document.get(field)
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            self.columns[field][row] = value if numeric else np.nan
+        for field in DATE_FIELDS:
+            self.columns[field][row] = iso_to_epoch(document.get(field))
+
+    def load(self, documents):
+        """Bulk-loads documents without notifying change listeners."""
+        for document in documents:
+            self._upsert(document)
+        return self
+
+    def upsert(self, document):
+        self._upsert(document)
+        self.notify_change("upsert", document)
+        return document
+
+    def _upsert(self, document):
+        shipment_id = document.get('ShipmentID') or document.get('id')
+        if not shipment_id:
+            raise ValueError("Document has no ShipmentID.")
+        with self._write_lock:
+            rows = self._rows()
+            row = rows.get(shipment_id)
+            if row is None:
+                self._grow(self._size + 1)
+                row = self._size
+                self._size += 1
+                rows[shipment_id] = row
+            self._write_row(row, document)
+            self._version += 1
+
+    def delete(self, shipment_id):
+        with self._write_lock:
+            rows = self._rows()
+            row = rows.pop(shipment_id, None)
+            if row is None:
+                return
+            # Move the last row into the hole so the arrays stay dense.
+            last = self._size - 1
+            if row != last:
+                self.ids[row] = self.ids[last]
+                for column in self.columns.values():
+                    column[row] = column[last]
+                rows[str(self.ids[row])] = row
+            self.ids[last] = None if self.ids.dtype == object else ""
+            for field, column in self.columns.items():
+                column[last] = self._fill_value(field)
+            self._size = last
+            self._version += 1
+        self.notify_change("delete", {"id": shipment_id})
+
+    # --- Reads ---
+
+    def _column(self, field):
+        return self.columns[field][:self._size]
+
+    def _mask(self, filters, since=None, defined=(), numeric=(), until=None):
+        mask = np.ones(self._size, dtype=bool)
+        for field, value in normalize_filters(filters).items():
+            if field in CATEGORICAL_FIELDS and isinstance(value, tuple):
+                codes = [code for code in map(self.dictionaries[field].lookup, value) if code is not None]
+                if not codes:
+                    return np.zeros(self._size, dtype=bool)
+                mask &= np.isin(self._column(field), codes)
+            elif field in CATEGORICAL_FIELDS:
+                code = self.dictionaries[field].lookup(value)
+                if code is None:
+                    return np.zeros(self._size, dtype=bool)
+                mask &= self._column(field) == code
+            elif field in ("ShipmentID", "id"):
+                mask &= self.ids[:self._size] == value
+            elif field in NUMERIC_FIELDS:
+                mask &= self._column(field) == value
+            else:
+                raise ValueError(f"Cannot filter on field: {field}")
+        if since:
+            mask &= self._column('ShipmentDate') >= iso_to_epoch(since)
+        if until:
+            shipment_dates = self._column('ShipmentDate')
+            mask &= (shipment_dates < iso_to_epoch(until)) & (shipment_dates != MISSING_DATE)
+        for field in defined:
+            mask &= self._defined(field)
+        for field in numeric:
+            if field in NUMERIC_FIELDS:
+                mask &= ~np.isnan(self._column(field))
+            else:
+                mask[:] = False
+        return mask
+
+    def _defined(self, field):
+        column = self._column(field)
+        if field in CATEGORICAL_FIELDS:
+            return column != MISSING_CODE
+        if field in NUMERIC_FIELDS:
+            return ~np.isnan(column)
+        return column != MISSING_DATE
+
+    def _document(self, row, fields=None):
+        document = {}
+        for field in fields or ("id", "ShipmentID") + CATEGORICAL_FIELDS + NUMERIC_FIELDS + DATE_FIELDS:
+            if field in ("id", "ShipmentID"):
+                value = str(self.ids[row])
+            elif field in CATEGORICAL_FIELDS:
+                value = self.dictionaries[field].decode(int(self.columns[field][row]))
+            elif field in NUMERIC_FIELDS:
+                value = float(self.columns[field][row])
+                value = None if np.isnan(value) else value
+            else:
+                value = epoch_to_iso(self.columns[field][row])
+            if value is not None:
+                document[field] = value
+        return document
+
+    def aggregate(self, plan):
+        for field in plan.group_by:
+            if field not in CATEGORICAL_FIELDS:
+                raise ValueError(f"Cannot group by non-categorical field: {field}")
+        with self._write_lock:
+            return self._aggregate(plan)
+
+    def _aggregate(self, plan):
+        mask = self._mask(plan.filters, plan.since, plan.defined, plan.numeric, plan.until)
+        rows = np.flatnonzero(mask)
+
+        if plan.group_by:
+            codes = np.stack([self._column(field)[rows] for field in plan.group_by], axis=1)
+            keys, inverse = np.unique(codes, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            keys = np.zeros((1, 0), dtype=np.int32)
+            inverse = np.zeros(len(rows), dtype=np.int64)
+        group_count = len(keys)
+
+        results = []
+        for aggregate in plan.aggregates:
+            if aggregate.function == "COUNT":
+                results.append(np.bincount(inverse, minlength=group_count))
+                continue
+            values = self._column(aggregate.field)[rows]
+            present = ~np.isnan(values)
+            counts = np.bincount(inverse[present], minlength=group_count)
+            if aggregate.function in ("SUM", "AVG"):
+                folded = np.bincount(inverse[present], weights=values[present], minlength=group_count)
+                if aggregate.function == "AVG":
+                    folded = folded / np.maximum(counts, 1)
+            else:
+                initial = np.inf if aggregate.function == "MIN" else -np.inf
+                folded = np.full(group_count, initial)
+                ufunc = np.minimum if aggregate.function == "MIN" else np.maximum
+                ufunc.at(folded, inverse[present], values[present])
+            # Groups with no numeric values yield undefined (None), as in Cosmos.
+            results.append([float(v) if c else None for v, c in zip(folded, counts)])
+
+        output = []
+        for group in range(group_count):
+            row = {}
+            for field, code in zip(plan.group_by, keys[group]):
+                value = self.dictionaries[field].decode(int(code))
+                if value is not None:
+                    row[field] = value
+            for aggregate, result in zip(plan.aggregates, results):
+                value = result[group]
+                row[aggregate.alias] = int(value) if aggregate.function == "COUNT" else value
+            output.append(row)
+        return output
+
+    def top_expensive(self, filters, limit=5):
+        with self._write_lock:
+            rows = np.flatnonzero(self._mask(filters, numeric=("CostUSD",)))
+            if len(rows) == 0:
+                return []
+            costs = self._column('CostUSD')[rows]
+            if len(rows) > limit:
+                candidates = np.argpartition(-costs, limit - 1)[:limit]
+            else:
+                candidates = np.arange(len(rows))
+            ordered = candidates[np.argsort(-costs[candidates], kind='stable')]
+            return [self._document(rows[i]) for i in ordered]
+
+    def distinct(self, field, filters=None):
+        if field not in CATEGORICAL_FIELDS:
+            raise ValueError(f"Cannot list distinct values of field: {field}")
+        with self._write_lock:
+            codes = np.unique(self._column(field)[self._mask(filters)])
+            return [self.dictionaries[field].decode(int(code)) for code in codes if code != MISSING_CODE]
+
+    def _sort_keys(self, field):
+        if field in CATEGORICAL_FIELDS:
+            ranks = self.dictionaries[field].sort_ranks()
+            codes = self._column(field)
+            keys = np.full(self._size, -1, dtype=np.int64)
+            present = codes != MISSING_CODE
+            keys[present] = ranks[codes[present]]
+            return keys
+        if field == "ShipmentID":
+            return self.ids[:self._size]
+        if field in NUMERIC_FIELDS:
+            # Missing values sort first, like missing codes and dates.
+            column = self._column(field)
+            return np.where(np.isnan(column), -np.inf, column)
+        return self._column(field)
+
+    def _ordered(self, rows, field, direction):
+        """Sorts row indices by (field, ShipmentID), both in `direction`."""
+        ids = self.ids[rows]
+        if field == "ShipmentID":
+            order = np.argsort(ids, kind='stable')
+        else:
+            order = np.lexsort((ids, self._sort_keys(field)[rows]))
+        if direction == "desc":
+            order = order[::-1]
+        return rows[order]
+
+    def _compare(self, field, op, value):
+        """Vectorized `column op value` for the keyset condition; missing values never match."""
+        if field == "ShipmentID":
+            return np.asarray(op(self.ids[:self._size], value), dtype=bool)
+        if field in CATEGORICAL_FIELDS:
+            # Evaluate once per dictionary entry, then broadcast through the codes.
+            per_code = [value is not None and op(entry, value) for entry in self.dictionaries[field].values]
+            lookup = np.array(per_code + [False], dtype=bool)
+            return lookup[self._column(field)]
+        if field in DATE_FIELDS:
+            column = self._column(field)
+            return (column != MISSING_DATE) & op(column, iso_to_epoch(value))
+        if value is None:
+            return np.zeros(self._size, dtype=bool)
+        return op(self._column(field), value)
+
+    def page(self, filters, sort_by=None, sort_order=None, offset=0, limit=10):
+        field, direction = sort_spec(sort_by, sort_order)
+        with self._write_lock:
+            rows = self._ordered(np.flatnonzero(self._mask(filters)), field, direction)
+            return [self._document(row) for row in rows[offset:offset + limit]]
+
+    def page_after(self, filters, sort_by=None, sort_order=None, after=None, limit=10):
+        field, direction = sort_spec(sort_by, sort_order)
+        with self._write_lock:
+            mask = self._mask(filters)
+            if after is not None:
+                value, shipment_id = after
+                op = operator.gt if direction == "asc" else operator.lt
+                after_id = self._compare("ShipmentID", op, shipment_id)
+                if field == "ShipmentID":
+                    mask &= after_id
+                else:
+                    # Missing values sort first ascending and last descending, as in Cosmos DB.
+                    missing = ~self._defined(field)
+                    if value is None:
+                        position = missing & after_id
+                        if direction == "asc":
+                            position |= ~missing
+                    else:
+                        position = self._compare(field, op, value) | (self._compare(field, operator.eq, value) & after_id)
+                        if direction == "desc":
+                            position |= missing
+                    mask &= position
+            rows = self._ordered(np.flatnonzero(mask), field, direction)
+            return [self._document(row) for row in rows[:limit]]
+
+    def _selection(self, rows):
+        """(rows, their ids, store version); call under the write lock that selected `rows`."""
+        return rows, self.ids[rows], self._version
+
+    def _stream(self, selection, fields=None):
+        """
+        Yields the documents of a _selection in batches of _READ_BATCH, each
+        built under the write lock. If the store has been written to since
+        the selection, rows are found again by id (a delete may have moved
+        them) and deleted ones are skipped.
+        """
+        rows, ids, version = selection
+        for start in range(0, len(rows), _READ_BATCH):
+            with self._write_lock:
+                batch = rows[start:start + _READ_BATCH]
+                if self._version != version:
+                    current = self._rows()
+                    batch = [current.get(str(shipment_id)) for shipment_id in ids[start:start + _READ_BATCH]]
+                documents = [self._document(row, fields) for row in batch if row is not None]
+            yield from documents
+
+    def iter_items(self, filters=None, fields=None):
+        with self._write_lock:
+            selection = self._selection(np.flatnonzero(self._mask(filters)))
+        yield from self._stream(selection, fields)
+
+    def iter_sorted(self, filters=None, sort_by=None, sort_order=None, fields=None):
+        field, direction = sort_spec(sort_by, sort_order)
+        # Only the ordered row indices (and their ids) are materialized; documents are built per batch.
+        with self._write_lock:
+            selection = self._selection(self._ordered(np.flatnonzero(self._mask(filters)), field, direction))
+        yield from self._stream(selection, fields)
+
@@ -0,0 +1,218 @@
+# correlation.py
+import math
+import random
+
+from aggregate_queries import Aggregate, AggregatePlan
+
+X_FIELD = "WeightKG"
+Y_FIELD = "CostUSD"
+
+DEFAULT_BINS = 40
+MAX_BINS = 200
+DEFAULT_SAMPLE_SIZE = 2000
+MAX_SAMPLE_SIZE = 20000
+DEFAULT_STRATA = 10
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+def range_plans(filters):
+    """
+    MIN/MAX of weight and cost over the shipments with both, as four scalar
+    plans: Cosmos DB queries from the Python SDK take one aggregate each
+    (SELECT VALUE MIN(c.WeightKG) ...).
+    """
+    return [
+        AggregatePlan([Aggregate(alias, function, field)], filters=filters, numeric=(X_FIELD, Y_FIELD))
+        for alias, function, field in (("MinWeight", "MIN", X_FIELD), ("MaxWeight", "MAX", X_FIELD),
+                                       ("MinCost", "MIN", Y_FIELD), ("MaxCost", "MAX", Y_FIELD))
+    ]
+
+
+def value_ranges(store, filters):
+    """Returns ((min weight, max weight), (min cost, max cost)), or None when nothing matches."""
+    values = {}
+    for plan in range_plans(filters):
+        rows = store.aggregate(plan)
+        values.update(rows[0] if rows else {})
+    if any(values.get(alias) is None for alias in ("MinWeight", "MaxWeight", "MinCost", "MaxCost")):
+        return None
+    return (values["MinWeight"], values["MaxWeight"]), (values["MinCost"], values["MaxCost"])
+
+
+class RegressionStats:
+    """
+    Least-squares fit and Pearson correlation of (x, y) pairs, accumulated in
+    one pass with Welford-style running means and co-moments, so the result
+    is numerically stable without keeping the points.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+
+    def add(self, x, y):
+        self.count += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.count
+        dy = y - self.mean_y
+        self.mean_y += dy / self.count
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+
+    def as_dict(self):
+        slope = intercept = correlation = None
+        if self.count >= 2 and self.m2_x > 0:
+            slope = self.c_xy / self.m2_x
+            intercept = self.mean_y - slope * self.mean_x
+            if self.m2_y > 0:
+                correlation = self.c_xy / math.sqrt(self.m2_x * self.m2_y)
+        return {
+            "count": self.count,
+            "meanWeightKG": self.mean_x if self.count else None,
+            "meanCostUSD": self.mean_y if self.count else None,
+            "slope": slope,
+            "intercept": intercept,
+            "pearsonR": correlation,
+            "rSquared": correlation * correlation if correlation is not None else None,
+        }
+
+
+def _bin_index(value, low, width, bins):
+    if width <= 0:
+        return 0
+    return min(int((value - low) / width), bins - 1)
+
+
+class Histogram2D:
+    """Fixed-grid 2D histogram over known weight and cost ranges."""
+
+    def __init__(self, x_range, y_range, bins=DEFAULT_BINS):
+        self.bins = bins
+        self.x_low, x_high = x_range
+        self.y_low, y_high = y_range
+        self.x_width = (x_high - self.x_low) / bins
+        self.y_width = (y_high - self.y_low) / bins
+        self.counts = {}
+
+    def add(self, x, y):
+        cell = (_bin_index(x, self.x_low, self.x_width, self.bins),
+                _bin_index(y, self.y_low, self.y_width, self.bins))
+        self.counts[cell] = self.counts.get(cell, 0) + 1
+
+    def edges(self, low, width):
+        return [low + width * i for i in range(self.bins + 1)]
+
+    def as_dict(self):
+        cells = []
+        for (i, j), count in sorted(self.counts.items()):
+            cells.append({
+                X_FIELD: self.x_low + self.x_width * (i + 0.5),
+                Y_FIELD: self.y_low + self.y_width * (j + 0.5),
+                "count": count,
+            })
+        return {
+            "weightEdges": self.edges(self.x_low, self.x_width),
+            "costEdges": self.edges(self.y_low, self.y_width),
+            "bins": cells,
+        }
+
+
+class StratifiedReservoir:
+    """
+    Random sample of at most `capacity` points, stratified by equal-width
+    weight strata. Each stratum keeps its own reservoir; when the points are
+    read, the capacity is shared out in proportion to each stratum's size,
+    after a small minimum per stratum so sparse heavy shipments still show.
+    Every point carries a `weight`: the number of shipments it stands for,
+    which undoes the over-representation the minimum causes.
+    """
+
+    def __init__(self, capacity, x_range, strata=DEFAULT_STRATA, seed=0):
+        self.capacity = capacity
+        self.strata = max(1, min(strata, capacity))
+        # The minimums take at most a quarter of the capacity.
+        self.min_per_stratum = max(1, capacity // (4 * self.strata))
+        self.x_low = x_range[0]
+        self.x_width = (x_range[1] - x_range[0]) / self.strata
+        self.seen = [0] * self.strata
+        # Any stratum may turn out to hold every point, so each reservoir can fill the capacity.
+        self.samples = [[] for _ in range(self.strata)]
+        # Seeded so the same data gives the same (cacheable) sample.
+        self._random = random.Random(seed)
+
+    def add(self, x, y):
+        stratum = _bin_index(x, self.x_low, self.x_width, self.strata)
+        self.seen[stratum] += 1
+        sample = self.samples[stratum]
+        if len(sample) < self.capacity:
+            sample.append((x, y))
+            return
+        slot = self._random.randrange(self.seen[stratum])
+        if slot < self.capacity:
+            sample[slot] = (x, y)
+
+    def quotas(self):
+        """Points to return per stratum: the minimum, then the rest of the capacity by stratum size."""
+        reserved = [min(seen, self.min_per_stratum) for seen in self.seen]
+        remaining = max(0, self.capacity - sum(reserved))
+        rest = [seen - minimum for seen, minimum in zip(self.seen, reserved)]
+        total_rest = sum(rest)
+        if not total_rest:
+            return reserved
+        return [minimum + (extra * remaining) // total_rest for minimum, extra in zip(reserved, rest)]
+
+    def points(self):
+        points = []
+        for sample, seen, quota in zip(self.samples, self.seen, self.quotas()):
+            if not quota:
+                continue
+            weight = seen / quota
+            points.extend({X_FIELD: x, Y_FIELD: y, "weight": weight}
+                          for x, y in self._random.sample(sample, quota))
+        return points
+
+
+def _valid_points(items):
+    for item in items:
+        x, y = item.get(X_FIELD), item.get(Y_FIELD)
+        if _is_number(x) and _is_number(y):
+            yield x, y
+
+
+def summarize(store, filters, mode, bins=DEFAULT_BINS, sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Builds a bounded weight/cost payload for `mode` "bins" or "sample"
+    (`filters` may be None for a filter combination that cannot match).
+    The value ranges come from pushed-down MIN/MAX queries; the binning or
+    sampling and the regression statistics then share one pass over the items.
+    """
+    stats = RegressionStats()
+    ranges = value_ranges(store, filters) if filters is not None else None
+    if ranges is None:
+        empty = {"bins": [], "weightEdges": [], "costEdges": []} if mode == "bins" else {"points": []}
+        return dict(mode=mode, stats=stats.as_dict(), **empty)
+
+    x_range, y_range = ranges
+    if mode == "bins":
+        sink = Histogram2D(x_range, y_range, bins)
+    else:
+        sink = StratifiedReservoir(sample_size, x_range)
+
+    for x, y in _valid_points(store.iter_items(filters, fields=(X_FIELD, Y_FIELD))):
+        stats.add(x, y)
+        sink.add(x, y)
+
+    result = {"mode": mode, "stats": stats.as_dict()}
+    if mode == "bins":
+        result.update(sink.as_dict())
+    else:
+        result["points"] = sink.points()
+    return result
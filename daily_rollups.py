@@ -0,0 +1,271 @@
+# daily_rollups.py
+import threading
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+
+from shipment_store import normalize_filters
+
+# Every bucket is one ShipmentDate day x these dimensions.
+DIMENSIONS = ("Carrier", "DeliveryStatus", "ServiceType", "Priority")
+# Document fields a rollup needs; pass as `fields` when bootstrapping from a store.
+ROLLUP_FIELDS = ("id", "ShipmentID", "ShipmentDate", "DeliveryDate", "CostUSD", "WeightKG") + DIMENSIONS
+
+# Positions in a bucket's measure list.
+COUNT, COST_COUNT, COST_SUM, WEIGHT_COUNT, WEIGHT_SUM, DELIVERY_COUNT, DELIVERY_DAYS = range(7)
+MEASURE_COUNT = 7
+# Numeric field -> (count position, sum position).
+NUMERIC_MEASURES = {"CostUSD": (COST_COUNT, COST_SUM), "WeightKG": (WEIGHT_COUNT, WEIGHT_SUM)}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_datetime(value):
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip('Z'))
+    except ValueError:
+        return None
+
+
+def day_bound(value):
+    """
+    Returns the YYYY-MM-DD day for a day-aligned ISO bound ("2024-01-31" or
+    "2024-01-31T00:00:00Z"), or None when the bound falls inside a day and
+    so cannot be answered from daily buckets.
+    """
+    parsed = _parse_datetime(value)
+    if parsed is None or parsed.time() != datetime.min.time():
+        return None
+    return parsed.date().isoformat()
+
+
+def next_day(day):
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def _measures(document):
+    values = [0] * MEASURE_COUNT
+    values[COUNT] = 1
+    for field, (count_position, sum_position) in NUMERIC_MEASURES.items():
+        value = document.get(field)
+        if _is_number(value):
+            values[count_position] = 1
+            values[sum_position] = value
+    shipped = _parse_datetime(document.get('ShipmentDate'))
+    delivered = _parse_datetime(document.get('DeliveryDate'))
+    if shipped is not None and delivered is not None:
+        values[DELIVERY_COUNT] = 1
+        values[DELIVERY_DAYS] = (delivered - shipped).total_seconds() / 86400.0
+    return values
+
+
+class DailyRollups:
+    """
+    Counts, cost sums, weight sums and delivery-time sums per
+    ShipmentDate day x Carrier x DeliveryStatus x ServiceType x Priority.
+
+    Maintained from individual document changes like LiveAggregates (each
+    document's contribution is remembered by id, so updates and deletes are
+    retracted exactly). A date-range query only visits the buckets of the
+    days in range, so its cost depends on the range, not the data volume.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # day -> {dimension key -> measures}
+        self._days = {}
+        self._sorted_days = []
+        # id -> (day, dimension key, measures)
+        self._contributions = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self._contributions)
+
+    def bucket_count(self):
+        with self._lock:
+            return sum(len(buckets) for buckets in self._days.values())
+
+    def _retract(self, shipment_id):
+        previous = self._contributions.pop(shipment_id, None)
+        if previous is None:
+            return
+        day, key, values = previous
+        buckets = self._days[day]
+        bucket = buckets[key]
+        for position, value in enumerate(values):
+            bucket[position] -= value
+        if bucket[COUNT] == 0:
+            del buckets[key]
+            if not buckets:
+                del self._days[day]
+                del self._sorted_days[bisect_left(self._sorted_days, day)]
+
+    def _add(self, shipment_id, document):
+        shipped = _parse_datetime(document.get('ShipmentDate'))
+        if shipped is None:
+            return  # undated shipments never fall in a date range
+        day = shipped.date().isoformat()
+        key = tuple(document.get(field) or None for field in DIMENSIONS)
+        values = _measures(document)
+        buckets = self._days.get(day)
+        if buckets is None:
+            buckets = self._days[day] = {}
+            insort(self._sorted_days, day)
+        bucket = buckets.setdefault(key, [0] * MEASURE_COUNT)
+        for position, value in enumerate(values):
+            bucket[position] += value
+        self._contributions[shipment_id] = (day, key, values)
+
+    def apply(self, change_type, document):
+        """Applies one change. Usable directly as a ShipmentStore change listener."""
+        shipment_id = document.get('id') or document.get('ShipmentID')
+        if not shipment_id:
+            return
+        with self._lock:
+            self._retract(shipment_id)
+            if change_type != "delete":
+                self._add(shipment_id, document)
+
+    def load(self, documents):
+        """Bootstraps the rollups from a full scan and marks them ready."""
+        for document in documents:
+            self.apply("upsert", document)
+        self.ready = True
+        return self
+
+    def export_state(self):
+        """The buckets as plain lists, for from_state() in another process (see shared_aggregates.py)."""
+        with self._lock:
+            buckets = [[day, list(key), list(values)] for day in self._sorted_days
+                       for key, values in self._days[day].items()]
+        return {"ready": self.ready, "buckets": buckets}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Read-only rollups rebuilt from export_state(). Per-document
+        contributions are not carried over, so apply() must not be used.
+        """
+        rollups = cls()
+        for day, key, values in state["buckets"]:
+            buckets = rollups._days.get(day)
+            if buckets is None:
+                buckets = rollups._days[day] = {}
+                rollups._sorted_days.append(day)
+            buckets[tuple(key)] = values
+        rollups.ready = state["ready"]
+        return rollups
+
+    def _totals(self, start_day, end_day, filters, group_by, defined=()):
+        """Sums the buckets with start_day <= day < end_day (None = open) into groups."""
+        filters = [(DIMENSIONS.index(field), value) for field, value in normalize_filters(filters).items()]
+        defined = [DIMENSIONS.index(field) for field in defined]
+        group_positions = [DIMENSIONS.index(field) for field in group_by]
+        groups = {}
+        with self._lock:
+            low = bisect_left(self._sorted_days, start_day) if start_day else 0
+            high = bisect_left(self._sorted_days, end_day) if end_day else len(self._sorted_days)
+            for day in self._sorted_days[low:high]:
+                for key, values in self._days[day].items():
+                    if any(key[position] != value for position, value in filters):
+                        continue
+                    if any(key[position] is None for position in defined):
+                        continue
+                    group = groups.setdefault(tuple(key[p] for p in group_positions), [0] * MEASURE_COUNT)
+                    for position, value in enumerate(values):
+                        group[position] += value
+        return groups
+
+    def query(self, start_day=None, end_day=None, filters=None, group_by=()):
+        """
+        Rollup rows for shipments dated start_day..end_day (inclusive
+        YYYY-MM-DD strings), grouped by any of DIMENSIONS (or "day").
+        """
+        by_day = "day" in group_by
+        dimensions = [field for field in group_by if field != "day"]
+        for field in dimensions:
+            if field not in DIMENSIONS:
+                raise ValueError(f"Cannot group rollups by: {field}")
+        until_day = next_day(end_day) if end_day else None
+
+        if by_day:
+            with self._lock:
+                low = bisect_left(self._sorted_days, start_day) if start_day else 0
+                high = bisect_left(self._sorted_days, until_day) if until_day else len(self._sorted_days)
+                days = self._sorted_days[low:high]
+            per_day = [(day, self._totals(day, next_day(day), filters, dimensions)) for day in days]
+        else:
+            per_day = [(None, self._totals(start_day, until_day, filters, dimensions))]
+
+        rows = []
+        for day, groups in per_day:
+            for group_key, values in sorted(groups.items(), key=lambda item: tuple(v or "" for v in item[0])):
+                row = {"day": day} if by_day else {}
+                row.update({field: value for field, value in zip(dimensions, group_key)})
+                row.update(self._row_measures(values))
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def _row_measures(values):
+        def average(sum_position, count_position):
+            return round(values[sum_position] / values[count_position], 4) if values[count_position] else None
+
+        return {
+            "ShipmentCount": values[COUNT],
+            "TotalCostUSD": round(values[COST_SUM], 2),
+            "AvgCostUSD": average(COST_SUM, COST_COUNT),
+            "TotalWeightKG": round(values[WEIGHT_SUM], 3),
+            "AvgWeightKG": average(WEIGHT_SUM, WEIGHT_COUNT),
+            "AvgDeliveryDays": average(DELIVERY_DAYS, DELIVERY_COUNT),
+        }
+
+    def answer(self, plan):
+        """
+        Evaluates a date-bounded AggregatePlan from the buckets. Returns None
+        for plans without a date bound (LiveAggregates or the store answer
+        those), with bounds inside a day, or needing untracked fields.
+        """
+        if not plan.since and not plan.until:
+            return None
+        start_day = day_bound(plan.since) if plan.since else None
+        end_day = day_bound(plan.until) if plan.until else None
+        if (plan.since and start_day is None) or (plan.until and end_day is None):
+            return None
+        fields = set(plan.filters) | set(plan.group_by) | set(plan.defined)
+        if not fields.issubset(DIMENSIONS) or len(plan.numeric) > 1 or not set(plan.numeric) <= set(NUMERIC_MEASURES):
+            return None
+        for aggregate in plan.aggregates:
+            if aggregate.function not in ("COUNT", "SUM", "AVG"):
+                return None
+            if aggregate.field is not None and aggregate.field not in NUMERIC_MEASURES:
+                return None
+            if aggregate.field is not None and plan.numeric and aggregate.field != plan.numeric[0]:
+                return None
+
+        groups = self._totals(start_day, end_day, plan.filters, plan.group_by, plan.defined)
+        count_position = NUMERIC_MEASURES[plan.numeric[0]][0] if plan.numeric else COUNT
+        if not plan.group_by and not groups:
+            groups[()] = [0] * MEASURE_COUNT
+        rows = []
+        for group_key, values in groups.items():
+            if plan.group_by and not values[count_position]:
+                continue
+            row = {field: value for field, value in zip(plan.group_by, group_key) if value is not None}
+            for aggregate in plan.aggregates:
+                if aggregate.function == "COUNT":
+                    row[aggregate.alias] = values[count_position]
+                    continue
+                field_count, field_sum = NUMERIC_MEASURES[aggregate.field]
+                if not values[field_count]:
+                    row[aggregate.alias] = None
+                elif aggregate.function == "SUM":
+                    row[aggregate.alias] = values[field_sum]
+                else:
+                    row[aggregate.alias] = values[field_sum] / values[field_count]
+            rows.append(row)
+        return rows
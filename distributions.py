@@ -0,0 +1,314 @@
+# distributions.py
+import math
+import random
+import threading
+from datetime import datetime
+
+from shipment_store import normalize_filters
+
+# Sketches are kept per combination of these fields; any filter or grouping
+# over them is answered by merging the matching cells.
+DIMENSIONS = ("Carrier", "DeliveryStatus", "ServiceType", "Priority")
+GROUP_FIELDS = ("Carrier", "ServiceType", "Priority")
+# Measures sketched, in measure_values() order.
+MEASURES = ("CostUSD", "WeightKG", "DeliveryDays")
+# Document fields the sketches need; pass as `fields` when scanning a store.
+DISTRIBUTION_FIELDS = ("id", "ShipmentID", "CostUSD", "WeightKG", "ShipmentDate", "DeliveryDate") + DIMENSIONS
+
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+DEFAULT_BINS = 20
+MAX_BINS = 100
+# KLL accuracy parameter: rank error is roughly 1.7 / k (about 1% at 200).
+DEFAULT_K = 200
+# Share of documents whose earlier values are still counted (updates and
+# deletes cannot be taken out of a sketch) before a rebuild is due.
+REBUILD_FRACTION = 0.05
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+def _delivery_days(document):
+    shipped, delivered = document.get('ShipmentDate'), document.get('DeliveryDate')
+    if not isinstance(shipped, str) or not isinstance(delivered, str) or not shipped or not delivered:
+        return None
+    try:
+        days = datetime.fromisoformat(delivered.rstrip('Z')) - datetime.fromisoformat(shipped.rstrip('Z'))
+    except ValueError:
+        return None
+    return days.total_seconds() / 86400.0
+
+
+def measure_values(document):
+    """(CostUSD, WeightKG, DeliveryDays) of a document, None where missing."""
+    cost, weight = document.get('CostUSD'), document.get('WeightKG')
+    return (cost if _is_number(cost) else None, weight if _is_number(weight) else None, _delivery_days(document))
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty). Values go into a stack of
+    compactors; a full compactor sorts itself and promotes every other item
+    to the level above, where each item stands for twice as many values.
+    Space stays around 3k items however many values are added, and two
+    sketches merge by concatenating their levels and compacting, so sketches
+    kept per cell can be combined for any filter combination.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.compactors = [[]]
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._size = 0
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def add(self, value):
+        self.compactors[0].append(value)
+        self._size += 1
+        self.count += 1
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+        if self._size >= self._max_size():
+            self._compress()
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            items.sort()
+            # Keep the odd item out at this level; promote every other one of the rest.
+            kept = items.pop() if len(items) % 2 else None
+            self.compactors[level + 1].extend(items[random.getrandbits(1)::2])
+            self.compactors[level] = [kept] if kept is not None else []
+            self._size = sum(len(compactor) for compactor in self.compactors)
+            if self._size < self._max_size():
+                break
+
+    def merge(self, other):
+        """Adds every value summarized by `other` to this sketch."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None or value < self.min else self.min
+                self.max = value if self.max is None or value > self.max else self.max
+        self._size = sum(len(compactor) for compactor in self.compactors)
+        while self._size >= self._max_size():
+            before = self._size
+            self._compress()
+            if self._size == before:
+                break
+        return self
+
+    def _weighted(self):
+        items = sorted((value, 1 << level) for level, compactor in enumerate(self.compactors) for value in compactor)
+        total = sum(weight for _, weight in items)
+        return items, total
+
+    def quantile(self, q):
+        items, total = self._weighted()
+        if not items:
+            return None
+        target, seen = q * total, 0
+        for value, weight in items:
+            seen += weight
+            if seen >= target:
+                return value
+        return items[-1][0]
+
+    def cdf(self, points):
+        """Estimated share of values <= each of the ascending `points`."""
+        items, total = self._weighted()
+        shares, position, seen = [], 0, 0
+        for point in points:
+            while position < len(items) and items[position][0] <= point:
+                seen += items[position][1]
+                position += 1
+            shares.append(seen / total if total else 0.0)
+        return shares
+
+    def summary(self, bins=DEFAULT_BINS):
+        """Count, min/max, p50/p90/p99 and an equal-width histogram over [min, max]."""
+        if not self.count:
+            return {"count": 0}
+        result = {"count": self.count, "min": self.min, "max": self.max}
+        for name, q in QUANTILES:
+            result[name] = self.quantile(q)
+        width = (self.max - self.min) / bins if self.max > self.min else 0
+        edges = [self.min + width * position for position in range(1, bins)]
+        shares = [0.0] + self.cdf(edges) + [1.0]
+        result["histogram"] = [
+            {"lower": round(self.min + width * position, 4),
+             "upper": round(self.min + width * (position + 1), 4),
+             "count": round((shares[position + 1] - shares[position]) * self.count)}
+            for position in range(bins if width else 1)
+        ]
+        if not width:
+            result["histogram"][0]["count"] = self.count
+        return result
+
+    def to_state(self):
+        return {"k": self.k, "count": self.count, "min": self.min, "max": self.max, "compactors": self.compactors}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state["k"])
+        sketch.compactors = [list(items) for items in state["compactors"]]
+        sketch.count, sketch.min, sketch.max = state["count"], state["min"], state["max"]
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        return sketch
+
+
+class DistributionSketches:
+    """
+    A KLL sketch per measure (cost, weight, delivery days) for every
+    Carrier x DeliveryStatus x ServiceType x Priority cell, maintained from
+    document changes like DailyRollups. Percentiles for a filter and grouping
+    merge the matching cells' sketches instead of sorting raw rows.
+
+    A sketch cannot forget a value, so updates and deletes leave the old
+    values counted; once those exceed REBUILD_FRACTION of the documents,
+    needs_rebuild() turns true and rebuild() starts over from a scan.
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self._lock = threading.Lock()
+        # dimension key -> [sketch per measure]
+        self._cells = {}
+        # id -> dimension key of the values counted for it
+        self._seen = {}
+        self.stale = 0
+        self.ready = False
+        self.rebuilding = False
+        self._pending = []
+
+    def __len__(self):
+        return len(self._seen)
+
+    def _add(self, cells, seen, shipment_id, document):
+        key = tuple(document.get(field) or None for field in DIMENSIONS)
+        sketches = cells.get(key)
+        if sketches is None:
+            sketches = cells[key] = [KLLSketch(self.k) for _ in MEASURES]
+        for sketch, value in zip(sketches, measure_values(document)):
+            if value is not None:
+                sketch.add(value)
+        seen[shipment_id] = key
+
+    def apply(self, change_type, document):
+        """Applies one change. Usable directly as a ShipmentStore change listener."""
+        shipment_id = document.get('id') or document.get('ShipmentID')
+        if not shipment_id:
+            return
+        with self._lock:
+            if self.rebuilding:
+                self._pending.append((change_type, document))
+            if shipment_id in self._seen:
+                # Its earlier values stay in the sketches until the next rebuild.
+                self.stale += 1
+                if change_type == "delete":
+                    del self._seen[shipment_id]
+            if change_type != "delete":
+                self._add(self._cells, self._seen, shipment_id, document)
+
+    def load(self, documents):
+        """Builds the sketches from a full scan and marks them ready."""
+        for document in documents:
+            self.apply("upsert", document)
+        self.ready = True
+        return self
+
+    def needs_rebuild(self):
+        return self.ready and not self.rebuilding and self.stale > REBUILD_FRACTION * max(len(self._seen), 1)
+
+    def rebuild(self, documents):
+        """
+        Builds fresh sketches from a scan while the current ones keep serving,
+        then swaps them in. Changes applied during the scan are replayed on
+        the new sketches (and counted as stale, since the scan may have seen them).
+        """
+        with self._lock:
+            self.rebuilding = True
+            self._pending = []
+        cells, seen = {}, {}
+        try:
+            for document in documents:
+                shipment_id = document.get('id') or document.get('ShipmentID')
+                if shipment_id:
+                    self._add(cells, seen, shipment_id, document)
+        except Exception:
+            with self._lock:
+                self.rebuilding = False
+            raise
+        with self._lock:
+            self._cells, self._seen, self.stale = cells, seen, 0
+            pending, self._pending = self._pending, []
+            self.rebuilding = False
+        for change_type, document in pending:
+            self.apply(change_type, document)
+        return self
+
+    def query(self, filters=None, group_by=None, bins=DEFAULT_BINS):
+        """
+        Distribution summaries per group: [{group field: value, "count",
+        "CostUSD": {...}, "WeightKG": {...}, "DeliveryDays": {...}}], where
+        each summary has count, min, max, p50/p90/p99 and a histogram.
+        """
+        if group_by is not None and group_by not in GROUP_FIELDS:
+            raise ValueError(f"Cannot group distributions by: {group_by}")
+        filters = [(DIMENSIONS.index(field), value) for field, value in normalize_filters(filters).items()]
+        position = DIMENSIONS.index(group_by) if group_by else None
+        groups = {}
+        with self._lock:
+            for key, sketches in self._cells.items():
+                if any(key[index] != value for index, value in filters):
+                    continue
+                group = key[position] if position is not None else None
+                if position is not None and group is None:
+                    continue
+                merged = groups.get(group)
+                if merged is None:
+                    merged = groups[group] = [KLLSketch(self.k) for _ in MEASURES]
+                for target, sketch in zip(merged, sketches):
+                    target.merge(sketch)
+        if group_by is None and not groups:
+            groups[None] = [KLLSketch(self.k) for _ in MEASURES]
+
+        rows = []
+        for group, sketches in sorted(groups.items(), key=lambda item: item[0] or ""):
+            row = {group_by: group} if group_by else {}
+            for measure, sketch in zip(MEASURES, sketches):
+                row[measure] = sketch.summary(bins)
+            rows.append(row)
+        return rows
+
+    def export_state(self):
+        """The cell sketches as plain lists, for from_state() in another process (see shared_aggregates.py)."""
+        with self._lock:
+            cells = [[list(key), [sketch.to_state() for sketch in sketches]] for key, sketches in self._cells.items()]
+        return {"ready": self.ready, "cells": cells}
+
+    @classmethod
+    def from_state(cls, state):
+        """Read-only sketches rebuilt from export_state(); apply() must not be used."""
+        sketches = cls()
+        sketches._cells = {tuple(key): [KLLSketch.from_state(sketch) for sketch in cell]
+                           for key, cell in state["cells"]}
+        sketches.ready = state["ready"]
+        return sketches
@@ -0,0 +1,92 @@
+# export.py
+import csv
+import io
+import json
+
+from shipment_store import SHIPMENT_FIELDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Columns of an exported CSV, in the order import_data.py reads them.
+EXPORT_FIELDS = tuple(field for field in SHIPMENT_FIELDS if field != "id")
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+# Rows encoded into each chunk written to the client.
+ROWS_PER_CHUNK = 500
+# Stored as ISO timestamps, but imported from CSV as plain YYYY-MM-DD days.
+CSV_DATE_FIELDS = ("ShipmentDate", "DeliveryDate")
+
+
+def _batches(documents, size=ROWS_PER_CHUNK):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_row(document):
+    """The document with its dates cut to the day, as the importers expect them."""
+    row = dict(document)
+    for field in CSV_DATE_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            row[field] = value[:10]
+    return row
+
+
+def iter_csv(documents, fields=EXPORT_FIELDS):
+    """
+    Encodes a stream of documents as CSV text chunks, header first, in the
+    layout import_data.py and ingest_pipeline.py read back.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in _batches(documents):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_csv_row(document) for document in batch)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(documents, fields=EXPORT_FIELDS):
+    """Encodes a stream of documents as newline-delimited JSON chunks."""
+    for batch in _batches(documents):
+        rows = ({field: document.get(field) for field in fields} for document in batch)
+        if orjson is not None:
+            yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+        else:
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def stream_export(documents, export_format, on_close=None):
+    """
+    Yields the encoded export of `documents` (any iterator, e.g.
+    ShipmentStore.iter_sorted). The WSGI server asks for the next chunk
+    only once the previous one was written to the socket, so a slow client
+    stops the underlying query paging and memory stays at one page plus
+    one chunk. `on_close` runs when the stream ends or the client goes away.
+    """
+    encode = iter_csv if export_format == "csv" else iter_ndjson
+    try:
+        yield from encode(documents)
+    except Exception as e:
+        # Headers are already sent: abort the transfer so the client sees an incomplete download.
+        print(f"Export stream failed: {e}")
+        raise
+    finally:
+        close = getattr(documents, "close", None)
+        if close is not None:
+            close()
+        if on_close is not None:
+            on_close()
@@ -0,0 +1,44 @@
+# facets.py
+from aggregate_queries import Aggregate, AggregatePlan
+
+# Fields offered as filter dropdowns.
+FACET_FIELDS = ("Carrier", "DeliveryStatus", "ServiceType", "Priority")
+
+
+def facet_cube_plan():
+    """
+    Shipment counts grouped by every facet field at once. The result has at
+    most one row per combination of values (a few hundred), and facet counts
+    for any filter combination can be derived from it without another query.
+    LiveAggregates answer it from their cells; on Cosmos DB the four fields
+    are streamed and counted client-side (see CosmosAggregateExecutor).
+    """
+    return AggregatePlan([Aggregate("ShipmentCount", "COUNT")], group_by=FACET_FIELDS)
+
+
+def facet_counts(cube_rows, filters):
+    """
+    Returns {field: [{"value", "count"}, ...]} for each facet field from
+    facet_cube_plan rows.
+
+    A field's counts apply every filter except its own, so each dropdown
+    shows how many shipments picking that value would give. Values that
+    exist but do not match the other filters are listed with count 0, so
+    the options do not change as filters are picked.
+    """
+    filters = {field: value for field, value in (filters or {}).items() if value and field in FACET_FIELDS}
+    counts = {field: {} for field in FACET_FIELDS}
+    for row in cube_rows:
+        count = row.get("ShipmentCount") or 0
+        mismatched = [field for field, value in filters.items() if row.get(field) != value]
+        for field in FACET_FIELDS:
+            value = row.get(field)
+            if not value:
+                continue
+            # Matches every filter other than its own field's.
+            matches = not mismatched or mismatched == [field]
+            counts[field][value] = counts[field].get(value, 0) + (count if matches else 0)
+    return {
+        field: [{"value": value, "count": count} for value, count in sorted(values.items())]
+        for field, values in counts.items()
+    }
@@ -0,0 +1,131 @@
+# generate_shipments.py
+import argparse
+import csv
+import time
+from datetime import date
+
+import numpy as np
+
+CSV_COLUMNS = ["ShipmentID", "Origin", "Destination", "Carrier", "DeliveryStatus", "ServiceType",
+               "WeightKG", "DistanceKM", "CostUSD", "ShipmentDate", "DeliveryDate", "Priority"]
+
+# Values and relative frequencies. Carriers and cities follow a Zipf-like
+# long tail; statuses, service types and priorities are fixed mixes.
+CARRIERS = ["DHL", "FedEx", "UPS", "USPS", "Royal Mail", "DPD", "GLS", "TNT", "Aramex", "Purolator"]
+CARRIER_WEIGHTS = [1.0 / (rank + 1) ** 1.1 for rank in range(len(CARRIERS))]
+CITIES = ["London", "New York", "Berlin", "Paris", "Tokyo", "Sydney", "Toronto", "Madrid", "Rome", "Dubai",
+          "Singapore", "Hamburg", "Lyon", "Chicago", "Mumbai", "Sao Paulo", "Seoul", "Amsterdam", "Dublin", "Cairo"]
+CITY_WEIGHTS = [1.0 / (rank + 1) ** 0.8 for rank in range(len(CITIES))]
+STATUSES = ["Delivered", "In Transit", "Delayed", "Cancelled"]
+STATUS_WEIGHTS = [0.72, 0.14, 0.10, 0.04]
+SERVICE_TYPES = ["Standard", "Express", "Same Day", "Overnight"]
+SERVICE_WEIGHTS = [0.58, 0.27, 0.05, 0.10]
+# Cost multiplier and typical transit days per service type.
+SERVICE_COST_FACTORS = np.array([1.0, 1.8, 3.5, 2.6])
+SERVICE_TRANSIT_DAYS = np.array([5.0, 2.0, 0.0, 1.0])
+PRIORITIES = ["Low", "Medium", "High"]
+PRIORITY_WEIGHTS = [0.35, 0.45, 0.20]
+
+DEFAULT_ROWS = 10000
+DEFAULT_SEED = 42
+DEFAULT_START = "2023-01-01"
+DEFAULT_END = "2025-12-31"
+CHUNK_ROWS = 100000
+
+
+def _probabilities(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _dates(rng, count, start, end):
+    """
+    Day offsets in [start, end] with volume growing over the range and a
+    weekday/weekend pattern, so recent windows hold more shipments.
+    """
+    span = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+    # Linear growth: density proportional to 1 + 2x over the range.
+    growth = (np.sqrt(1 + 8 * rng.random(count)) - 1) / 2
+    offsets = np.minimum((growth * span).astype(np.int64), span - 1)
+    weekday = (offsets + date.fromisoformat(start).weekday()) % 7
+    # Move most weekend shipments to the following Monday.
+    weekend = (weekday >= 5) & (rng.random(count) < 0.7)
+    offsets = np.where(weekend, np.minimum(offsets + (7 - weekday), span - 1), offsets)
+    return np.datetime64(start, 'D') + offsets
+
+
+def generate_chunk(rng, first_id, count, start=DEFAULT_START, end=DEFAULT_END):
+    """Returns one chunk of `count` rows as a dict of column name -> NumPy array."""
+    carriers = rng.choice(len(CARRIERS), count, p=_probabilities(CARRIER_WEIGHTS))
+    services = rng.choice(len(SERVICE_TYPES), count, p=_probabilities(SERVICE_WEIGHTS))
+    priorities = rng.choice(len(PRIORITIES), count, p=_probabilities(PRIORITY_WEIGHTS))
+    origins = rng.choice(len(CITIES), count, p=_probabilities(CITY_WEIGHTS))
+    destinations = (origins + 1 + rng.choice(len(CITIES) - 1, count)) % len(CITIES)
+
+    # Smaller carriers are late more often.
+    status_probabilities = np.tile(_probabilities(STATUS_WEIGHTS), (len(CARRIERS), 1))
+    status_probabilities[:, 2] *= 1 + np.arange(len(CARRIERS)) * 0.15
+    status_probabilities /= status_probabilities.sum(axis=1, keepdims=True)
+    cumulative = status_probabilities.cumsum(axis=1)[carriers]
+    statuses = (rng.random(count)[:, None] > cumulative).sum(axis=1)
+    statuses = np.minimum(statuses, len(STATUSES) - 1)
+
+    weights = np.round(np.clip(rng.lognormal(2.3, 0.9, count), 0.1, 2000.0), 2)
+    distances = np.round(np.clip(rng.lognormal(6.0, 1.1, count), 5.0, 20000.0), 1)
+    costs = (4.0 + 0.35 * weights + 0.02 * distances) * SERVICE_COST_FACTORS[services]
+    costs = np.round(costs * rng.lognormal(0.0, 0.25, count), 2)
+
+    shipment_dates = _dates(rng, count, start, end)
+    transit = SERVICE_TRANSIT_DAYS[services] + rng.poisson(1.0, count)
+    transit = transit + np.where(statuses == 2, rng.integers(2, 15, count), 0)
+    delivery_dates = shipment_dates + transit.astype(np.int64)
+    delivery_strings = np.datetime_as_string(delivery_dates, unit='D').astype(object)
+    # Shipments still moving or cancelled have no delivery date.
+    delivery_strings[(statuses == 1) | (statuses == 3)] = ""
+
+    ids = np.char.add("SHP", np.char.zfill(np.arange(first_id, first_id + count).astype(str), 9))
+    return {
+        "ShipmentID": ids,
+        "Origin": np.array(CITIES, dtype=object)[origins],
+        "Destination": np.array(CITIES, dtype=object)[destinations],
+        "Carrier": np.array(CARRIERS, dtype=object)[carriers],
+        "DeliveryStatus": np.array(STATUSES, dtype=object)[statuses],
+        "ServiceType": np.array(SERVICE_TYPES, dtype=object)[services],
+        "WeightKG": weights,
+        "DistanceKM": distances,
+        "CostUSD": costs,
+        "ShipmentDate": np.datetime_as_string(shipment_dates, unit='D'),
+        "DeliveryDate": delivery_strings,
+        "Priority": np.array(PRIORITIES, dtype=object)[priorities],
+    }
+
+
+def iter_chunks(rows, seed=DEFAULT_SEED, start=DEFAULT_START, end=DEFAULT_END, chunk_rows=CHUNK_ROWS):
+    """Yields the column chunks for `rows` shipments. The same arguments always give the same data."""
+    rng = np.random.default_rng(seed)
+    for first in range(0, rows, chunk_rows):
+        yield generate_chunk(rng, first, min(chunk_rows, rows - first), start, end)
+
+
+def write_csv(path, rows=DEFAULT_ROWS, seed=DEFAULT_SEED, start=DEFAULT_START, end=DEFAULT_END):
+    """Writes `rows` shipments to `path` in the CSV format import_data.py reads."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for chunk in iter_chunks(rows, seed, start, end):
+            writer.writerows(zip(*(chunk[column].tolist() for column in CSV_COLUMNS)))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic shipments CSV.")
+    parser.add_argument("csv_file_path")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="number of shipments (10k to 10M)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--start", default=DEFAULT_START, help="first ShipmentDate (YYYY-MM-DD)")
+    parser.add_argument("--end", default=DEFAULT_END, help="last ShipmentDate (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    write_csv(args.csv_file_path, args.rows, args.seed, args.start, args.end)
+    print(f"Wrote {args.rows} shipments to {args.csv_file_path} in {time.time() - start_time:.2f} seconds.")
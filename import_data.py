@@ -1,27 +1,85 @@
+import argparse
 import csv
 import os
 import time
 from datetime import datetime
-from azure.cosmos import CosmosClient, PartitionKey
+from azure.cosmos import CosmosClient
+
+from bulk_import import BulkImporter
+from ingest_pipeline import DEFAULT_CHUNK_ROWS, run_pipeline
 COSMOS_DB_ENDPOINT = os.getenv("COSMOS_DB_ENDPOINT")
 COSMOS_DB_KEY = os.getenv("COSMOS_DB_KEY")
 COSMOS_DB_DATABASE_ID = os.getenv("COSMOS_DB_DATABASE_ID")
 COSMOS_DB_CONTAINER_ID = os.getenv("COSMOS_DB_CONTAINER_ID")
 
 COSMOS_DB_PARTITION_KEY_PATH = "/ShipmentID"
+# Throttle retries left to the SDK in --bulk/--chunked mode. BulkImporter backs
+# off and lowers its concurrency on 429s, so it has to see them.
+BULK_THROTTLE_RETRIES = 0
 cosmos_client = None
 shipments_container = None
+
+
 #initialising
-try:
-    client = CosmosClient(COSMOS_DB_ENDPOINT, credential=COSMOS_DB_KEY)
-    database = client.get_database_client(COSMOS_DB_DATABASE_ID)
-    container = database.get_container_client(COSMOS_DB_CONTAINER_ID)
-    print(f"Successfully connected to Cosmos DB account: {COSMOS_DB_ENDPOINT}")
-    print(f"Using database: {COSMOS_DB_DATABASE_ID}, container: {COSMOS_DB_CONTAINER_ID}")
-except Exception as e:
-    print(f"Error connecting to Cosmos DB: {e}")
-    print("Please ensure COSMOS_DB_ENDPOINT and COSMOS_DB_KEY are correctly set.")
-    exit()  #failed
+def connect_container(throttle_retries=None):
+    """
+    Connects to the configured container, exiting if the connection fails.
+    `throttle_retries` caps the SDK's own retries of 429 responses (default: the SDK's).
+    """
+    try:
+        kwargs = {} if throttle_retries is None else {"retry_throttle_total": throttle_retries}
+        client = CosmosClient(COSMOS_DB_ENDPOINT, credential=COSMOS_DB_KEY, **kwargs)
+        database = client.get_database_client(COSMOS_DB_DATABASE_ID)
+        container = database.get_container_client(COSMOS_DB_CONTAINER_ID)
+        print(f"Successfully connected to Cosmos DB account: {COSMOS_DB_ENDPOINT}")
+        print(f"Using database: {COSMOS_DB_DATABASE_ID}, container: {COSMOS_DB_CONTAINER_ID}")
+        return container
+    except Exception as e:
+        print(f"Error connecting to Cosmos DB: {e}")
+        print("Please ensure COSMOS_DB_ENDPOINT and COSMOS_DB_KEY are correctly set.")
+        exit()  #failed
+
+
+def row_to_item(row):
+    """
+    Converts one CSV row into a Cosmos DB document.
+    Raises ValueError or KeyError when the row cannot be converted.
+    """
+    item_data = {}
+    # Type Conversion and Data Cleaning
+    # Ensure numeric fields are correctly converted to float
+    item_data['ShipmentID'] = row.get('ShipmentID')
+    if not item_data['ShipmentID']:
+        raise ValueError("ShipmentID is missing or empty.")
+
+    # Cosmos DB 'id' field must be a unique string.
+    # Use ShipmentID for this, it's also your partition key.
+    item_data['id'] = str(item_data['ShipmentID'])
+
+    item_data['Origin'] = row.get('Origin')
+    item_data['Destination'] = row.get('Destination')
+    item_data['WeightKG'] = float(row['WeightKG']) if row.get('WeightKG') else 0.0
+    item_data['DistanceKM'] = float(row['DistanceKM']) if row.get('DistanceKM') else 0.0
+    item_data['DeliveryStatus'] = row.get('DeliveryStatus')
+
+    # Convert dates to ISO 8601 string format, adding 'Z' for UTC
+    item_data['ShipmentDate'] = datetime.strptime(row['ShipmentDate'], '%Y-%m-%d').isoformat() + "Z" \
+        if row.get('ShipmentDate') else None
+    item_data['DeliveryDate'] = datetime.strptime(row['DeliveryDate'], '%Y-%m-%d').isoformat() + "Z" \
+        if row.get('DeliveryDate') else None
+
+    item_data['Carrier'] = row.get('Carrier')
+    item_data['CostUSD'] = float(row['CostUSD']) if row.get('CostUSD') else 0.0
+    item_data['ServiceType'] = row.get('ServiceType')
+    item_data['Priority'] = row.get('Priority')
+
+    # Add the partition key value directly to the item for clarity and consistency
+    # This is crucial for correct item routing
+    # item_data[COSMOS_DB_PARTITION_KEY_PATH.lstrip('/')] = item_data['ShipmentID']
+    # The SDK typically handles this if 'id' matches the partition key path,
+    # but explicit inclusion can sometimes help.
+    # For a partition key of /ShipmentID, the ShipmentID field needs to be present in the document.
+    return item_data
 
 
 # --- Import Function ---
@@ -40,42 +98,8 @@ def import_csv_to_cosmos(csv_file_path, container_client, batch_size=100):
             print(f"Starting import from {csv_file_path}...")
 
             for row_num, row in enumerate(reader):
-                item_data = {}
                 try:
-                    # Type Conversion and Data Cleaning
-                    # Ensure numeric fields are correctly converted to float
-                    item_data['ShipmentID'] = row.get('ShipmentID')
-                    if not item_data['ShipmentID']:
-                        raise ValueError("ShipmentID is missing or empty.")
-
-                    # Cosmos DB 'id' field must be a unique string.
-                    # Use ShipmentID for this, it's also your partition key.
-                    item_data['id'] = str(item_data['ShipmentID'])
-
-                    item_data['Origin'] = row.get('Origin')
-                    item_data['Destination'] = row.get('Destination')
-                    item_data['WeightKG'] = float(row['WeightKG']) if row.get('WeightKG') else 0.0
-                    item_data['DistanceKM'] = float(row['DistanceKM']) if row.get('DistanceKM') else 0.0
-                    item_data['DeliveryStatus'] = row.get('DeliveryStatus')
-
-                    # Convert dates to ISO 8601 string format, adding 'Z' for UTC
-                    item_data['ShipmentDate'] = datetime.strptime(row['ShipmentDate'], '%Y-%m-%d').isoformat() + "Z" \
-                        if row.get('ShipmentDate') else None
-                    item_data['DeliveryDate'] = datetime.strptime(row['DeliveryDate'], '%Y-%m-%d').isoformat() + "Z" \
-                        if row.get('DeliveryDate') else None
-
-                    item_data['Carrier'] = row.get('Carrier')
-                    item_data['CostUSD'] = float(row['CostUSD']) if row.get('CostUSD') else 0.0
-                    item_data['ServiceType'] = row.get('ServiceType')
-                    item_data['Priority'] = row.get('Priority')
-
-                    # Add the partition key value directly to the item for clarity and consistency
-                    # This is crucial for correct item routing
-                    # item_data[COSMOS_DB_PARTITION_KEY_PATH.lstrip('/')] = item_data['ShipmentID']
-                    # The SDK typically handles this if 'id' matches the partition key path,
-                    # but explicit inclusion can sometimes help.
-                    # For a partition key of /ShipmentID, the ShipmentID field needs to be present in the document.
-
+                    item_data = row_to_item(row)
                     items_to_create.append(item_data)
                     processed_count += 1
 
@@ -118,8 +142,81 @@ def import_csv_to_cosmos(csv_file_path, container_client, batch_size=100):
         print(f"An unexpected error occurred during the overall import process: {e}")
 
 
+def iter_csv_items(csv_file_path):
+    """Yields converted documents from the CSV, skipping rows that fail conversion."""
+    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
+        for row_num, row in enumerate(csv.DictReader(csvfile)):
+            try:
+                yield row_to_item(row)
+            except (ValueError, KeyError) as e:
+                print(f"Skipping row {row_num + 1} due to data conversion error: {e} - Row data: {row}")
+
+
+def bulk_import_csv_to_cosmos(csv_file_path, container_client, workers=16, ru_budget=None):
+    """
+    Imports a CSV with parallel, idempotent upserts. Throttled writes are
+    retried using the server's retry-after hint and concurrency adapts to
+    stay within `ru_budget` RU/s when one is given.
+    """
+    print(f"Starting bulk import from {csv_file_path} with up to {workers} workers...")
+    importer = BulkImporter(container_client, max_workers=workers, ru_budget=ru_budget)
+    try:
+        report = importer.import_items(iter_csv_items(csv_file_path))
+    except FileNotFoundError:
+        print(f"Error: CSV file not found at {csv_file_path}. Please check the path.")
+        return None
+    report.print_summary()
+    return report
+
+
+def chunked_import_csv_to_cosmos(csv_file_path, container_client, checkpoint_path=None, reject_path=None,
+                                 chunk_rows=DEFAULT_CHUNK_ROWS, workers=16, ru_budget=None):
+    """
+    Resumable import: converts the CSV in vectorized chunks, bulk-upserts each
+    chunk and checkpoints after it is committed. Rerunning with the same
+    checkpoint file continues after the last committed chunk; rows that fail
+    conversion are written to `reject_path` with the reason.
+    """
+    def write_chunk(documents):
+        importer = BulkImporter(container_client, max_workers=workers, ru_budget=ru_budget, progress_every=0)
+        report = importer.import_items(documents)
+        if report.failed:
+            # Stop before the checkpoint moves past this chunk; the rerun retries it.
+            raise RuntimeError(f"{report.failed} upserts failed in this chunk, e.g. {report.errors[:3]}")
+
+    try:
+        return run_pipeline(csv_file_path, write_chunk, checkpoint_path=checkpoint_path,
+                            reject_path=reject_path, chunk_rows=chunk_rows)
+    except FileNotFoundError:
+        print(f"Error: CSV file not found at {csv_file_path}. Please check the path.")
+        return None
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import shipments from a CSV file into Cosmos DB.")
+    parser.add_argument("csv_file_path", nargs="?", default="CSV_FILE_PATH")
+    parser.add_argument("--bulk", action="store_true", help="use parallel, throttle-aware upserts")
+    parser.add_argument("--workers", type=int, default=16, help="maximum concurrent writes in bulk mode")
+    parser.add_argument("--ru-budget", type=float, default=None, help="target RU/s for bulk mode")
+    parser.add_argument("--chunked", action="store_true",
+                        help="resumable import in vectorized chunks with checkpoints and a reject file")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <csv>.checkpoint.json)")
+    parser.add_argument("--rejects", default=None, help="reject file (default: <csv>.rejects.csv)")
+    args = parser.parse_args()
+
     if not all([COSMOS_DB_ENDPOINT, COSMOS_DB_KEY]):
         print("ERROR: Please set COSMOS_DB_ENDPOINT and COSMOS_DB_KEY environment variables or replace placeholders.")
     else:
-        import_csv_to_cosmos("CSV_FILE_PATH", container)
\ No newline at end of file
+        container = connect_container(BULK_THROTTLE_RETRIES if args.bulk or args.chunked else None)
+        if args.chunked:
+            chunked_import_csv_to_cosmos(
+                args.csv_file_path, container,
+                checkpoint_path=args.checkpoint or args.csv_file_path + ".checkpoint.json",
+                reject_path=args.rejects or args.csv_file_path + ".rejects.csv",
+                chunk_rows=args.chunk_rows, workers=args.workers, ru_budget=args.ru_budget,
+            )
+        elif args.bulk:
+            bulk_import_csv_to_cosmos(args.csv_file_path, container, workers=args.workers, ru_budget=args.ru_budget)
+        else:
+            import_csv_to_cosmos(args.csv_file_path, container)
\ No newline at end of file
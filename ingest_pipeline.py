@@ -0,0 +1,242 @@
+# ingest_pipeline.py
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 10000
+
+# Column conversions applied by import_data.row_to_item, expressed per column.
+NUMERIC_COLUMNS = ("WeightKG", "DistanceKM", "CostUSD")
+DATE_COLUMNS = ("ShipmentDate", "DeliveryDate")
+TEXT_COLUMNS = ("Origin", "Destination", "DeliveryStatus", "Carrier", "ServiceType", "Priority")
+
+
+# --- Checkpoints ---
+
+def load_checkpoint(path, csv_file_path):
+    """Returns the saved checkpoint for `csv_file_path`, or None to start from the top."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("csv") != os.path.abspath(csv_file_path):
+        print(f"Ignoring checkpoint {path}: it was written for {checkpoint.get('csv')}.")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """Writes the checkpoint atomically so a crash never leaves a half-written file."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+# --- Reading ---
+
+def read_chunks(csv_file_path, chunk_rows=DEFAULT_CHUNK_ROWS, start_offset=None, start_row=0):
+    """
+    Yields (header, rows, first_row_number, end_offset) for consecutive chunks
+    of at most `chunk_rows` data rows, starting at byte `start_offset`.
+
+    Offsets are tracked per line, so quoted fields must not contain newlines
+    (the shipment CSVs never do).
+    """
+    with open(csv_file_path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+        if start_offset:
+            f.seek(start_offset)
+        row_number = start_row
+        while True:
+            lines = []
+            for _ in range(chunk_rows):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line.decode('utf-8'))
+            if not lines:
+                return
+            rows = list(csv.reader(lines))
+            yield header, rows, row_number, f.tell()
+            row_number += len(lines)
+
+
+# --- Vectorized conversion ---
+
+def _to_float(values, reasons, column):
+    """Converts a column of strings to float64; empty strings become 0.0 like the serial importer."""
+    empty = values == ""
+    filled = np.where(empty, "0", values)
+    try:
+        return filled.astype(np.float64)
+    except ValueError:
+        # Rare slow path: find the offending rows and reject only those.
+        converted = np.zeros(len(values), dtype=np.float64)
+        for i, value in enumerate(filled):
+            try:
+                converted[i] = float(value)
+            except ValueError:
+                reasons[i] = reasons[i] or f"{column}: could not convert {str(value)!r} to float"
+        return converted
+
+
+def _to_iso_dates(values, reasons, column):
+    """Parses YYYY-MM-DD strings and returns ISO 8601 UTC strings ("...T00:00:00Z") or None."""
+    empty = values == ""
+    filled = np.where(empty, "1970-01-01", values)
+    try:
+        parsed = filled.astype("datetime64[D]")
+        # datetime64 also accepts forms like "2024-01"; insist on exactly YYYY-MM-DD.
+        invalid = np.datetime_as_string(parsed, unit='D') != filled
+    except ValueError:
+        parsed = np.empty(len(values), dtype="datetime64[D]")
+        invalid = np.zeros(len(values), dtype=bool)
+        for i, value in enumerate(filled):
+            try:
+                parsed[i] = np.datetime64(value, 'D')
+                invalid[i] = np.datetime_as_string(parsed[i], unit='D') != value
+            except ValueError:
+                invalid[i] = True
+    for i in np.flatnonzero(invalid):
+        reasons[i] = reasons[i] or f"{column}: {str(values[i])!r} does not match format '%Y-%m-%d'"
+    iso = np.char.add(np.datetime_as_string(parsed, unit='s'), "Z").astype(object)
+    iso[empty] = None
+    return iso
+
+
+def convert_chunk(header, rows):
+    """
+    Converts a chunk of raw CSV rows into Cosmos DB documents column by column.
+    Returns (documents, rejects) where rejects is a list of (row index, row, reason).
+    """
+    width = len(header)
+    count = len(rows)
+    reasons = np.full(count, "", dtype=object)
+    for i, row in enumerate(rows):
+        if row and len(row) != width:
+            reasons[i] = f"expected {width} columns, found {len(row)}"
+    padded = [row[:width] + [""] * (width - len(row)) for row in rows]
+    table = np.array(padded, dtype=str).reshape(count, width)
+
+    def column(name):
+        if name in header:
+            return table[:, header.index(name)]
+        return np.full(count, "", dtype=str)
+
+    ids = column("ShipmentID")
+    for i in np.flatnonzero(ids == ""):
+        reasons[i] = reasons[i] or "ShipmentID is missing or empty."
+
+    converted = {}
+    for name in NUMERIC_COLUMNS:
+        converted[name] = _to_float(column(name), reasons, name)
+    for name in DATE_COLUMNS:
+        converted[name] = _to_iso_dates(column(name), reasons, name)
+    for name in TEXT_COLUMNS:
+        converted[name] = column(name)
+
+    documents = []
+    rejects = []
+    for i in range(count):
+        if not rows[i]:
+            continue  # blank line
+        if reasons[i]:
+            rejects.append((i, rows[i], reasons[i]))
+            continue
+        documents.append({
+            'ShipmentID': ids[i].item(),
+            'id': ids[i].item(),
+            'Origin': converted['Origin'][i].item(),
+            'Destination': converted['Destination'][i].item(),
+            'WeightKG': converted['WeightKG'][i].item(),
+            'DistanceKM': converted['DistanceKM'][i].item(),
+            'DeliveryStatus': converted['DeliveryStatus'][i].item(),
+            'ShipmentDate': converted['ShipmentDate'][i],
+            'DeliveryDate': converted['DeliveryDate'][i],
+            'Carrier': converted['Carrier'][i].item(),
+            'CostUSD': converted['CostUSD'][i].item(),
+            'ServiceType': converted['ServiceType'][i].item(),
+            'Priority': converted['Priority'][i].item(),
+        })
+    return documents, rejects
+
+
+# --- Pipeline ---
+
+class RejectWriter:
+    """Appends rejected rows, with their row number and reason, to a CSV file."""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.count = 0
+
+    def write(self, first_row_number, rejects):
+        if not rejects or not self.path:
+            self.count += len(rejects)
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["RowNumber", "RejectReason"] + self.header)
+            for index, row, reason in rejects:
+                writer.writerow([first_row_number + index + 1, reason] + row)
+        self.count += len(rejects)
+
+
+def run_pipeline(csv_file_path, write_documents, checkpoint_path=None, reject_path=None,
+                 chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Streams `csv_file_path` through convert_chunk in fixed-size chunks and
+    passes each chunk's documents to `write_documents(documents)`. After the
+    write returns, a checkpoint (byte offset + row number) is saved, so a rerun
+    with the same checkpoint_path resumes at the first uncommitted chunk.
+    """
+    checkpoint = load_checkpoint(checkpoint_path, csv_file_path) or {
+        "csv": os.path.abspath(csv_file_path),
+        "offset": None,
+        "row": 0,
+        "imported": 0,
+        "rejected": 0,
+    }
+    if checkpoint["row"]:
+        print(f"Resuming {csv_file_path} at row {checkpoint['row']} (byte {checkpoint['offset']}).")
+
+    start_time = time.time()
+    rejects_writer = None
+    imported_this_run = 0
+    for header, rows, first_row, end_offset in read_chunks(csv_file_path, chunk_rows,
+                                                           checkpoint["offset"], checkpoint["row"]):
+        if rejects_writer is None:
+            rejects_writer = RejectWriter(reject_path, header)
+        documents, rejects = convert_chunk(header, rows)
+        if documents:
+            write_documents(documents)
+        rejects_writer.write(first_row, rejects)
+
+        imported_this_run += len(documents)
+        checkpoint.update(
+            offset=end_offset,
+            row=first_row + len(rows),
+            imported=checkpoint["imported"] + len(documents),
+            rejected=checkpoint["rejected"] + len(rejects),
+        )
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, checkpoint)
+        print(f"Committed rows {first_row + 1}-{first_row + len(rows)} "
+              f"({len(documents)} imported, {len(rejects)} rejected).")
+
+    duration = time.time() - start_time
+    print("\n--- Chunked Import Summary ---")
+    print(f"Rows read: {checkpoint['row']}")
+    print(f"Total items imported: {checkpoint['imported']} ({imported_this_run} this run)")
+    print(f"Total rows rejected: {checkpoint['rejected']}" + (f" (see {reject_path})" if reject_path else ""))
+    print(f"Duration this run: {duration:.2f} seconds")
+    return checkpoint
@@ -0,0 +1,178 @@
+# live_updates.py
+import threading
+import time
+
+from result_cache import cache_key
+from shipment_store import normalize_filters
+
+DEFAULT_COALESCE_SECONDS = 0.5
+# Dashboard fields sent as plain counters in a delta.
+COUNTER_FIELDS = ("totalShipments", "totalDelayedShipments", "ordersPast3Months", "delayedPast3Months")
+
+
+def dashboard_delta(previous, current):
+    """
+    Compact difference between two dashboard snapshots: only the counters
+    that changed, the carrier averages that changed (None for a carrier that
+    disappeared) and the top-5 list if its entries changed. Returns None
+    when nothing changed.
+    """
+    delta = {}
+    counters = {field: current[field] for field in COUNTER_FIELDS if previous.get(field) != current[field]}
+    if counters:
+        delta["counters"] = counters
+
+    before = {row["carrier"]: row["averageCost"] for row in previous.get("avgCostByCarrierData", [])}
+    after = {row["carrier"]: row["averageCost"] for row in current["avgCostByCarrierData"]}
+    averages = {carrier: average for carrier, average in after.items() if before.get(carrier) != average}
+    averages.update({carrier: None for carrier in before if carrier not in after})
+    if averages:
+        delta["avgCostByCarrier"] = averages
+
+    if previous.get("top5ExpensiveShipments") != current["top5ExpensiveShipments"]:
+        delta["top5ExpensiveShipments"] = current["top5ExpensiveShipments"]
+    return delta or None
+
+
+class _Subscription:
+    """State shared by every subscriber of one filter set."""
+
+    def __init__(self, room, filters):
+        self.room = room
+        self.filters = filters
+        self.members = set()
+        self.snapshot = None
+        self.sequence = 0
+        self.dirty = False
+        # Serialises recomputing this room; held without DashboardSubscriptions._lock.
+        self.lock = threading.Lock()
+
+
+class DashboardSubscriptions:
+    """
+    Socket.IO dashboard subscriptions grouped by filter set.
+
+    Every filter set is one room: its snapshot is computed once, no matter how
+    many clients subscribed, and each delta is emitted once to the room.
+    Shipment changes only mark rooms dirty; a flush every `coalesce_seconds`
+    recomputes the dirty rooms, so a burst of writes produces one message per
+    room. Snapshots come from `summary_provider(filters)`, which the app
+    answers from the result cache under the /api/dashboard_summary key, so a
+    room and an HTTP request for the same filters share one computation.
+    """
+
+    def __init__(self, summary_provider, emit, coalesce_seconds=DEFAULT_COALESCE_SECONDS):
+        self._summary_provider = summary_provider
+        self._emit = emit
+        self.coalesce_seconds = coalesce_seconds
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # room -> _Subscription
+        self._rooms_by_member = {}  # sid -> room
+        self._stop = threading.Event()
+        self.computations = 0
+        self.messages = 0
+
+    @staticmethod
+    def room_for(filters):
+        return "dashboard:" + repr(cache_key("dashboard", filters)[1])
+
+    def _refresh(self, subscription):
+        """
+        Recomputes the room's snapshot; the caller holds `subscription.lock`.
+        Returns the delta message to emit, or None when nothing changed.
+        """
+        with self._lock:
+            subscription.dirty = False
+        previous = subscription.snapshot
+        try:
+            current = self._summary_provider(subscription.filters)
+        except Exception:
+            with self._lock:
+                subscription.dirty = True
+            raise
+        with self._lock:
+            self.computations += 1
+        subscription.snapshot = current
+        delta = dashboard_delta(previous, current) if previous is not None else None
+        if delta is None:
+            return None
+        subscription.sequence += 1
+        return {"seq": subscription.sequence, "delta": delta}
+
+    def subscribe(self, sid, filters):
+        """
+        Adds `sid` to the room for `filters` (leaving its previous room) and
+        returns (room, snapshot) for the caller to join and send.
+        """
+        filters = normalize_filters(filters)
+        room = self.room_for(filters)
+        self.unsubscribe(sid)
+        with self._lock:
+            subscription = self._subscriptions.get(room)
+            if subscription is None:
+                subscription = self._subscriptions[room] = _Subscription(room, filters)
+            subscription.members.add(sid)
+            self._rooms_by_member[sid] = room
+        # Computed outside self._lock, so other rooms and change listeners are not blocked.
+        with subscription.lock:
+            if subscription.snapshot is None or subscription.dirty:
+                message = self._refresh(subscription)
+                if message is not None:
+                    # Existing members of the room get the change as a delta.
+                    self._emit("dashboard_delta", message, room)
+            return room, {"seq": subscription.sequence, "snapshot": subscription.snapshot}
+
+    def unsubscribe(self, sid):
+        """Removes `sid`; returns the room it left, or None."""
+        with self._lock:
+            room = self._rooms_by_member.pop(sid, None)
+            subscription = self._subscriptions.get(room)
+            if subscription is not None:
+                subscription.members.discard(sid)
+                if not subscription.members:
+                    del self._subscriptions[room]
+            return room
+
+    def on_store_change(self, change_type, document):
+        """ShipmentStore change listener: marks the affected rooms for the next flush."""
+        with self._lock:
+            for subscription in self._subscriptions.values():
+                # The previous version of the document is unknown, so any room
+                # may have lost it.
+                subscription.dirty = True
+
+    def flush(self):
+        """Recomputes every dirty room and emits its delta. Returns the number of messages sent."""
+        with self._lock:
+            dirty = [subscription for subscription in self._subscriptions.values() if subscription.dirty]
+        sent = 0
+        for subscription in dirty:
+            try:
+                with subscription.lock:
+                    if not subscription.dirty:
+                        continue  # refreshed by a subscribe in the meantime
+                    message = self._refresh(subscription)
+                    if message is None:
+                        continue
+                    self._emit("dashboard_delta", message, subscription.room)
+                sent += 1
+            except Exception as e:
+                print(f"Error pushing dashboard delta to {subscription.room}: {e}")
+        self.messages += sent
+        return sent
+
+    def run(self):
+        while not self._stop.wait(self.coalesce_seconds):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rooms": len(self._subscriptions),
+                "subscribers": len(self._rooms_by_member),
+                "computations": self.computations,
+                "messages": self.messages,
+            }
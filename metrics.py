@@ -0,0 +1,235 @@
+# metrics.py
+import contextvars
+import threading
+import time
+
+# Request latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Query parameters that describe a request's filter shape. Only their
+# presence is recorded (never the values) to keep label cardinality bounded.
+FILTER_PARAMS = ("carrier", "status", "serviceType", "priority", "from", "to", "cursor", "sortBy", "mode")
+
+# Per-request counters of the request currently being served. QueryExecutor
+# copies the context into its pool threads, so fan-out queries count too.
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def _request_charge(headers):
+    """Reads x-ms-request-charge from the headers of one Cosmos response."""
+    try:
+        return float(headers.get("x-ms-request-charge", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RequestStats:
+    """Queries, rows and request units consumed while serving one request."""
+
+    def __init__(self, route, filter_shape):
+        self.route = route
+        self.filter_shape = filter_shape
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.request_charge = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, rows, request_charge):
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.request_charge += request_charge
+
+
+class QueryTracker:
+    """
+    Context manager around one Cosmos query: counts pages, rows and request
+    units, then records them on the current request and in the registry.
+
+    Pass `on_response` as the query's `response_hook`: the SDK calls it with
+    the headers of each response to this query, whereas the connection's
+    last_response_headers belong to whichever thread's request came last.
+    """
+
+    def __init__(self, sql, registry, parameters=None):
+        self.sql = sql
+        self.parameters = parameters
+        self.registry = registry
+        self.rows = 0
+        self.request_charge = 0.0
+        self.pages = 0
+        # Charges of the responses received since the previous page.
+        self._pending_charge = 0.0
+
+    def on_response(self, headers, result=None):
+        self._pending_charge += _request_charge(headers)
+
+    def add_page(self, rows):
+        """Records one page and returns its request charge (every response received for it)."""
+        charge, self._pending_charge = self._pending_charge, 0.0
+        self.pages += 1
+        self.rows += rows
+        self.request_charge += charge
+        return charge
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.registry.observe_query(self, time.perf_counter() - self.started, failed=exc_type is not None)
+        return False
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Per route and filter shape: request latency histogram, request count by
+    status, and the number of queries, rows and request units they consumed.
+    Rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self, slow_query_seconds=None):
+        self.slow_query_seconds = slow_query_seconds
+        self._lock = threading.Lock()
+        self._latency = {}  # (route, shape) -> Histogram
+        self._requests = {}  # (route, shape, status) -> count
+        self._queries = {}  # (route, shape) -> [queries, rows, request charge]
+        self._query_latency = Histogram()
+        self.slow_queries = 0
+
+    def track_query(self, sql, parameters=None):
+        return QueryTracker(sql, self, parameters)
+
+    def observe_query(self, tracker, seconds, failed=False):
+        stats = current_request.get()
+        if stats is not None:
+            stats.add_query(tracker.rows, tracker.request_charge)
+        with self._lock:
+            self._query_latency.observe(seconds)
+        if self.slow_query_seconds is not None and seconds >= self.slow_query_seconds:
+            with self._lock:
+                self.slow_queries += 1
+            route = stats.route if stats is not None else "-"
+            bound = {parameter["name"]: parameter["value"] for parameter in tracker.parameters or ()}
+            print(f"Slow query ({seconds * 1000:.0f} ms, {tracker.request_charge:.2f} RU, {tracker.rows} rows, "
+                  f"{tracker.pages} pages{', failed' if failed else ''}) on {route}: {tracker.sql}"
+                  f"{f' with {bound}' if bound else ''}")
+
+    def observe_request(self, stats, status):
+        key = (stats.route, stats.filter_shape)
+        seconds = time.perf_counter() - stats.started
+        with self._lock:
+            self._latency.setdefault(key, Histogram()).observe(seconds)
+            self._requests[key + (status,)] = self._requests.get(key + (status,), 0) + 1
+            totals = self._queries.setdefault(key, [0, 0, 0.0])
+            totals[0] += stats.queries
+            totals[1] += stats.rows
+            totals[2] += stats.request_charge
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_request_duration_seconds Request latency by route and filter shape.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (route, shape), histogram in sorted(self._latency.items()):
+                labels = f'route="{_escape(route)}",filters="{_escape(shape)}"'
+                lines.extend(histogram.samples("http_request_duration_seconds", labels))
+
+            lines.append("# HELP http_requests_total Requests by route, filter shape and status code.")
+            lines.append("# TYPE http_requests_total counter")
+            for (route, shape, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{route="{_escape(route)}",filters="{_escape(shape)}",'
+                             f'status="{status}"}} {count}')
+
+            for index, (name, help_text) in enumerate((
+                ("store_queries_total", "Cosmos queries issued while serving the route."),
+                ("store_rows_total", "Rows returned by those queries."),
+                ("cosmos_request_charge_total", "Request units (x-ms-request-charge) consumed."),
+            )):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (route, shape), totals in sorted(self._queries.items()):
+                    lines.append(f'{name}{{route="{_escape(route)}",filters="{_escape(shape)}"}} {totals[index]}')
+
+            lines.append("# HELP store_query_duration_seconds Latency of individual Cosmos queries.")
+            lines.append("# TYPE store_query_duration_seconds histogram")
+            lines.extend(self._query_latency.samples("store_query_duration_seconds", 'backend="cosmos"'))
+            lines.append("# HELP store_slow_queries_total Queries slower than the slow-query threshold.")
+            lines.append("# TYPE store_slow_queries_total counter")
+            lines.append(f"store_slow_queries_total {self.slow_queries}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def track_query(sql, parameters=None):
+    """Tracks one query against the process-wide registry (see QueryTracker)."""
+    return registry.track_query(sql, parameters)
+
+
+def filter_shape(args):
+    """Which filter parameters a request used, e.g. "carrier+status", or "none"."""
+    used = [name for name in FILTER_PARAMS if args.get(name) not in (None, "", "All")]
+    return "+".join(used) or "none"
+
+
+def instrument_app(app, slow_query_ms=None):
+    """
+    Records every Flask request in `registry` and serves it at /metrics.
+    With `slow_query_ms`, queries slower than that are printed with their SQL and parameters.
+    """
+    from flask import Response, request
+
+    if slow_query_ms is not None:
+        registry.slow_query_seconds = slow_query_ms / 1000.0
+
+    @app.before_request
+    def start_request_metrics():
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request.environ["metrics.token"] = current_request.set(RequestStats(route, filter_shape(request.args)))
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = current_request.get()
+        if stats is not None and stats.route != "/metrics":
+            registry.observe_request(stats, response.status_code)
+        token = request.environ.pop("metrics.token", None)
+        if token is not None:
+            current_request.reset(token)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return registry
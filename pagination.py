@@ -0,0 +1,49 @@
+# pagination.py
+import base64
+import hashlib
+import json
+
+from shipment_store import normalize_filters
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor is malformed or belongs to another query."""
+
+
+def filters_fingerprint(filters, sort_field, direction):
+    """Short hash identifying the filter set and ordering a cursor was issued for."""
+    normalized = sorted(normalize_filters(filters).items())
+    payload = json.dumps([normalized, sort_field, direction], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(document, sort_field, direction, filters):
+    """
+    Builds an opaque cursor pointing just past `document` (the last row of a
+    page). It carries the sort key and the ShipmentID tiebreaker, so the next
+    page is fetched with a keyset condition instead of an OFFSET. A document
+    without the sort field is encoded with a null sort key, which the stores
+    order before every value (see ShipmentStore.page_after).
+    """
+    state = {
+        "v": document.get(sort_field),
+        "id": document.get("ShipmentID") or document.get("id"),
+        "f": filters_fingerprint(filters, sort_field, direction),
+    }
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort_field, direction, filters):
+    """Returns the (sort value, ShipmentID) keyset position encoded in `token`."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, shipment_id, fingerprint = state["v"], state["id"], state["f"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if fingerprint != filters_fingerprint(filters, sort_field, direction):
+        raise InvalidCursor("Cursor was issued for different filters or sort order.")
+    if not shipment_id:
+        raise InvalidCursor("Cursor has no ShipmentID.")
+    return value, shipment_id
@@ -0,0 +1,202 @@
+# query_builder.py
+import re
+from functools import lru_cache
+
+# Cached compiled query texts. Shapes, not values, are cached, so this bounds
+# the number of distinct filter/projection/order combinations remembered.
+SPEC_CACHE_SIZE = 512
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _field(name):
+    """Validates a document field name before it is spliced into query text."""
+    if not isinstance(name, str) or not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid field name: {name!r}")
+    return f"c.{name}"
+
+
+def parameter_name(field):
+    """Query parameter for an equality filter on `field`, e.g. Carrier -> @carrier."""
+    return "@" + field[0].lower() + field[1:]
+
+
+def _value_count(value):
+    """Number of alternatives of a filter value: None for a single value, len() for a tuple (IN)."""
+    return len(value) if isinstance(value, tuple) else None
+
+
+class QuerySpec:
+    """
+    Compiled text of one query shape. The text only contains parameter
+    placeholders, so every query with the same shape (same filters present,
+    same projection, ordering and paging) has identical text and Cosmos DB
+    can reuse its query plan.
+    """
+
+    def __init__(self, text, parameter_names):
+        self.text = text
+        self.parameter_names = tuple(parameter_names)
+
+    def bind(self, values):
+        """Cosmos `parameters` list for {parameter name: value}."""
+        return [{"name": name, "value": values[name]} for name in self.parameter_names]
+
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE)
+def compile_spec(shape):
+    """Renders a ShipmentQuery shape (see ShipmentQuery.shape) to a QuerySpec."""
+    (fields, aggregates, group_by, filter_fields, has_since, has_until, defined, numeric,
+     value, distinct, order_by, keyset, has_top, has_page) = shape
+    names = []
+
+    columns = [f"{_field(field)} AS {field}" if group_by else _field(field) for field in fields]
+    columns.extend(f"{expression} AS {alias}" if not value else expression for alias, expression in aggregates)
+    select = "SELECT "
+    if distinct:
+        select += "DISTINCT "
+    if has_top:
+        select += "TOP @top "
+        names.append("@top")
+    if value:
+        if len(columns) != 1:
+            raise ValueError("SELECT VALUE needs exactly one projected field or aggregate.")
+        select += "VALUE "
+    select += ", ".join(columns) if columns else "*"
+
+    clauses = []
+    for field, count in filter_fields:
+        if count is None:
+            clauses.append(f"{_field(field)} = {parameter_name(field)}")
+            names.append(parameter_name(field))
+        else:
+            placeholders = [f"{parameter_name(field)}{position}" for position in range(count)]
+            clauses.append(f"{_field(field)} IN ({', '.join(placeholders)})")
+            names.extend(placeholders)
+    if has_since:
+        clauses.append("c.ShipmentDate >= @since")
+        names.append("@since")
+    if has_until:
+        clauses.append("c.ShipmentDate < @until")
+        names.append("@until")
+    clauses.extend(f"IS_DEFINED({_field(field)})" for field in defined)
+    clauses.extend(f"IS_NUMBER({_field(field)})" for field in numeric)
+    if keyset:
+        field, direction, after_missing = keyset
+        op = ">" if direction == "ASC" else "<"
+        if field == "ShipmentID":
+            clauses.append(f"c.ShipmentID {op} @afterId")
+            names.append("@afterId")
+        else:
+            # Missing (undefined or null) values sort before every value, so they
+            # come first ascending and last descending; comparisons never match them.
+            column = _field(field)
+            missing = f"(NOT IS_DEFINED({column}) OR IS_NULL({column}))"
+            if after_missing and direction == "ASC":
+                clauses.append(f"(NOT {missing} OR ({missing} AND c.ShipmentID > @afterId))")
+                names.append("@afterId")
+            elif after_missing:
+                clauses.append(f"({missing} AND c.ShipmentID < @afterId)")
+                names.append("@afterId")
+            else:
+                tail = f" OR {missing}" if direction == "DESC" else ""
+                clauses.append(f"({column} {op} @afterValue OR ({column} = @afterValue AND c.ShipmentID {op} @afterId)"
+                               f"{tail})")
+                names.extend(("@afterValue", "@afterId"))
+
+    text = select + " FROM c"
+    if clauses:
+        text += " WHERE " + " AND ".join(clauses)
+    if group_by:
+        text += " GROUP BY " + ", ".join(_field(field) for field in group_by)
+    if order_by:
+        text += " ORDER BY " + ", ".join(f"{_field(field)} {direction}" for field, direction in order_by)
+    if has_page:
+        text += " OFFSET @offset LIMIT @limit"
+        names.extend(("@offset", "@limit"))
+    return QuerySpec(text, names)
+
+
+class ShipmentQuery:
+    """
+    A parameterized query over the shipments container: projection or
+    aggregates (optionally grouped), equality filters (a tuple value
+    matches any of its elements, rendered as IN), ShipmentDate bounds,
+    IS_DEFINED/IS_NUMBER checks, ORDER BY, a keyset position and TOP or
+    OFFSET/LIMIT paging. Values are always passed as parameters (@carrier,
+    @since, ...), and the compiled text is cached per shape.
+
+    `order_by` is a list of (field, "asc"/"desc"); `after` is the keyset
+    position (sort field, direction, last sort value or None when it was
+    missing, last ShipmentID).
+    `aggregates` are aggregate_queries.Aggregate instances.
+    """
+
+    def __init__(self, fields=(), aggregates=(), group_by=(), filters=None, since=None, until=None,
+                 defined=(), numeric=(), value=False, distinct=False, order_by=(), after=None,
+                 top=None, offset=None, limit=None):
+        self.fields = tuple(fields)
+        self.aggregates = tuple(aggregates)
+        self.group_by = tuple(group_by)
+        self.filters = {field: value for field, value in (filters or {}).items() if value}
+        self.since = since
+        self.until = until
+        self.defined = tuple(defined)
+        self.numeric = tuple(numeric)
+        self.value = value
+        self.distinct = distinct
+        self.order_by = tuple((field, direction.upper()) for field, direction in order_by)
+        self.after = after
+        self.top = top
+        self.offset = offset
+        self.limit = limit
+
+    def shape(self):
+        keyset = None
+        if self.after is not None:
+            field, direction = self.after[0], self.after[1].upper()
+            keyset = (field, direction, self.after[2] is None)
+        return (
+            self.fields,
+            tuple((aggregate.alias, aggregate.to_sql()) for aggregate in self.aggregates),
+            self.group_by,
+            tuple(sorted((field, _value_count(value)) for field, value in self.filters.items())),
+            bool(self.since),
+            bool(self.until),
+            self.defined,
+            self.numeric,
+            self.value,
+            self.distinct,
+            self.order_by,
+            keyset,
+            self.top is not None,
+            self.offset is not None,
+        )
+
+    def spec(self):
+        return compile_spec(self.shape())
+
+    @property
+    def text(self):
+        return self.spec().text
+
+    def parameters(self):
+        values = {}
+        for field, value in self.filters.items():
+            if isinstance(value, tuple):
+                values.update((f"{parameter_name(field)}{position}", item) for position, item in enumerate(value))
+            else:
+                values[parameter_name(field)] = value
+        values["@since"] = self.since
+        values["@until"] = self.until
+        if self.after is not None:
+            values["@afterValue"], values["@afterId"] = self.after[2], self.after[3]
+        values["@top"] = int(self.top) if self.top is not None else None
+        values["@offset"] = int(self.offset) if self.offset is not None else None
+        values["@limit"] = int(self.limit) if self.limit is not None else None
+        return self.spec().bind(values)
+
+
+def spec_cache_stats():
+    info = compile_spec.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "maxEntries": info.maxsize}
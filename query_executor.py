@@ -0,0 +1,126 @@
+# query_executor.py
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 16
+# Deadline for a whole composite request when the caller does not give one.
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+class QueryTimeout(Exception):
+    """Raised when the sub-queries of a request did not finish before its deadline."""
+
+
+class QueryCancelled(Exception):
+    """Raised when a request's sub-queries were cancelled before they finished."""
+
+
+class FanOutResult:
+    """Results of one fan-out keyed by sub-query name, plus per-query timings."""
+
+    def __init__(self, results, timings, elapsed):
+        self.results = results
+        self.timings = timings
+        self.elapsed = elapsed
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def server_timing(self):
+        """Value for a Server-Timing response header (durations in milliseconds)."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        entries.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(entries)
+
+
+class QueryExecutor:
+    """
+    Runs independent store queries concurrently on a shared thread pool, so a
+    composite endpoint takes about as long as its slowest query instead of
+    the sum of all of them.
+
+    A fan-out that runs past its deadline, or whose `cancel_event` is set,
+    cancels the sub-queries that have not started yet and raises; the ones
+    already running finish in the background and their results are dropped.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, default_timeout=DEFAULT_TIMEOUT_SECONDS,
+                 clock=time.monotonic):
+        self.default_timeout = default_timeout
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        # Set on pool threads so a fan-out started from inside a sub-query
+        # runs inline instead of waiting on the pool it is occupying.
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.fan_outs = 0
+        self.timeouts = 0
+        self.cancellations = 0
+
+    def _timed(self, query):
+        self._local.in_pool = True
+        start = self._clock()
+        try:
+            return query(), self._clock() - start
+        finally:
+            self._local.in_pool = False
+
+    def _run_inline(self, queries, start):
+        results, timings = {}, {}
+        for name, query in queries.items():
+            results[name], timings[name] = self._timed(query)
+        return FanOutResult(results, timings, self._clock() - start)
+
+    def run(self, queries, timeout=None, cancel_event=None):
+        """
+        Runs every callable in `queries` ({name: zero-argument callable}) and
+        returns a FanOutResult. The first sub-query exception is re-raised.
+        """
+        start = self._clock()
+        with self._lock:
+            self.fan_outs += 1
+        if len(queries) <= 1 or getattr(self._local, "in_pool", False):
+            return self._run_inline(queries, start)
+
+        deadline = start + (timeout if timeout is not None else self.default_timeout)
+        # Each sub-query runs in a copy of the caller's context, so per-request
+        # state (e.g. metrics.current_request) follows it into the pool.
+        futures = {
+            self._pool.submit(contextvars.copy_context().run, self._timed, query): name
+            for name, query in queries.items()
+        }
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    with self._lock:
+                        self.cancellations += 1
+                    raise QueryCancelled(f"Cancelled with {len(pending)} of {len(futures)} queries unfinished.")
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    with self._lock:
+                        self.timeouts += 1
+                    unfinished = sorted(futures[future] for future in pending)
+                    raise QueryTimeout(f"Queries did not finish in time: {', '.join(unfinished)}")
+                # Wake up periodically to notice cancellation.
+                done, pending = wait(pending, timeout=min(remaining, 0.05), return_when=FIRST_EXCEPTION)
+                for future in done:
+                    if future.exception() is not None:
+                        raise future.exception()
+        finally:
+            for future in pending:
+                future.cancel()
+
+        results, timings = {}, {}
+        for future, name in futures.items():
+            results[name], timings[name] = future.result()
+        return FanOutResult(results, timings, self._clock() - start)
+
+    def stats(self):
+        with self._lock:
+            return {"fanOuts": self.fan_outs, "timeouts": self.timeouts, "cancellations": self.cancellations}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,185 @@
+# responses.py
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask.json.provider import DefaultJSONProvider
+
+# orjson and brotli are optional: without them responses fall back to the
+# stdlib JSON encoder and gzip.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed.
+DEFAULT_MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+# Routes whose bodies are not derived from shipment data, so a data-version
+# ETag would be wrong for them.
+UNVERSIONED_ROUTES = ("/api/cache_stats", "/api/live_update_stats", "/api/test")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes with orjson, which is several times
+    faster than the stdlib encoder and writes the body as bytes directly.
+    Keys stay sorted like Flask's default output.
+    """
+
+    OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.OPTIONS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class DataVersion:
+    """
+    Counter bumped by every write to the store (register `bump` as a
+    ShipmentStore change listener). Responses computed at the same version
+    are identical, so the version can stand in for their content in ETags.
+    The epoch keeps versions from different processes apart.
+    """
+
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def bump(self, change_type=None, document=None):
+        with self._lock:
+            self.value += 1
+
+    def token(self):
+        return f"{self.epoch}.{self.value}"
+
+
+def _etag_hash(data):
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+class ResponseLayer:
+    """
+    Makes repeat API reads cheap for the client and the server:
+      - GET /api/... responses carry an ETag. While `version_provider()`
+        returns a data version, the ETag is derived from it, the URL and the
+        current UTC day (date windows roll daily), and a matching
+        If-None-Match is answered with 304 before the route runs. Otherwise
+        the ETag is a hash of the body, which still saves the bandwidth.
+      - JSON bodies of at least `min_compress_bytes` are brotli- or
+        gzip-compressed, following Accept-Encoding.
+    """
+
+    def __init__(self, app, version_provider, min_compress_bytes=DEFAULT_MIN_COMPRESS_BYTES,
+                 unversioned=UNVERSIONED_ROUTES):
+        self.version_provider = version_provider
+        self.min_compress_bytes = min_compress_bytes
+        self.unversioned = tuple(unversioned)
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        if orjson is not None:
+            app.json = OrjsonProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _tagged(self, request):
+        return (request.method == "GET" and request.path.startswith("/api/")
+                and request.path not in self.unversioned)
+
+    def _version_etag(self, request):
+        version = self.version_provider()
+        if version is None:
+            return None
+        day = datetime.now(timezone.utc).date().isoformat()
+        return _etag_hash(f"{version}|{day}|{request.full_path}".encode())
+
+    def _not_modified(self, etag):
+        from flask import Response
+
+        with self._lock:
+            self.not_modified += 1
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def _before_request(self):
+        from flask import request
+
+        if not self._tagged(request):
+            return None
+        # Read the version before the route runs, so the data it serves is
+        # at least as new as the version in its ETag.
+        etag = self._version_etag(request)
+        request.environ["responses.etag"] = etag
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            return self._not_modified(etag)
+        return None
+
+    def _after_request(self, response):
+        from flask import request
+
+        if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+            return response
+        if self._tagged(request) and "ETag" not in response.headers:
+            etag = request.environ.get("responses.etag")
+            if etag is None:
+                etag = _etag_hash(response.get_data())
+                if request.if_none_match.contains_weak(etag):
+                    return self._not_modified(etag)
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+        if response.mimetype == "application/json":
+            self._compress(request, response)
+        return response
+
+    def _compress(self, request, response):
+        if "Content-Encoding" in response.headers:
+            return
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < self.min_compress_bytes:
+            return
+        offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding == "br":
+            body = brotli.compress(data, quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            body = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            return
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "notModified": self.not_modified,
+                "compressed": self.compressed,
+                "compressedBytesIn": self.bytes_in,
+                "compressedBytesOut": self.bytes_out,
+                "jsonEncoder": "orjson" if orjson is not None else "json",
+                "encodings": ["br", "gzip"] if brotli is not None else ["gzip"],
+            }
@@ -0,0 +1,158 @@
+# result_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from ru_budget import BudgetExhausted
+from shipment_store import normalize_filters
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 30
+
+
+def cache_key(endpoint, filters, *extra):
+    """
+    Normalized key for an endpoint + filter combination. Empty filter values
+    are dropped and the remaining ones sorted, so ?carrier=UPS&status= and
+    ?status=&carrier=UPS share an entry.
+    """
+    if filters is None:
+        normalized = None
+    else:
+        normalized = tuple(sorted(normalize_filters(filters).items()))
+    return (endpoint, normalized) + tuple(extra)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of endpoint results with per-endpoint TTLs.
+
+    Entries are evicted least-recently-used once `max_entries` is exceeded,
+    expire after the TTL configured for their endpoint, and are dropped by
+    invalidate() whenever shipments are written. With a SingleFlight,
+    concurrent misses for the same key compute the result only once. When a
+    computation is shed for lack of RU budget, the expired entry (if any)
+    is served instead.
+
+    Every invalidate() advances a generation counter. A result computed
+    from a generation that has since been invalidated is returned to its
+    caller but not stored, so a write during a slow computation cannot
+    leave the old result cached for a whole TTL.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, default_ttl=DEFAULT_TTL_SECONDS, ttls=None,
+                 clock=time.monotonic, single_flight=None):
+        self.max_entries = max_entries
+        self.single_flight = single_flight
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key):
+        """Returns (True, value) on a fresh hit, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+            # Expired entries stay until evicted or replaced, as a fallback
+            # for when the database cannot be queried (see get_stale).
+            self.misses += 1
+            return False, None
+
+    def get_stale(self, key):
+        """Returns (True, value) for any entry still held, even if expired, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            self.stale_hits += 1
+            return True, entry[1]
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Stores `value`, unless `generation` is given and an invalidation has happened since."""
+        if ttl is None:
+            ttl = self.ttl_for(key[0])
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, endpoint, filters, compute, *extra):
+        """Returns the cached result for (endpoint, filters, *extra), computing it on a miss."""
+        key = cache_key(endpoint, filters, *extra)
+        hit, value = self.get(key)
+        if hit:
+            return value
+
+        generation = self.generation()
+
+        def compute_and_store():
+            value = compute()
+            self.set(key, value, generation=generation)
+            return value
+
+        try:
+            if self.single_flight is None:
+                return compute_and_store()
+            # Requests after an invalidation do not join a computation started before it.
+            return self.single_flight.do(("result", generation) + key, compute_and_store)
+        except BudgetExhausted:
+            # Out of RU budget: an expired result beats no result.
+            hit, value = self.get_stale(key)
+            if hit:
+                return value
+            raise
+
+    def invalidate(self, endpoint=None):
+        """Drops every entry, or only the entries for `endpoint`."""
+        with self._lock:
+            if endpoint is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == endpoint]:
+                    del self._entries[key]
+            self._generation += 1
+            self.invalidations += 1
+
+    def on_store_change(self, change_type, document):
+        """ShipmentStore change listener: any write can affect any cached aggregate."""
+        self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "staleHits": self.stale_hits,
+            }
@@ -0,0 +1,169 @@
+# ru_budget.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes. Dashboard and table requests are interactive; scans,
+# exports and replica loads are bulk and may wait or be shed under load.
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+DEFAULT_RATES = {INTERACTIVE: 2000.0, BULK: 400.0}  # RU/s per class
+# Longest a query page may wait for budget (or for a server retry-after)
+# before the work is shed with BudgetExhausted.
+DEFAULT_MAX_WAITS = {INTERACTIVE: 2.0, BULK: 30.0}
+# Throttled (429) attempts for one page before giving up.
+MAX_THROTTLED_ATTEMPTS = 5
+
+# Priority class of the work running in this context. QueryExecutor copies
+# the context into its pool threads, so fan-out queries keep their class.
+current_priority = contextvars.ContextVar("ru_priority", default=INTERACTIVE)
+
+
+class BudgetExhausted(Exception):
+    """Raised instead of running a query whose priority class is out of RU budget."""
+
+    def __init__(self, priority, retry_after):
+        super().__init__(f"RU budget for {priority} queries exhausted; retry in {retry_after:.1f}s.")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    RU token bucket refilled at `rate` per second up to `capacity`. Query
+    charges are only known afterwards, so they are debited after the fact
+    and the balance may go negative; new work waits until it is repaid.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def debit(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+    def wait_time(self):
+        """Seconds until the balance is back to zero."""
+        self._refill()
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RUBudget:
+    """
+    Per-class RU budgets in front of every Cosmos query (see
+    aggregation.iter_query_pages). Before each page, the caller waits until
+    its class has budget and any server retry-after has passed; if that
+    wait would exceed the class's max wait, the page is not requested and
+    BudgetExhausted is raised so the route can degrade (e.g. serve a stale
+    cached result) or answer 503.
+    """
+
+    def __init__(self, rates=None, max_waits=None, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.buckets = {name: TokenBucket(rate, clock=clock) for name, rate in (rates or DEFAULT_RATES).items()}
+        self.max_waits = dict(DEFAULT_MAX_WAITS, **(max_waits or {}))
+        self._paused_until = 0.0
+        self.waits = {name: 0 for name in self.buckets}
+        self.shed = {name: 0 for name in self.buckets}
+        self.charged = {name: 0.0 for name in self.buckets}
+        self.throttles = 0
+
+    def configure(self, rates=None, max_waits=None):
+        with self._lock:
+            for name, rate in (rates or {}).items():
+                bucket = self.buckets.get(name)
+                if bucket is None:
+                    self.buckets[name] = TokenBucket(rate, clock=self._clock)
+                    self.waits[name], self.shed[name], self.charged[name] = 0, 0, 0.0
+                else:
+                    bucket.rate = bucket.capacity = bucket.tokens = float(rate)
+            self.max_waits.update(max_waits or {})
+
+    @contextmanager
+    def priority(self, name):
+        """Runs the enclosed queries in priority class `name`."""
+        token = current_priority.set(name)
+        try:
+            yield
+        finally:
+            current_priority.reset(token)
+
+    def acquire(self):
+        """Blocks until the current class may issue a query page, or raises BudgetExhausted."""
+        name = current_priority.get()
+        with self._lock:
+            wait = max(self.buckets[name].wait_time(), self._paused_until - self._clock())
+            if wait > self.max_waits.get(name, 0):
+                self.shed[name] += 1
+                raise BudgetExhausted(name, wait)
+            if wait > 0:
+                self.waits[name] += 1
+        if wait > 0:
+            self._sleep(wait)
+
+    def charge(self, request_charge):
+        name = current_priority.get()
+        with self._lock:
+            self.buckets[name].debit(request_charge)
+            self.charged[name] += request_charge
+
+    def on_throttle(self, retry_after):
+        """Records a 429: every class waits out the server's retry-after."""
+        with self._lock:
+            self.throttles += 1
+            self._paused_until = max(self._paused_until, self._clock() + retry_after)
+
+    def stats(self):
+        with self._lock:
+            classes = {
+                name: {
+                    "ratePerSecond": bucket.rate,
+                    "available": round(max(bucket.tokens, 0.0), 1),
+                    "charged": round(self.charged[name], 2),
+                    "waits": self.waits[name],
+                    "shed": self.shed[name],
+                }
+                for name, bucket in self.buckets.items()
+            }
+            return {"classes": classes, "throttles": self.throttles}
+
+
+budget = RUBudget()
+
+
+def priority(name):
+    """Runs the enclosed queries in priority class `name` against the process-wide budget."""
+    return budget.priority(name)
+
+
+def iter_with_priority(iterable, name):
+    """
+    Wraps a lazy iterator (e.g. a streamed query) so each step runs in
+    priority class `name`, whichever context ends up consuming it.
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            with budget.priority(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,150 @@
+# search_index.py
+import threading
+from bisect import bisect_left
+
+SEARCH_FIELDS = ("Origin", "Destination")
+MATCH_MODES = ("prefix", "contains")
+NGRAM = 3
+# Sorts after every real character, closing a prefix range.
+_PREFIX_END = "\U0010ffff"
+
+
+def _ngrams(text):
+    return {text[position:position + NGRAM] for position in range(len(text) - NGRAM + 1)}
+
+
+class PlaceIndex:
+    """
+    Case-insensitive lookup over the distinct values of one place field.
+    Prefix search bisects the sorted folded names (a flattened trie);
+    substring search intersects the posting lists of the query's trigrams
+    and then checks the few candidates left.
+    """
+
+    def __init__(self):
+        self._folded = []  # sorted casefolded names
+        self._names = {}  # casefolded name -> original spellings
+        self._postings = {}  # trigram -> casefolded names containing it
+
+    def __len__(self):
+        return len(self._folded)
+
+    def add(self, name):
+        folded = name.casefold()
+        spellings = self._names.get(folded)
+        if spellings is None:
+            spellings = self._names[folded] = set()
+            self._folded.insert(bisect_left(self._folded, folded), folded)
+            for ngram in _ngrams(folded):
+                self._postings.setdefault(ngram, set()).add(folded)
+        spellings.add(name)
+
+    def _spellings(self, folded_names):
+        return [name for folded in folded_names for name in sorted(self._names[folded])]
+
+    def prefix(self, text):
+        folded = text.casefold()
+        low = bisect_left(self._folded, folded)
+        high = bisect_left(self._folded, folded + _PREFIX_END)
+        return self._spellings(self._folded[low:high])
+
+    def contains(self, text):
+        folded = text.casefold()
+        if len(folded) < NGRAM:
+            candidates = self._folded
+        else:
+            postings = sorted((self._postings.get(ngram, set()) for ngram in _ngrams(folded)), key=len)
+            candidates = sorted(set.intersection(*postings)) if postings[0] else []
+        return self._spellings(name for name in candidates if folded in name)
+
+    def match(self, text, mode="prefix"):
+        return self.contains(text) if mode == "contains" else self.prefix(text)
+
+
+class LaneIndex:
+    """
+    In-process search index over shipment Origin/Destination: a PlaceIndex
+    per field plus the set of Origin -> Destination lanes.
+
+    resolve() turns search text into the exact place names it matches, as
+    tuple filters (Origin IN (...)) that every store answers from its own
+    index (dictionary codes in the columnar store, the Cosmos DB range
+    index) combined with the other filters, instead of a CONTAINS scan.
+
+    Bootstrapped by load() from a scan of Origin/Destination (pass
+    SEARCH_FIELDS as `fields`) and kept current by apply() as a
+    ShipmentStore change listener. It only ever grows: a place nobody ships
+    from any more still resolves, and simply matches no rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.places = {field: PlaceIndex() for field in SEARCH_FIELDS}
+        self.lanes = set()
+        self.ready = False
+
+    def _add(self, origin, destination):
+        if origin:
+            self.places["Origin"].add(origin)
+        if destination:
+            self.places["Destination"].add(destination)
+        if origin and destination:
+            self.lanes.add((origin, destination))
+
+    def apply(self, change_type, document):
+        """Adds the places and lane of an upserted document. Usable directly as a ShipmentStore change listener."""
+        if change_type == "delete":
+            return
+        origin, destination = document.get("Origin"), document.get("Destination")
+        if (origin, destination) in self.lanes:
+            return
+        with self._lock:
+            self._add(origin, destination)
+
+    def load(self, documents):
+        """
+        Bootstraps from documents projected to SEARCH_FIELDS and marks the
+        index ready. The distinct lanes are collected here, on the client:
+        Cosmos DB queries from the Python SDK cannot GROUP BY.
+        """
+        lanes = {(document.get("Origin"), document.get("Destination")) for document in documents}
+        with self._lock:
+            for origin, destination in lanes:
+                self._add(origin, destination)
+        self.ready = True
+        return self
+
+    def resolve(self, origin=None, destination=None, mode="prefix"):
+        """
+        Filters for the given search text: {"Origin": (names...), ...} for
+        the fields searched, narrowed to names that form at least one lane
+        with the other side's matches. Returns None when nothing can match.
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(f"match must be one of: {', '.join(MATCH_MODES)}.")
+        with self._lock:
+            origins = self.places["Origin"].match(origin, mode) if origin else None
+            destinations = self.places["Destination"].match(destination, mode) if destination else None
+            if origins is not None and destinations is not None:
+                # Keep only the names that form a lane with a match on the other side.
+                origin_set, destination_set = set(origins), set(destinations)
+                lanes = [(o, d) for o, d in self.lanes if o in origin_set and d in destination_set]
+                origins = sorted({o for o, _ in lanes})
+                destinations = sorted({d for _, d in lanes})
+        filters = {}
+        for field, names in (("Origin", origins), ("Destination", destinations)):
+            if names is None:
+                continue
+            if not names:
+                return None
+            filters[field] = tuple(sorted(names))
+        return filters
+
+    def stats(self):
+        with self._lock:
+            return {
+                "origins": len(self.places["Origin"]),
+                "destinations": len(self.places["Destination"]),
+                "lanes": len(self.lanes),
+                "ready": self.ready,
+            }
@@ -0,0 +1,238 @@
+# shared_aggregates.py
+import json
+import struct
+import threading
+import time
+
+from change_feed import LiveAggregates
+from daily_rollups import DailyRollups
+from distributions import DistributionSketches
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Segment layout: sequence number (odd while a write is in progress),
+# payload length and publish time, then the encoded payload.
+_HEADER = struct.Struct("<QQd")
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+# Reader attempts before giving up on a segment that keeps changing under it.
+MAX_READ_ATTEMPTS = 100
+
+
+def _encode(state):
+    return orjson.dumps(state) if orjson is not None else json.dumps(state).encode("utf-8")
+
+
+def _decode(payload):
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+class AggregateSegment:
+    """
+    A shared memory segment holding the latest published aggregate state.
+
+    There is exactly one writer. Readers never lock: they copy the payload
+    between two reads of the sequence number and retry if it changed or was
+    odd (a write in progress), i.e. a seqlock. The sequence number doubles
+    as the data version readers compare to see whether anything changed.
+    """
+
+    def __init__(self, name=None, size=DEFAULT_SEGMENT_BYTES, create=False):
+        # Imported here so a single-process server does not load multiprocessing.
+        from multiprocessing import shared_memory
+        if create:
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _HEADER.pack_into(self._memory.buf, 0, 0, 0, 0.0)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self.name = self._memory.name
+        self.owner = create
+        self.retries = 0
+
+    @property
+    def capacity(self):
+        return self._memory.size - _HEADER.size
+
+    def version(self):
+        return _HEADER.unpack_from(self._memory.buf, 0)[0]
+
+    def publish(self, payload):
+        """Writer only: replaces the payload. Returns the new (even) sequence number."""
+        if len(payload) > self.capacity:
+            raise ValueError(f"Aggregate state of {len(payload)} bytes does not fit the "
+                             f"{self.capacity}-byte segment; raise SHARED_AGGREGATES_BYTES.")
+        buf = self._memory.buf
+        sequence = _HEADER.unpack_from(buf, 0)[0]
+        _HEADER.pack_into(buf, 0, sequence + 1, 0, 0.0)
+        buf[_HEADER.size:_HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(buf, 0, sequence + 2, len(payload), time.time())
+        return sequence + 2
+
+    def read(self):
+        """Returns (sequence, publish time, payload bytes) of a consistent copy of the payload."""
+        buf = self._memory.buf
+        for _ in range(MAX_READ_ATTEMPTS):
+            sequence, length, published_at = _HEADER.unpack_from(buf, 0)
+            if sequence % 2 == 0:
+                payload = bytes(buf[_HEADER.size:_HEADER.size + length])
+                if _HEADER.unpack_from(buf, 0)[0] == sequence:
+                    return sequence, published_at, payload
+            self.retries += 1
+            time.sleep(0)
+        raise TimeoutError("Aggregate segment kept changing while being read.")
+
+    def close(self):
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
+
+
+class AggregatePublisher:
+    """
+    Writer side: copies LiveAggregates, DailyRollups and DistributionSketches
+    into the segment at most every `interval` seconds after they change.
+    Register `on_change` as a ShipmentStore change listener.
+    """
+
+    def __init__(self, segment, live_aggregates, daily_rollups, distribution_sketches, interval=0.1):
+        self.segment = segment
+        self.live_aggregates = live_aggregates
+        self.daily_rollups = daily_rollups
+        self.distribution_sketches = distribution_sketches
+        self.interval = interval
+        self.publishes = 0
+        self.last_bytes = 0
+        self._published_readiness = None
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_change(self, change_type=None, document=None):
+        self._changed.set()
+
+    def _readiness(self):
+        return self.live_aggregates.ready, self.daily_rollups.ready, self.distribution_sketches.ready
+
+    def publish(self):
+        self._changed.clear()
+        readiness = self._readiness()
+        payload = _encode({
+            "live": self.live_aggregates.export_state(),
+            "rollups": self.daily_rollups.export_state(),
+            "distributions": self.distribution_sketches.export_state(),
+        })
+        self.segment.publish(payload)
+        self._published_readiness = readiness
+        self.publishes += 1
+        self.last_bytes = len(payload)
+
+    def run(self):
+        self.publish()
+        while not self._stop.is_set():
+            # Readiness flips without a store change, so check it on a slow tick as well.
+            changed = self._changed.wait(1.0)
+            if self._stop.is_set():
+                break
+            if not changed and self._readiness() == self._published_readiness:
+                continue
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Error publishing shared aggregates: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="aggregate-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._changed.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {"segment": self.segment.name, "version": self.segment.version(),
+                "publishes": self.publishes, "bytes": self.last_bytes}
+
+
+class SharedAggregates:
+    """
+    Reader side, in each worker process: LiveAggregates, DailyRollups and
+    DistributionSketches rebuilt from the segment whenever its version moves.
+    `live`, `rollups` and `distributions` stand in for the writer's objects
+    (LiveAggregatingStore sources, /api/rollups, /api/cost_distribution). `on_update()` runs after each refresh so the
+    worker can invalidate what it derived from the previous version.
+    """
+
+    def __init__(self, segment, on_update=None, poll_interval=0.1):
+        self.segment = segment
+        self.on_update = on_update
+        self.poll_interval = poll_interval
+        self.version = None
+        self.published_at = None
+        self.refreshes = 0
+        self._refresh_lock = threading.Lock()
+        self._live = LiveAggregates()
+        self._rollups = DailyRollups()
+        self._distributions = DistributionSketches()
+        self.live = _SharedView(self, "_live")
+        self.rollups = _SharedView(self, "_rollups")
+        self.distributions = _SharedView(self, "_distributions")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Picks up a newer published state, if any. Returns True when it changed."""
+        if self.segment.version() == self.version:
+            return False
+        with self._refresh_lock:
+            version, published_at, payload = self.segment.read()
+            if version == self.version or not payload:
+                return False
+            state = _decode(payload)
+            # Swapping whole objects keeps every reader on one consistent version.
+            self._live = LiveAggregates.from_state(state["live"])
+            self._rollups = DailyRollups.from_state(state["rollups"])
+            self._distributions = DistributionSketches.from_state(state["distributions"])
+            self.version, self.published_at = version, published_at
+            self.refreshes += 1
+        if self.on_update:
+            self.on_update()
+        return True
+
+    def run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error reading shared aggregates: {e}")
+
+    def start(self):
+        self.refresh()
+        self._thread = threading.Thread(target=self.run, name="aggregate-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def stats(self):
+        return {
+            "segment": self.segment.name,
+            "version": self.version,
+            "ageSeconds": None if self.published_at is None else round(time.time() - self.published_at, 3),
+            "refreshes": self.refreshes,
+            "readRetries": self.segment.retries,
+        }
+
+
+class _SharedView:
+    """Delegates to the reader's current LiveAggregates, DailyRollups or DistributionSketches."""
+
+    def __init__(self, reader, attribute):
+        self._reader = reader
+        self._attribute = attribute
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._reader, self._attribute), name)
@@ -0,0 +1,217 @@
+# shipment_store.py
+from aggregate_queries import CosmosAggregateExecutor, count_plan
+from aggregation import iter_query_pages
+from query_builder import ShipmentQuery
+
+# Schema fields of a shipment document (see CosmosDBSchema.md). Full-document
+# queries project these, so Cosmos system properties (_rid, _self, _etag,
+# _attachments, _ts) never reach API responses.
+SHIPMENT_FIELDS = (
+    "id", "ShipmentID", "Origin", "Destination", "Carrier", "DeliveryStatus", "ServiceType",
+    "WeightKG", "DistanceKM", "CostUSD", "ShipmentDate", "DeliveryDate", "Priority"
+)
+
+# Columns the shipments table may be sorted by.
+SORTABLE_COLUMNS = [
+    "ShipmentID", "Origin", "Destination", "Carrier", "DeliveryStatus",
+    "ServiceType", "WeightKG", "CostUSD", "ShipmentDate", "DeliveryDate", "Priority"
+]
+
+
+def sort_spec(sort_by, sort_order):
+    """
+    Resolves the requested sort to (field, "asc"|"desc"). Pages are always
+    ordered by ShipmentID as well, which makes the order total and lets
+    keyset cursors resume exactly where the previous page stopped.
+    """
+    if sort_by in SORTABLE_COLUMNS:
+        return sort_by, "asc" if sort_order == "asc" else "desc"
+    return "ShipmentID", "asc"
+
+
+class StoreUnavailable(Exception):
+    """Raised when the backing database cannot be reached."""
+
+
+def normalize_filters(filters):
+    """Drops empty filter values so that equivalent requests compare equal."""
+    return {field: value for field, value in (filters or {}).items() if value}
+
+
+def narrow_filters(filters, field, value):
+    """
+    Adds an equality condition to `filters`. Returns None when the new
+    condition contradicts an existing one, i.e. the result is always empty.
+    """
+    filters = normalize_filters(filters)
+    if filters.get(field, value) != value:
+        return None
+    filters[field] = value
+    return filters
+
+
+class ShipmentStore:
+    """
+    Read/write interface every API route goes through. Filters are dicts of
+    document field -> required value, or a tuple of accepted values (see
+    normalize_filters); aggregates are
+    aggregate_queries.AggregatePlan instances.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._change_listeners = []
+
+    def add_change_listener(self, callback):
+        """
+        Registers callback(change_type, document), called after every write.
+        change_type is "upsert" or "delete"; deletes pass {"id": shipment_id}.
+        """
+        self._change_listeners.append(callback)
+
+    def notify_change(self, change_type, document):
+        for callback in self._change_listeners:
+            try:
+                callback(change_type, document)
+            except Exception as e:
+                print(f"Error in shipment change listener: {e}")
+
+    def available(self):
+        return True
+
+    def aggregate(self, plan):
+        """Runs an AggregatePlan and returns its rows."""
+        raise NotImplementedError
+
+    def count(self, filters, since=None, until=None):
+        if filters is None:
+            return 0
+        rows = self.aggregate(count_plan(filters, since=since, until=until))
+        return rows[0]["ShipmentCount"] if rows else 0
+
+    def top_expensive(self, filters, limit=5):
+        """Returns the `limit` most expensive shipments (SHIPMENT_FIELDS only), most expensive first."""
+        raise NotImplementedError
+
+    def distinct(self, field, filters=None):
+        """Returns the distinct defined values of `field`."""
+        raise NotImplementedError
+
+    def page(self, filters, sort_by=None, sort_order=None, offset=0, limit=10):
+        """Returns one page of shipment documents, projected to SHIPMENT_FIELDS."""
+        raise NotImplementedError
+
+    def page_after(self, filters, sort_by=None, sort_order=None, after=None, limit=10):
+        """
+        Returns the `limit` shipments that follow the keyset position
+        `after` = (sort value, ShipmentID) in sort_spec order, or the first
+        page when `after` is None. A sort value of None stands for a missing
+        field: those shipments sort first ascending and last descending (as
+        Cosmos DB orders undefined), by ShipmentID among themselves.
+        """
+        raise NotImplementedError
+
+    def iter_items(self, filters=None, fields=None):
+        """Streams the matching shipments, projected to `fields` when given."""
+        raise NotImplementedError
+
+    def iter_sorted(self, filters=None, sort_by=None, sort_order=None, fields=None):
+        """
+        Streams every matching shipment in sort_spec order, projected to
+        `fields` (default SHIPMENT_FIELDS), without holding the result set.
+        """
+        raise NotImplementedError
+
+    def upsert(self, document):
+        raise NotImplementedError
+
+    def delete(self, shipment_id):
+        raise NotImplementedError
+
+
+class CosmosShipmentStore(ShipmentStore):
+    """ShipmentStore backed by the Cosmos DB container."""
+
+    name = "cosmos"
+
+    def __init__(self, container_provider, single_flight=None):
+        # container_provider is called on every operation, so the store works
+        # as soon as a connection made elsewhere succeeds (see app.connect_with_backoff).
+        super().__init__()
+        self._container_provider = container_provider
+        # Shares one execution among concurrent identical queries (see single_flight.py).
+        self._single_flight = single_flight
+
+    def _container(self):
+        container = self._container_provider()
+        if not container:
+            raise StoreUnavailable("Cosmos DB not initialized. Check configuration.")
+        return container
+
+    def available(self):
+        return bool(self._container_provider())
+
+    def _pages(self, query):
+        return iter_query_pages(self._container(), query.text, parameters=query.parameters())
+
+    def _coalesced(self, query, run):
+        if self._single_flight is None:
+            return run()
+        key = (query.text,) + tuple((p["name"], p["value"]) for p in query.parameters())
+        return self._single_flight.do(key, run)
+
+    def _query(self, query):
+        return self._coalesced(query, lambda: [item for page in self._pages(query) for item in page])
+
+    def aggregate(self, plan):
+        return self._coalesced(plan.to_query(), lambda: CosmosAggregateExecutor(self._container()).aggregate(plan))
+
+    def top_expensive(self, filters, limit=5):
+        return self._query(ShipmentQuery(fields=SHIPMENT_FIELDS, filters=filters, order_by=[("CostUSD", "desc")],
+                                         top=limit))
+
+    def distinct(self, field, filters=None):
+        values = self._query(ShipmentQuery(fields=(field,), filters=filters, defined=(field,),
+                                           value=True, distinct=True))
+        return [value for value in values if value and isinstance(value, str)]
+
+    @staticmethod
+    def _order_by(field, direction):
+        # Ordering by two fields needs a composite index, see CosmosDBSchema.md.
+        if field == "ShipmentID":
+            return [("ShipmentID", direction)]
+        return [(field, direction), ("ShipmentID", direction)]
+
+    def page(self, filters, sort_by=None, sort_order=None, offset=0, limit=10):
+        field, direction = sort_spec(sort_by, sort_order)
+        return self._query(ShipmentQuery(fields=SHIPMENT_FIELDS, filters=filters,
+                                         order_by=self._order_by(field, direction), offset=offset, limit=limit))
+
+    def page_after(self, filters, sort_by=None, sort_order=None, after=None, limit=10):
+        field, direction = sort_spec(sort_by, sort_order)
+        keyset = (field, direction) + tuple(after) if after is not None else None
+        return self._query(ShipmentQuery(fields=SHIPMENT_FIELDS, filters=filters,
+                                         order_by=self._order_by(field, direction), after=keyset, top=limit))
+
+    def iter_items(self, filters=None, fields=None):
+        for page in self._pages(ShipmentQuery(fields=fields or (), filters=filters)):
+            for item in page:
+                yield item
+
+    def iter_sorted(self, filters=None, sort_by=None, sort_order=None, fields=None):
+        field, direction = sort_spec(sort_by, sort_order)
+        query = ShipmentQuery(fields=fields or SHIPMENT_FIELDS, filters=filters,
+                              order_by=self._order_by(field, direction))
+        for page in self._pages(query):
+            for item in page:
+                yield item
+
+    def upsert(self, document):
+        stored = self._container().upsert_item(body=document)
+        self.notify_change("upsert", stored)
+        return stored
+
+    def delete(self, shipment_id):
+        self._container().delete_item(item=shipment_id, partition_key=shipment_id)
+        self.notify_change("delete", {"id": shipment_id})
@@ -0,0 +1,67 @@
+# single_flight.py
+import threading
+
+
+class _Call:
+    """One in-flight execution and the outcome its waiters will share."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution: the
+    first caller runs the function, later callers with that key block until
+    it finishes and get the same result (or exception). Nothing is kept once
+    the call returns, so this only deduplicates work that overlaps in time;
+    caching is ResultCache's job.
+
+    Built on threading primitives, so it works in the threading async mode
+    and under eventlet/gevent workers, which patch them to green versions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.deduplicated = 0
+
+    def do(self, key, function):
+        """Returns function(), sharing one execution among concurrent callers with `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "deduplicated": self.deduplicated,
+                "inFlight": len(self._calls),
+            }
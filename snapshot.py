@@ -0,0 +1,217 @@
+# snapshot.py
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from columnar_store import CATEGORICAL_FIELDS, DATE_FIELDS, MISSING_CODE, MISSING_DATE, ColumnarShipmentStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process may write
+    fcntl = None
+
+# File layout: MAGIC, the header length as a little-endian uint64, the JSON
+# header, then each column's raw array, aligned to ALIGNMENT bytes so the
+# arrays can be viewed in place from the mapping.
+MAGIC = b"SHIPSNAP"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# Spare rows written after the live ones so changes applied after a warm
+# start fill the mapped arrays before the store has to grow them.
+MIN_HEADROOM_ROWS = 1024
+# Ids shorter than this still get this many characters, leaving room for longer ones.
+MIN_ID_WIDTH = 16
+
+
+def _aligned(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def _fill_value(field):
+    if field in CATEGORICAL_FIELDS:
+        return MISSING_CODE
+    if field in DATE_FIELDS:
+        return MISSING_DATE
+    return np.nan
+
+
+def _padded(array, capacity, fill):
+    padded = np.full(capacity, fill, dtype=array.dtype)
+    padded[:len(array)] = array
+    return padded
+
+
+def write_snapshot(store, path, checkpoint=None, source=None, data_version=None):
+    """
+    Writes the rows of a ColumnarShipmentStore to `path`, replacing it
+    atomically. `checkpoint` is the change feed position the rows include
+    (snapshot readers replay the feed from there) and `source` identifies
+    what the rows were loaded from, so a snapshot of other data is never used.
+    Returns the header.
+
+    Take the checkpoint before calling this: rows written after it are
+    replayed again on catch-up, which is harmless because applying a change
+    twice leaves the same state.
+    """
+    ids, columns, dictionaries = store.export_arrays()
+    rows = len(ids)
+    capacity = rows + max(MIN_HEADROOM_ROWS, rows // 8)
+    width = max([MIN_ID_WIDTH] + [len(shipment_id) for shipment_id in ids.tolist()])
+    arrays = {"ids": _padded(np.asarray(ids, dtype=f"U{width}"), capacity, "")}
+    for field, column in columns.items():
+        arrays[field] = _padded(column, capacity, _fill_value(field))
+
+    layout, position = {}, 0
+    for name, array in arrays.items():
+        position = _aligned(position)
+        layout[name] = {"dtype": array.dtype.str, "offset": position, "length": array.nbytes}
+        position += array.nbytes
+    header = {
+        "formatVersion": FORMAT_VERSION,
+        "createdAt": time.time(),
+        "rows": rows,
+        "capacity": capacity,
+        "source": source,
+        "checkpoint": checkpoint,
+        "dataVersion": data_version,
+        "dictionaries": dictionaries,
+        "columns": layout,
+    }
+    encoded = json.dumps(header).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(encoded))
+
+    temporary = f"{path}.tmp.{os.getpid()}"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers that mapped the old file keep its pages until they let go.
+    os.replace(temporary, path)
+    return header
+
+
+def read_header(path):
+    """Returns (header, data offset) of a snapshot file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a shipment snapshot.")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    if header.get("formatVersion") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {header.get('formatVersion')}")
+    return header, _aligned(len(MAGIC) + 8 + length)
+
+
+def load_snapshot(path, expected_source=None):
+    """
+    Memory-maps a snapshot and returns (store, header), or None when there is
+    no usable snapshot (missing, unreadable, or taken from another source).
+
+    Nothing is read up front: the columns are copy-on-write views of the
+    mapping, so the store is ready in milliseconds and the pages come from
+    the OS page cache, shared by every process that maps the same file.
+    Only the pages a process later writes to (applying changes) are copied.
+    """
+    try:
+        header, data_start = read_header(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring snapshot {path}: {e}")
+        return None
+    if expected_source is not None and header.get("source") != expected_source:
+        print(f"Ignoring snapshot {path}: taken from {header.get('source')}, not {expected_source}.")
+        return None
+
+    mapping = np.memmap(path, dtype=np.uint8, mode="c")
+    arrays = {}
+    for name, column in header["columns"].items():
+        start = data_start + column["offset"]
+        arrays[name] = mapping[start:start + column["length"]].view(np.dtype(column["dtype"]))
+    ids = arrays.pop("ids")
+    store = ColumnarShipmentStore.from_arrays(ids, arrays, header["dictionaries"], header["rows"])
+    return store, header
+
+
+class SnapshotWriter:
+    """
+    Background thread that rewrites the snapshot every `interval` seconds
+    while the data has changed. `version()` returns the current data version
+    and `checkpoint()` the change feed position applied so far.
+
+    With several worker processes, only the one holding the lock file
+    (`<path>.lock`) writes; the others just map the result on their next start.
+    """
+
+    def __init__(self, store, path, interval, version, checkpoint=lambda: None, source=None, written_version=None):
+        self.store = store
+        self.path = path
+        self.interval = interval
+        self.version = version
+        self.checkpoint = checkpoint
+        self.source = source
+        # Version already on disk (e.g. the one just warm-started from).
+        self.written_version = written_version
+        self.snapshots_written = 0
+        self.last_duration = None
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _acquire_lock(self):
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def write_if_changed(self):
+        """Writes a snapshot if the data version moved since the last one. Returns True if it wrote."""
+        version = self.version()
+        if version == self.written_version or not self._acquire_lock():
+            return False
+        started = time.perf_counter()
+        checkpoint = self.checkpoint()
+        header = write_snapshot(self.store, self.path, checkpoint=checkpoint, source=self.source,
+                                data_version=version)
+        self.last_duration = time.perf_counter() - started
+        self.written_version = version
+        self.snapshots_written += 1
+        print(f"Wrote snapshot of {header['rows']} shipments to {self.path} in {self.last_duration:.2f}s.")
+        return True
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write_if_changed()
+            except Exception as e:
+                print(f"Error writing snapshot: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "snapshotsWritten": self.snapshots_written,
+            "lastDurationSeconds": None if self.last_duration is None else round(self.last_duration, 3),
+            "writtenVersion": self.written_version,
+        }
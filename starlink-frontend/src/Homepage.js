@@ -1,5 +1,6 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
+import { io } from 'socket.io-client';
 import {
   BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer,
   PieChart, Pie, Cell
@@ -7,6 +8,22 @@ import {
 import './Styles/Homepage.css';
 
 const API_BASE_URL = 'http://localhost:5000/api';
+const LIVE_UPDATES_URL = 'http://localhost:5000/cosmos-db-nosql';
+
+// merges a dashboard_delta message (only the changed fields) into the current state
+const applyDashboardDelta = (data, delta) => {
+  const next = { ...data, ...(delta.counters || {}) };
+  if (delta.avgCostByCarrier) {
+    const averages = Object.fromEntries(data.avgCostByCarrierData.map(item => [item.carrier, item.averageCost]));
+    Object.entries(delta.avgCostByCarrier).forEach(([carrier, averageCost]) => {
+      if (averageCost === null) delete averages[carrier];
+      else averages[carrier] = averageCost;
+    });
+    next.avgCostByCarrierData = Object.entries(averages).map(([carrier, averageCost]) => ({ carrier, averageCost }));
+  }
+  if (delta.top5ExpensiveShipments) next.top5ExpensiveShipments = delta.top5ExpensiveShipments;
+  return next;
+};
 
 function HomePage() {
   const [dashboardData, setDashboardData] = useState({
@@ -27,6 +44,8 @@ function HomePage() {
 
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const socketRef = useRef(null);
+  const filtersRef = useRef(filters);
   const fetchDashboardData = useCallback(async () => {
     setLoading(true);
     setError(null);
@@ -81,10 +100,48 @@ function HomePage() {
   }, [filters]); // dependency array
 
 
-  // runs on initial load and whenever filters change
+  // live updates: the backend sends a snapshot for the subscribed filters,
+  // then pushes only what changed, so the dashboard no longer re-fetches
+  useEffect(() => {
+    const socket = io(LIVE_UPDATES_URL, { transports: ['websocket', 'polling'] });
+    socketRef.current = socket;
+
+    socket.on('connect', () => {
+      setLoading(true);
+      socket.emit('subscribe', filtersRef.current);
+    });
+    socket.on('dashboard_snapshot', ({ snapshot }) => {
+      setDashboardData(prev => ({ ...prev, ...snapshot }));
+      setError(null);
+      setLoading(false);
+    });
+    socket.on('dashboard_delta', ({ delta }) => {
+      setDashboardData(prev => applyDashboardDelta(prev, delta));
+    });
+    socket.on('dashboard_error', ({ error }) => {
+      setError(error);
+      setLoading(false);
+    });
+
+    axios.get(`${API_BASE_URL}/unique_carriers`)
+      .then(res => setDashboardData(prev => ({ ...prev, uniqueCarriers: res.data })))
+      .catch(err => console.error("Error fetching carriers:", err));
+
+    return () => socket.disconnect();
+  }, []);
+
+  // runs on initial load and whenever filters change; falls back to the
+  // REST endpoints when the live connection is not up
   useEffect(() => {
-    fetchDashboardData();
-  }, [fetchDashboardData]);
+    filtersRef.current = filters;
+    const socket = socketRef.current;
+    if (socket && socket.connected) {
+      setLoading(true);
+      socket.emit('subscribe', filters);
+    } else {
+      fetchDashboardData();
+    }
+  }, [filters, fetchDashboardData]);
 
   //ui handling
   const handleFilterChange = (e) => {
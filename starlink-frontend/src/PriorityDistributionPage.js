@@ -10,7 +10,7 @@ function PriorityDistributionPage({ apiBaseUrl }) {
   // state for processed data for charts
   const [data, setData] = useState([]);
   // unique carriers state for dropdown filter
-  const [uniqueCarriers, setUniqueCarriers] = useState([]);
+  const [carrierFacets, setCarrierFacets] = useState([]);
   // state for currently selected carrier
   const [selectedCarrier, setSelectedCarrier] = useState('All');
   const [loading, setLoading] = useState(true);
@@ -62,18 +62,18 @@ function PriorityDistributionPage({ apiBaseUrl }) {
   };
 
 
-  // 1. useEffect to fetch unique carriers on initial load (once)
+  // 1. useEffect to fetch the carriers with their shipment counts on initial load (once)
   useEffect(() => {
-    const fetchUniqueCarriers = async () => {
+    const fetchCarrierFacets = async () => {
       try {
-        const response = await fetch(`${apiBaseUrl}/unique_carriers`);
-        const carriers = await response.json();
-        setUniqueCarriers(carriers.map(c => (c || '').trim())); // Clean up carrier names
+        const response = await fetch(`${apiBaseUrl}/facets`);
+        const facets = await response.json();
+        setCarrierFacets(facets.Carrier.map(({ value, count }) => ({ value: (value || '').trim(), count }))); // Clean up carrier names
       } catch (err) {
-        console.error("Error fetching unique carriers:", err);
+        console.error("Error fetching carriers:", err);
       }
     };
-    fetchUniqueCarriers();
+    fetchCarrierFacets();
   }, [apiBaseUrl]);
 
   // 2. useEffect to fetch chart data whenever the carrier changes
@@ -148,8 +148,8 @@ function PriorityDistributionPage({ apiBaseUrl }) {
             <label htmlFor="carrierFilter" style={{ marginRight: '0.5rem', fontWeight: 'bold', color: '#4b5563' }}>Carrier:</label>
             <select id="carrierFilter" name="carrier" value={selectedCarrier} onChange={handleFilterChange} style={{ padding: '0.5rem', borderRadius: '0.375rem', border: '1px solid #d1d5db' }}>
               <option value="All">All Carriers</option>
-              {uniqueCarriers.map((carrierName) => (
-                  <option key={carrierName} value={carrierName}>{carrierName}</option>
+              {carrierFacets.map(({ value, count }) => (
+                  <option key={value} value={value}>{value} ({count.toLocaleString()})</option>
               ))}
             </select>
           </div>
@@ -173,8 +173,8 @@ function PriorityDistributionPage({ apiBaseUrl }) {
               style={{ padding: '0.5rem', borderRadius: '0.375rem', border: '1px solid #d1d5db' }}
           >
               <option value="All">All Carriers</option>
-              {uniqueCarriers.map((carrierName) => (
-                  <option key={carrierName} value={carrierName}>{carrierName}</option>
+              {carrierFacets.map(({ value, count }) => (
+                  <option key={value} value={value}>{value} ({count.toLocaleString()})</option>
               ))}
           </select>
         </div>
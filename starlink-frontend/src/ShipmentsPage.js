@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 import './Styles/Shipments.css';
 
@@ -10,16 +10,22 @@ function ShipmentsPage({ apiBaseUrl }) {
     const [currentPage, setCurrentPage] = useState(1);
     const [itemsPerPage] = useState(15); // default table items limit
     const [goToPageInput, setGoToPageInput] = useState('');
-    const [uniqueCarriers, setUniqueCarriers] = useState([]);
+    const [facets, setFacets] = useState({ Carrier: [], DeliveryStatus: [], ServiceType: [] });
     const [filters, setFilters] = useState({
         carrier: '',
         status: '',
         serviceType: '',
+        origin: '',
+        destination: '',
         sortBy: '',
         sortOrder: ''
     });
+    // lane search text as typed; applied to the filters on enter or blur
+    const [laneSearch, setLaneSearch] = useState({ origin: '', destination: '' });
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    // cursors returned by the backend, keyed by the page they lead to
+    const pageCursors = useRef({});
 
     // fetch shipments for table view
     const fetchShipments = useCallback(async () => {
@@ -31,9 +37,17 @@ function ShipmentsPage({ apiBaseUrl }) {
                 limit: itemsPerPage,
                 ...filters
             };
+            // use the keyset cursor when we already know it, so deep pages stay cheap
+            const cursor = pageCursors.current[currentPage];
+            if (cursor) {
+                params.cursor = cursor;
+            }
             const response = await axios.get(`${apiBaseUrl}/shipments`, { params });
             setShipments(response.data.shipments);
             setTotalShipments(response.data.totalCount);
+            if (response.data.nextCursor) {
+                pageCursors.current[currentPage + 1] = response.data.nextCursor;
+            }
         } catch (err) {
             console.error("error fetching shipments for table:", err);
             setError("failed to load shipment data for table. is backend running?");
@@ -42,19 +56,25 @@ function ShipmentsPage({ apiBaseUrl }) {
         }
     }, [currentPage, itemsPerPage, filters, apiBaseUrl]); // for useCallback
 
-    //fetch unique carriers once
+    // fetch the filter options with counts whenever the filters change
+    const { carrier, status, serviceType } = filters;
     useEffect(() => {
-        const fetchUniqueCarriers = async () => {
+        const fetchFacets = async () => {
             try {
-                const response = await axios.get(`${apiBaseUrl}/unique_carriers`);
-                setUniqueCarriers(response.data);
+                const response = await axios.get(`${apiBaseUrl}/facets`, { params: { carrier, status, serviceType } });
+                setFacets(response.data);
             } catch (err) {
-                console.error("Error fetching unique carriers:", err);
+                console.error("Error fetching filter options:", err);
             }
         };
 
-        fetchUniqueCarriers();
-    }, [apiBaseUrl]);
+        fetchFacets();
+    }, [apiBaseUrl, carrier, status, serviceType]);
+
+    // renders facet values as dropdown options, e.g. "UPS (1,204)"
+    const facetOptions = (field) => facets[field].map(({ value, count }) => (
+        <option key={value} value={value}>{value} ({count.toLocaleString()})</option>
+    ));
 
     // useeffect hook to trigger data fetching for shipments
     useEffect(() => {
@@ -79,9 +99,25 @@ function ShipmentsPage({ apiBaseUrl }) {
 
             return newFilters;
         });
+        pageCursors.current = {}; // cursors are only valid for the filters they were issued for
         setCurrentPage(1); // reset to first page on filter/sort change
     };
 
+    const handleLaneSearchChange = (e) => {
+        const { name, value } = e.target;
+        setLaneSearch(prev => ({ ...prev, [name]: value }));
+    };
+
+    // origin/destination match by prefix, e.g. "hamb" finds Hamburg
+    const applyLaneSearch = () => {
+        if (laneSearch.origin === filters.origin && laneSearch.destination === filters.destination) {
+            return;
+        }
+        setFilters(prevFilters => ({ ...prevFilters, ...laneSearch }));
+        pageCursors.current = {};
+        setCurrentPage(1);
+    };
+
     const totalPages = Math.ceil(totalShipments / itemsPerPage);
 
     const handlePageChange = (newPage) => {
@@ -193,9 +229,7 @@ function ShipmentsPage({ apiBaseUrl }) {
                         >
                             <option value="All">all carriers</option>
                           {/* dynamically render carrier options */}
-                          {uniqueCarriers.map((carrierName) => (
-                            <option key={carrierName} value={carrierName}>{carrierName}</option>
-                          ))}
+                          {facetOptions("Carrier")}
                         </select>
                     </div>
 
@@ -209,10 +243,7 @@ function ShipmentsPage({ apiBaseUrl }) {
                             onChange={handleFilterChange}
                         >
                             <option value="All">all statuses</option>
-                            <option value="Delivered">delivered</option>
-                            <option value="In Transit">in transit</option>
-                            <option value="Delayed">delayed</option>
-                            <option value="Cancelled">cancelled</option>
+                            {facetOptions("DeliveryStatus")}
                         </select>
                     </div>
 
@@ -226,13 +257,38 @@ function ShipmentsPage({ apiBaseUrl }) {
                             onChange={handleFilterChange}
                         >
                             <option value="All">all service types</option>
-                            <option value="Standard">standard</option>
-                            <option value="Express">express</option>
-                            <option value="Same Day">same day</option>
-                            <option value="Overnight">overnight</option>
+                            {facetOptions("ServiceType")}
                         </select>
                     </div>
 
+                    {/* 4. lane search */}
+                    <div>
+                        <label htmlFor="originSearch">origin:</label>
+                        <input
+                            id="originSearch"
+                            name="origin"
+                            type="text"
+                            placeholder="starts with..."
+                            value={laneSearch.origin}
+                            onChange={handleLaneSearchChange}
+                            onKeyDown={(e) => e.key === 'Enter' && applyLaneSearch()}
+                            onBlur={applyLaneSearch}
+                        />
+                    </div>
+                    <div>
+                        <label htmlFor="destinationSearch">destination:</label>
+                        <input
+                            id="destinationSearch"
+                            name="destination"
+                            type="text"
+                            placeholder="starts with..."
+                            value={laneSearch.destination}
+                            onChange={handleLaneSearchChange}
+                            onKeyDown={(e) => e.key === 'Enter' && applyLaneSearch()}
+                            onBlur={applyLaneSearch}
+                        />
+                    </div>
+
                     {/* sort by options*/}
                     <div>
                         <label htmlFor="sortBy">sort by:</label>
@@ -271,6 +327,13 @@ function ShipmentsPage({ apiBaseUrl }) {
                             <option value="desc">descending</option>
                         </select>
                     </div>
+
+                    {/* export every shipment matching the current filters and sort */}
+                    <div>
+                        <a href={`${apiBaseUrl}/export?${new URLSearchParams(filters).toString()}`} download>
+                            export csv
+                        </a>
+                    </div>
             </div>
 
             {/* table view section */}
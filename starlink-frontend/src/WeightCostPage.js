@@ -3,6 +3,7 @@ import { ScatterChart, Scatter, XAxis, YAxis, CartesianGrid, Tooltip, Legend, Re
 import './Styles/PriorityDistribuation.css'
 function WeightCostPage({ apiBaseUrl }) {
   const [data, setData] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -11,24 +12,29 @@ function WeightCostPage({ apiBaseUrl }) {
       setLoading(true);
       setError(null);
       try {
-        const url = `${apiBaseUrl}/weight_cost_express_correlation`;
+        // A stratified sample is plenty for the scatter; the regression stats
+        // are computed by the backend over every Express shipment.
+        const url = `${apiBaseUrl}/weight_cost_express_correlation?mode=sample&limit=2000`;
         const response = await fetch(url);
         const result = await response.json();
 
         if (response.ok) {
-          const cleanData = result.filter(d => d.WeightKG != null && d.CostUSD != null);
-          console.log(`Number of scatter points to be displayed: ${cleanData.length}`);
+          const cleanData = result.points.filter(d => d.WeightKG != null && d.CostUSD != null);
+          console.log(`Number of scatter points to be displayed: ${cleanData.length} of ${result.stats.count}`);
 
           setData(cleanData);
+          setStats(result.stats);
 
         } else {
           setError(result.error || 'Failed to fetch correlation data.');
           setData([]);
+          setStats(null);
         }
       } catch (error) {
         console.error('Failed to fetch weight-cost correlation data:', error);
         setError('Failed to fetch correlation data. Is the backend running?');
         setData([]);
+        setStats(null);
       } finally {
         setLoading(false);
       }
@@ -58,52 +64,20 @@ function WeightCostPage({ apiBaseUrl }) {
     return <p>No Express correlation data available.</p>;
   }
 
-  // --- Start of Linear Regression Calculation ---
-  const calculateLinearRegressionLine = (data) => {
-    const validData = data.filter(point =>
-      typeof point.WeightKG === 'number' && !isNaN(point.WeightKG) &&
-      typeof point.CostUSD === 'number' && !isNaN(point.CostUSD)
-    );
-
-    if (validData.length < 2) return [];
-
-    let sumX = 0;
-    let sumY = 0;
-    let sumXY = 0;
-    let sumX2 = 0;
-    const n = validData.length;
-
-    validData.forEach(point => {
-      const x = point.WeightKG;
-      const y = point.CostUSD;
-      sumX += x;
-      sumY += y;
-      sumXY += x * y;
-      sumX2 += x * x;
-    });
-
-    const numerator = (n * sumXY) - (sumX * sumY);
-    const denominator = (n * sumX2) - (sumX * sumX);
-
-    if (denominator === 0) {
-      return [];
-    }
-
-    const slope = numerator / denominator;
-    const intercept = (sumY - slope * sumX) / n;
+  // --- Regression line from the backend's full-data statistics ---
+  const calculateLinearRegressionLine = (data, stats) => {
+    if (!stats || stats.slope == null || data.length < 2) return [];
 
-    const minWeight = Math.min(...validData.map(d => d.WeightKG));
-    const maxWeight = Math.max(...validData.map(d => d.WeightKG));
+    const minWeight = Math.min(...data.map(d => d.WeightKG));
+    const maxWeight = Math.max(...data.map(d => d.WeightKG));
 
-    const lineData = [
-      { WeightKG: minWeight, CostUSD: slope * minWeight + intercept },
-      { WeightKG: maxWeight, CostUSD: slope * maxWeight + intercept }
+    return [
+      { WeightKG: minWeight, CostUSD: stats.slope * minWeight + stats.intercept },
+      { WeightKG: maxWeight, CostUSD: stats.slope * maxWeight + stats.intercept }
     ];
-
-    return lineData;
   };
 
-  const regressionLineData = calculateLinearRegressionLine(data);
+  const regressionLineData = calculateLinearRegressionLine(data, stats);
 
   const allYValues = [
     ...data.map(d => d.CostUSD),
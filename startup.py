@@ -0,0 +1,106 @@
+# startup.py
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Startup:
+    """
+    Timed startup phases of the API process.
+
+    Module-level setup (imports, configuration) is recorded with mark() as
+    each step finishes. The slow steps (connecting to the database, loading
+    the store, priming results) run as phases on a background warm-up thread
+    started by start(), so the process accepts connections straight away
+    while `ready` stays false until every phase has run.
+
+    A phase that raises stops the warm-up and leaves `failed` set: the
+    process will not become ready and should be restarted.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.phases = []
+        self.current = None
+        self.ready = False
+        self.ready_after = None
+        self.failed = None
+        self._thread = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def _record(self, name, seconds, error=None):
+        phase = {"name": name, "seconds": round(seconds, 3)}
+        if error is not None:
+            phase["error"] = error
+        with self._lock:
+            self.phases.append(phase)
+
+    def mark(self, name):
+        """Records the time since the previous mark (or since startup began) as phase `name`."""
+        now = time.perf_counter()
+        self._record(name, now - self._last_mark)
+        self._last_mark = now
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._record(name, time.perf_counter() - started, error=str(e))
+            raise
+        self._record(name, time.perf_counter() - started)
+
+    def run(self, phases):
+        """Runs the (name, function) phases in order, then marks the process ready."""
+        name = None
+        try:
+            for name, function in phases:
+                self.current = name
+                with self.phase(name):
+                    function()
+            self.current = None
+        except Exception as e:
+            self.failed = f"{name}: {e}"
+            print(f"Startup failed in phase {self.failed}")
+        else:
+            self.ready_after = self.elapsed()
+            self.ready = True
+            print(f"Ready {self.ready_after:.2f}s after startup ({self.summary()}).")
+        finally:
+            self._done.set()
+
+    def start(self, phases):
+        """Runs the phases on a background thread, once; later calls do nothing."""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self.run, args=(phases,), name="warm-up", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Blocks until warm-up has finished (or failed). Returns True if the process is ready."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def summary(self):
+        with self._lock:
+            return ", ".join(f"{phase['name']} {phase['seconds']:.2f}s" for phase in self.phases)
+
+    def stats(self):
+        with self._lock:
+            phases = list(self.phases)
+        return {
+            "ready": self.ready,
+            "uptimeSeconds": round(self.elapsed(), 3),
+            "readyAfterSeconds": None if self.ready_after is None else round(self.ready_after, 3),
+            "error": self.failed,
+            "runningPhase": self.current,
+            "phases": phases,
+        }
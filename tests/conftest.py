@@ -0,0 +1,57 @@
+# tests/conftest.py
+import json
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, not in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_shipments import write_csv  # noqa: E402
+from ingest_pipeline import convert_chunk, read_chunks  # noqa: E402
+
+SHIPMENT_ROWS = 600
+
+
+def load_documents(csv_path):
+    documents = []
+    for header, rows, _, _ in read_chunks(csv_path):
+        converted, rejects = convert_chunk(header, rows)
+        assert not rejects
+        documents.extend(converted)
+    return documents
+
+
+@pytest.fixture(scope="session")
+def shipments_csv(tmp_path_factory):
+    return write_csv(str(tmp_path_factory.mktemp("data") / "shipments.csv"), rows=SHIPMENT_ROWS, seed=7)
+
+
+@pytest.fixture
+def shipments(shipments_csv):
+    """
+    Generated shipments as the importer writes them, with some fields
+    removed so missing values are covered: every 7th shipment has no
+    Carrier, every 11th no CostUSD and every 13th no ShipmentDate.
+    """
+    documents = load_documents(shipments_csv)
+    for position, document in enumerate(documents):
+        if position % 7 == 0:
+            del document["Carrier"]
+        if position % 11 == 0:
+            del document["CostUSD"]
+        if position % 13 == 0:
+            del document["ShipmentDate"]
+    return documents
+
+
+@pytest.fixture(scope="session")
+def api(shipments_csv, tmp_path_factory):
+    """The Flask app on the in-memory store, warmed up over the generated shipments."""
+    data_file = tmp_path_factory.mktemp("store") / "shipments.json"
+    data_file.write_text(json.dumps(load_documents(shipments_csv)))
+    os.environ.update(SHIPMENT_STORE="memory", SHIPMENT_DATA_FILE=str(data_file))
+    import app
+    app.startup.run(app.warm_up_phases())
+    return app
@@ -0,0 +1,105 @@
+# tests/test_aggregates.py
+import pytest
+
+from aggregate_queries import (Aggregate, AggregatePlan, CosmosAggregateExecutor, LocalAggregateExecutor,
+                               carrier_cost_plan, count_plan, dashboard_summary, fold_rows, matches_filters,
+                               priority_status_plan, status_count_plan)
+from columnar_store import ColumnarShipmentStore
+from facets import facet_cube_plan
+
+PLANS = {
+    "count": count_plan({}),
+    "count filtered": count_plan({"ServiceType": "Express", "Priority": ("High", "Medium")}),
+    "status since": status_count_plan({}, since="2025-01-01T00:00:00Z"),
+    "status window": status_count_plan({"Carrier": "DHL"}, since="2024-01-01T00:00:00Z",
+                                       until="2024-07-01T00:00:00Z"),
+    "carrier cost": carrier_cost_plan({}),
+    "priority status": priority_status_plan({"ServiceType": "Standard"}),
+    "facet cube": facet_cube_plan(),
+    "weight range": AggregatePlan([Aggregate("MinWeight", "MIN", "WeightKG"),
+                                   Aggregate("MaxWeight", "MAX", "WeightKG")],
+                                  filters={"DeliveryStatus": "Delayed"}, numeric=("WeightKG",)),
+    "average by carrier": AggregatePlan([Aggregate("AverageCost", "AVG", "CostUSD"),
+                                         Aggregate("ShipmentCount", "COUNT")],
+                                        group_by=("Carrier",)),
+    "no match": count_plan({"Carrier": "Nobody"}),
+}
+
+
+def _sorted_rows(rows, plan):
+    return sorted(rows, key=lambda row: tuple(str(row.get(field)) for field in plan.group_by))
+
+
+@pytest.mark.parametrize("name", sorted(PLANS))
+def test_columnar_store_matches_local_executor(shipments, name):
+    plan = PLANS[name]
+    expected = _sorted_rows(LocalAggregateExecutor(shipments).aggregate(plan), plan)
+    actual = _sorted_rows(ColumnarShipmentStore(shipments).aggregate(plan), plan)
+
+    assert len(actual) == len(expected)
+    for actual_row, expected_row in zip(actual, expected):
+        assert actual_row.keys() == expected_row.keys()
+        for key, value in expected_row.items():
+            if isinstance(value, float):
+                assert actual_row[key] == pytest.approx(value)
+            else:
+                assert actual_row[key] == value
+
+
+def test_columnar_store_reflects_writes(shipments):
+    store = ColumnarShipmentStore(shipments)
+    plan = status_count_plan({})
+    changed = dict(shipments[1], DeliveryStatus="Delayed")
+    store.upsert(changed)
+    store.delete(shipments[2]["ShipmentID"])
+    expected = [shipments[0], changed] + shipments[3:]
+
+    assert (_sorted_rows(store.aggregate(plan), plan)
+            == _sorted_rows(LocalAggregateExecutor(expected).aggregate(plan), plan))
+
+
+class InMemoryCosmosExecutor(CosmosAggregateExecutor):
+    """Answers the executor's queries from documents, recording each query text."""
+
+    def __init__(self, documents):
+        super().__init__(container=None)
+        self.documents = documents
+        self.queries = []
+
+    def _pages(self, query):
+        self.queries.append(query.text)
+        matching = [document for document in self.documents
+                    if matches_filters(document, query.filters, query.since, query.defined, query.numeric, query.until)]
+        if query.aggregates:
+            value = fold_rows(AggregatePlan(query.aggregates), matching)[0][query.aggregates[0].alias]
+            return [[value] if value is not None else []]
+        if query.value:
+            return [list(dict.fromkeys(document[query.fields[0]] for document in matching))]
+        return [[{field: document[field] for field in query.fields if field in document} for document in matching]]
+
+
+def test_dashboard_on_cosmos_runs_only_value_queries(shipments):
+    executor = InMemoryCosmosExecutor(shipments)
+    since = "2025-01-01T00:00:00Z"
+    for filters in ({}, {"Carrier": "DHL"}, {"DeliveryStatus": "Delivered"}, {"DeliveryStatus": "Delayed"}):
+        executor.queries = []
+        actual = dashboard_summary(executor, filters, since, [])
+        expected = dashboard_summary(LocalAggregateExecutor(shipments), filters, since, [])
+
+        for summary in (actual, expected):
+            summary["avgCostByCarrierData"].sort(key=lambda row: row["carrier"])
+        assert actual == expected
+        assert executor.queries and all(" VALUE " in text for text in executor.queries)
+    assert actual["totalShipments"] == actual["totalDelayedShipments"] > 0
+
+
+@pytest.mark.parametrize("name", ["carrier cost", "priority status", "facet cube", "weight range",
+                                  "average by carrier", "status since"])
+def test_cosmos_executor_matches_local_executor(shipments, name):
+    plan = PLANS[name]
+    expected = _sorted_rows(LocalAggregateExecutor(shipments).aggregate(plan), plan)
+    actual = _sorted_rows(InMemoryCosmosExecutor(shipments).aggregate(plan), plan)
+
+    assert len(actual) == len(expected)
+    for actual_row, expected_row in zip(actual, expected):
+        assert actual_row == pytest.approx(expected_row)
@@ -0,0 +1,63 @@
+# tests/test_bulk_import.py
+import import_data
+from bulk_import import AdaptiveLimiter, BulkImporter, FakeThrottleError, FakeThrottlingContainer
+
+
+def test_limiter_halves_on_throttle_and_grows_after_successes():
+    limiter = AdaptiveLimiter(16, min_limit=1, max_limit=20, increase_after=3)
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    for _ in range(3):
+        limiter.on_throttle()
+    assert limiter.limit == 1
+    limiter.on_throttle()
+    assert limiter.limit == 1
+
+    for _ in range(6):
+        limiter.on_success()
+    assert limiter.limit == 3
+    limiter.cap(2)
+    assert limiter.limit == 2
+
+
+def test_throttled_writes_are_retried_and_concurrency_backs_off():
+    container = FakeThrottlingContainer(ru_per_second=600, ru_per_write=6.0, latency=0.001)
+    importer = BulkImporter(container, max_workers=16, initial_concurrency=16, progress_every=0)
+    items = [{"id": f"SHP{position}", "ShipmentID": f"SHP{position}"} for position in range(300)]
+    report = importer.import_items(items)
+
+    assert report.failed == 0 and report.succeeded == len(items)
+    assert len(container.items) == len(items)
+    assert container.throttled > 0 and report.retries == report.throttled
+    assert report.final_concurrency < 16
+    assert report.request_units == len(items) * 6.0
+
+
+def test_writes_fail_once_retries_run_out():
+    class AlwaysThrottled:
+        def upsert_item(self, body, response_hook=None, **kwargs):
+            raise FakeThrottleError(1)
+
+    report = BulkImporter(AlwaysThrottled(), max_retries=2, progress_every=0).import_items([{"id": "SHP1"}])
+
+    assert report.failed == 1 and report.throttled == 3
+
+
+def test_bulk_modes_turn_off_sdk_throttle_retries(monkeypatch):
+    clients = []
+
+    class FakeClient:
+        def __init__(self, endpoint, credential, **kwargs):
+            clients.append(kwargs)
+
+        def get_database_client(self, database_id):
+            return self
+
+        def get_container_client(self, container_id):
+            return self
+
+    monkeypatch.setattr(import_data, "CosmosClient", FakeClient)
+    import_data.connect_container(import_data.BULK_THROTTLE_RETRIES)
+    import_data.connect_container()
+
+    assert clients == [{"retry_throttle_total": 0}, {}]
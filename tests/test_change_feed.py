@@ -0,0 +1,71 @@
+# tests/test_change_feed.py
+from change_feed import ChangeFeedConsumer, CosmosChangeFeed, LiveAggregates
+
+PAGE_SIZE = 10
+
+
+class FakePaged:
+    def __init__(self, pages):
+        self._pages = pages
+
+    def by_page(self):
+        return self._pages
+
+    def __iter__(self):
+        return (record for page in self._pages for record in page)
+
+
+class FakeFeedContainer:
+    """Serves change feed records in pages; the continuation is the position reached."""
+
+    def __init__(self, records):
+        self.records = records
+        self.pages_read = 0
+
+    def query_items_change_feed(self, max_item_count, response_hook, continuation=None, start_time=None, mode=None):
+        def pages():
+            position = int(continuation or 0)
+            while True:
+                page = self.records[position:position + max_item_count]
+                position += len(page)
+                self.pages_read += 1
+                response_hook({"etag": str(position)}, page)
+                if not page:
+                    return
+                yield page
+        return FakePaged(pages())
+
+
+def _change(document_id, operation="create"):
+    return {"current": {"id": document_id, "Carrier": "DHL", "DeliveryStatus": "Delivered", "CostUSD": 10.0},
+            "previous": {"id": document_id}, "metadata": {"operationType": operation}}
+
+
+def test_reads_one_page_per_call():
+    container = FakeFeedContainer([_change(f"SHP{position}") for position in range(25)])
+    feed = CosmosChangeFeed(lambda: container, page_size=PAGE_SIZE)
+
+    assert [len(feed.read_changes()) for _ in range(4)] == [10, 10, 5, 0]
+    assert feed.checkpoint() == "25"
+    # Each call fetched only the pages it returned (plus the empty one that ends the feed).
+    assert container.pages_read == 4
+
+
+def test_consumer_checkpoints_after_each_page():
+    container = FakeFeedContainer([_change(f"SHP{position}") for position in range(25)]
+                                  + [_change("SHP3", "delete")])
+    feed = CosmosChangeFeed(lambda: container, page_size=PAGE_SIZE)
+    live = LiveAggregates()
+    consumer = ChangeFeedConsumer(feed, live.apply)
+
+    checkpoints = []
+    while consumer.poll_once():
+        checkpoints.append(consumer.checkpoint)
+
+    assert checkpoints == ["10", "20", "26"]
+    assert consumer.caught_up and len(live) == 24
+
+    restored = CosmosChangeFeed(lambda: container, page_size=PAGE_SIZE)
+    restored.restore(consumer.checkpoint)
+    container.records.append(_change("SHP99"))
+    assert [record["current"]["id"] for record in restored.read_changes()] == ["SHP99"]
@@ -0,0 +1,56 @@
+# tests/test_correlation.py
+import pytest
+
+from columnar_store import ColumnarShipmentStore
+from correlation import StratifiedReservoir, summarize
+
+
+def _fill(reservoir, counts):
+    # One point per shipment at the middle of each weight stratum 0..9.
+    for stratum, count in enumerate(counts):
+        for position in range(count):
+            reservoir.add(stratum + 0.5, float(position))
+
+
+def test_quotas_follow_stratum_sizes_after_the_minimum():
+    reservoir = StratifiedReservoir(100, (0.0, 10.0))
+    _fill(reservoir, [900, 90, 5, 5, 0, 0, 0, 0, 0, 0])
+    quotas = reservoir.quotas()
+
+    assert sum(quotas) <= 100
+    assert quotas[4:] == [0] * 6
+    # Sparse strata keep their minimum; the rest follows the shipment counts.
+    assert quotas[2] == quotas[3] == reservoir.min_per_stratum
+    assert quotas[0] > 8 * quotas[1]
+
+
+def test_point_weights_add_up_to_the_shipments_seen():
+    reservoir = StratifiedReservoir(50, (0.0, 10.0))
+    counts = [400, 40, 4, 1, 0, 0, 0, 0, 0, 12]
+    _fill(reservoir, counts)
+    points = reservoir.points()
+
+    assert len(points) <= 50
+    assert sum(point["weight"] for point in points) == pytest.approx(sum(counts))
+    assert min(point["WeightKG"] for point in points) < 1 and max(point["WeightKG"] for point in points) > 9
+
+
+def test_sample_mode_is_bounded_and_weighted(shipments):
+    store = ColumnarShipmentStore(shipments)
+    result = summarize(store, {}, "sample", sample_size=40)
+
+    assert 0 < len(result["points"]) <= 40
+    assert sum(point["weight"] for point in result["points"]) == pytest.approx(result["stats"]["count"])
+    assert summarize(store, {}, "sample", sample_size=40) == result
+
+
+def test_parameters_the_mode_ignores_share_a_cache_entry(api):
+    client = api.app.test_client()
+    url = "/api/weight_cost_express_correlation?mode=sample&limit=30"
+    first = client.get(url + "&bins=5")
+    hits = api.result_cache.stats()["hits"]
+    second = client.get(url + "&bins=7")
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert api.result_cache.stats()["hits"] == hits + 1
@@ -0,0 +1,65 @@
+# tests/test_daily_rollups.py
+import pytest
+
+from aggregate_queries import Aggregate, AggregatePlan, LocalAggregateExecutor, count_plan, status_count_plan
+from daily_rollups import DailyRollups
+
+SINCE = "2024-01-01T00:00:00Z"
+UNTIL = "2024-07-01T00:00:00Z"
+
+PLANS = {
+    "count since": count_plan({}, since=SINCE),
+    "status window": status_count_plan({"Carrier": "DHL"}, since=SINCE, until=UNTIL),
+    "cost by carrier until": AggregatePlan([Aggregate("TotalCost", "SUM", "CostUSD"),
+                                            Aggregate("AverageCost", "AVG", "CostUSD"),
+                                            Aggregate("ShipmentCount", "COUNT")],
+                                           group_by=("Carrier",), defined=("Carrier",), numeric=("CostUSD",),
+                                           until=UNTIL),
+}
+
+
+def _by_group(rows, plan):
+    return {tuple(row.get(field) for field in plan.group_by): row for row in rows}
+
+
+@pytest.mark.parametrize("name", sorted(PLANS))
+def test_answers_date_bounded_plans_like_a_scan(shipments, name):
+    plan = PLANS[name]
+    expected = _by_group(LocalAggregateExecutor(shipments).aggregate(plan), plan)
+    actual = _by_group(DailyRollups().load(shipments).answer(plan), plan)
+
+    assert actual.keys() == expected.keys()
+    for group, row in expected.items():
+        assert actual[group] == pytest.approx(row)
+
+
+def test_declines_plans_it_cannot_answer(shipments):
+    rollups = DailyRollups().load(shipments)
+
+    assert rollups.answer(count_plan({})) is None
+    assert rollups.answer(count_plan({}, since="2024-01-01T12:00:00Z")) is None
+    assert rollups.answer(AggregatePlan([Aggregate("MaxCost", "MAX", "CostUSD")], since=SINCE)) is None
+
+
+def test_updates_and_deletes_are_retracted():
+    rollups = DailyRollups()
+    rollups.apply("upsert", {"id": "SHP1", "ShipmentDate": "2024-03-01T00:00:00Z", "Carrier": "UPS", "CostUSD": 10.0})
+    rollups.apply("upsert", {"id": "SHP2", "ShipmentDate": "2024-03-02T00:00:00Z", "Carrier": "UPS", "CostUSD": 30.0})
+    rollups.apply("upsert", {"id": "SHP1", "ShipmentDate": "2024-03-02T00:00:00Z", "Carrier": "DHL", "CostUSD": 20.0})
+
+    rows = rollups.query("2024-03-01", "2024-03-02", group_by=("day", "Carrier"))
+    assert [(row["day"], row["Carrier"], row["TotalCostUSD"]) for row in rows] == [
+        ("2024-03-02", "DHL", 20.0), ("2024-03-02", "UPS", 30.0)]
+
+    rollups.apply("delete", {"id": "SHP2"})
+    assert rollups.query("2024-03-02", "2024-03-02") == [
+        {"ShipmentCount": 1, "TotalCostUSD": 20.0, "AvgCostUSD": 20.0, "TotalWeightKG": 0,
+         "AvgWeightKG": None, "AvgDeliveryDays": None}]
+    assert rollups.bucket_count() == 1
+
+
+def test_state_round_trips(shipments):
+    rollups = DailyRollups().load(shipments)
+    restored = DailyRollups.from_state(rollups.export_state())
+
+    assert restored.query(group_by=("Carrier",)) == rollups.query(group_by=("Carrier",))
@@ -0,0 +1,83 @@
+# tests/test_distributions.py
+import bisect
+import random
+
+import pytest
+
+from distributions import KLLSketch
+
+VALUES = 50000
+K = 200
+# KLL's rank error is roughly 1.7 / k; allow some headroom for the random compactions.
+RANK_ERROR = 3.0 / K
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+@pytest.fixture
+def values():
+    rng = random.Random(11)
+    return [rng.lognormvariate(3.0, 1.0) for _ in range(VALUES)]
+
+
+@pytest.fixture(autouse=True)
+def seeded_compactions():
+    # Compactors pick odd or even items at random.
+    state = random.getstate()
+    random.seed(5)
+    yield
+    random.setstate(state)
+
+
+def _rank(ordered, value):
+    return bisect.bisect_right(ordered, value) / len(ordered)
+
+
+def _assert_quantiles(sketch, values):
+    ordered = sorted(values)
+    for q in QUANTILES:
+        assert abs(_rank(ordered, sketch.quantile(q)) - q) <= RANK_ERROR, q
+
+
+def test_quantiles_within_rank_error(values):
+    sketch = KLLSketch(K)
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+    assert (sketch.min, sketch.max) == (min(values), max(values))
+    assert sum(len(compactor) for compactor in sketch.compactors) < 4 * K
+    _assert_quantiles(sketch, values)
+
+
+def test_merged_sketches_within_rank_error(values):
+    parts = [KLLSketch(K) for _ in range(10)]
+    for position, value in enumerate(values):
+        parts[position % len(parts)].add(value)
+    merged = KLLSketch(K)
+    for part in parts:
+        merged.merge(part)
+
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (min(values), max(values))
+    assert sum(len(compactor) for compactor in merged.compactors) < 4 * K
+    _assert_quantiles(merged, values)
+
+
+def test_merge_with_empty_sketch(values):
+    sketch = KLLSketch(K)
+    for value in values[:100]:
+        sketch.add(value)
+    sketch.merge(KLLSketch(K))
+
+    assert sketch.count == 100
+    assert sketch.quantile(0.5) == sorted(values[:100])[49]
+    assert KLLSketch(K).quantile(0.5) is None
+
+
+def test_state_round_trip(values):
+    sketch = KLLSketch(K)
+    for value in values[:5000]:
+        sketch.add(value)
+    restored = KLLSketch.from_state(sketch.to_state())
+
+    assert restored.summary() == sketch.summary()
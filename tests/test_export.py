@@ -0,0 +1,46 @@
+# tests/test_export.py
+import json
+
+from conftest import load_documents
+from export import ROWS_PER_CHUNK, stream_export
+
+
+def test_exported_csv_imports_back_to_the_same_shipments(shipments_csv, tmp_path):
+    documents = load_documents(shipments_csv)
+    exported = tmp_path / "export.csv"
+    exported.write_text("".join(stream_export(iter(documents), "csv")))
+
+    assert load_documents(str(exported)) == documents
+
+
+def test_stream_pulls_documents_as_chunks_are_written():
+    pulled, closed = [], []
+
+    def source():
+        try:
+            for position in range(10 * ROWS_PER_CHUNK):
+                pulled.append(position)
+                yield {"ShipmentID": f"SHP{position}"}
+        finally:
+            closed.append("source")
+
+    stream = stream_export(source(), "ndjson", on_close=lambda: closed.append("on_close"))
+    first = next(stream)
+
+    assert len(first.splitlines()) == ROWS_PER_CHUNK and len(pulled) == ROWS_PER_CHUNK
+    # A client going away closes the stream, which stops the query paging.
+    stream.close()
+    assert closed == ["source", "on_close"]
+
+
+def test_export_endpoint_streams_the_filtered_shipments(api, shipments_csv):
+    expected = sorted(document["ShipmentID"] for document in load_documents(shipments_csv)
+                      if document.get("Carrier") == "UPS")
+    response = api.app.test_client().get("/api/export?format=ndjson&carrier=UPS&sortBy=ShipmentID&sortOrder=asc",
+                                         buffered=False)
+
+    assert response.status_code == 200 and response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.headers["Content-Disposition"] == 'attachment; filename="shipments.ndjson"'
+    assert [row["ShipmentID"] for row in rows] == expected
+    assert "id" not in rows[0]
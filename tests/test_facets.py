@@ -0,0 +1,36 @@
+# tests/test_facets.py
+import pytest
+
+from columnar_store import ColumnarShipmentStore
+from facets import FACET_FIELDS, facet_counts, facet_cube_plan
+
+FILTERS = [{}, {"Carrier": "UPS"}, {"Carrier": "DHL", "DeliveryStatus": "Delayed"},
+           {"ServiceType": "Express", "Priority": "High", "DeliveryStatus": "Delivered"}]
+
+
+def _expected(shipments, filters, field):
+    values = sorted({document[field] for document in shipments if document.get(field)})
+    others = {name: value for name, value in filters.items() if name != field}
+    return [{"value": value,
+             "count": sum(1 for document in shipments if document.get(field) == value
+                          and all(document.get(name) == other for name, other in others.items()))}
+            for value in values]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_each_field_ignores_only_its_own_filter(shipments, filters):
+    cube = ColumnarShipmentStore(shipments).aggregate(facet_cube_plan())
+    counts = facet_counts(cube, filters)
+
+    for field in FACET_FIELDS:
+        assert counts[field] == _expected(shipments, filters, field)
+
+
+def test_values_without_matches_are_listed_with_zero():
+    cube = [{"Carrier": "UPS", "DeliveryStatus": "Delayed", "ShipmentCount": 4},
+            {"Carrier": "DHL", "DeliveryStatus": "Delivered", "ShipmentCount": 6}]
+    counts = facet_counts(cube, {"Carrier": "UPS", "Priority": ""})
+
+    assert counts["Carrier"] == [{"value": "DHL", "count": 6}, {"value": "UPS", "count": 4}]
+    assert counts["DeliveryStatus"] == [{"value": "Delayed", "count": 4}, {"value": "Delivered", "count": 0}]
+    assert counts["Priority"] == []
@@ -0,0 +1,88 @@
+# tests/test_ingest_pipeline.py
+import csv
+import json
+import shutil
+
+import pytest
+
+from ingest_pipeline import load_checkpoint, run_pipeline
+
+CHUNK_ROWS = 100
+
+
+class WriteFailed(Exception):
+    pass
+
+
+@pytest.fixture
+def csv_path(shipments_csv, tmp_path):
+    # Two malformed rows at known positions: a bad date and a missing column.
+    with open(shipments_csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    header = rows[0]
+    rows[150][header.index("ShipmentDate")] = "2024-13-45"
+    rows[420] = rows[420][:-1]
+    path = tmp_path / "shipments.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+def _writer(written, fail_on_chunk=None):
+    chunks = []
+
+    def write(documents):
+        chunks.append(len(documents))
+        if len(chunks) == fail_on_chunk:
+            raise WriteFailed()
+        written.extend(document["ShipmentID"] for document in documents)
+    return write
+
+
+def test_resumes_after_last_committed_chunk(csv_path, tmp_path):
+    checkpoint_path = str(tmp_path / "import.checkpoint")
+    reject_path = str(tmp_path / "rejects.csv")
+    written = []
+
+    with pytest.raises(WriteFailed):
+        run_pipeline(csv_path, _writer(written, fail_on_chunk=3), checkpoint_path, reject_path, CHUNK_ROWS)
+    checkpoint = load_checkpoint(checkpoint_path, csv_path)
+    assert checkpoint["row"] == 2 * CHUNK_ROWS
+    assert checkpoint["imported"] == len(written) == 2 * CHUNK_ROWS - 1
+    assert checkpoint["rejected"] == 1
+
+    checkpoint = run_pipeline(csv_path, _writer(written), checkpoint_path, reject_path, CHUNK_ROWS)
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        expected = [row[0] for row in csv.reader(f)][1:]
+    assert len(written) == len(set(written)) == len(expected) - 2
+    assert set(written) == set(expected) - {expected[149], expected[419]}
+    assert checkpoint["row"] == len(expected)
+    assert checkpoint["imported"] == len(written)
+    assert checkpoint["rejected"] == 2
+
+    with open(reject_path, newline="", encoding="utf-8") as f:
+        rejects = list(csv.DictReader(f))
+    assert [reject["RowNumber"] for reject in rejects] == ["150", "420"]
+    assert "ShipmentDate" in rejects[0]["RejectReason"]
+    assert "columns" in rejects[1]["RejectReason"]
+
+
+def test_finished_checkpoint_imports_nothing(csv_path, tmp_path):
+    checkpoint_path = str(tmp_path / "import.checkpoint")
+    run_pipeline(csv_path, _writer([]), checkpoint_path, chunk_rows=CHUNK_ROWS)
+    written = []
+    run_pipeline(csv_path, _writer(written), checkpoint_path, chunk_rows=CHUNK_ROWS)
+
+    assert written == []
+
+
+def test_checkpoint_for_another_file_is_ignored(csv_path, tmp_path):
+    checkpoint_path = str(tmp_path / "import.checkpoint")
+    run_pipeline(csv_path, _writer([]), checkpoint_path, chunk_rows=CHUNK_ROWS)
+    other_path = str(tmp_path / "other.csv")
+    shutil.copyfile(csv_path, other_path)
+
+    assert load_checkpoint(checkpoint_path, other_path) is None
+    with open(checkpoint_path, encoding="utf-8") as f:
+        assert json.load(f)["row"] > 0
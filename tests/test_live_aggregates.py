@@ -0,0 +1,82 @@
+# tests/test_live_aggregates.py
+import pytest
+
+from aggregate_queries import LocalAggregateExecutor, carrier_cost_plan, count_plan, priority_status_plan, status_count_plan
+from change_feed import LiveAggregates, parse_change
+from facets import facet_cube_plan
+
+PLANS = [
+    count_plan({}),
+    status_count_plan({"ServiceType": "Express"}),
+    carrier_cost_plan({}),
+    priority_status_plan({}),
+    facet_cube_plan(),
+]
+
+
+def _assert_matches(live, documents):
+    for plan in PLANS:
+        key = lambda row: tuple(str(row.get(field)) for field in plan.group_by)  # noqa: E731
+        expected = sorted(LocalAggregateExecutor(documents).aggregate(plan), key=key)
+        actual = sorted(live.answer(plan), key=key)
+        assert len(actual) == len(expected)
+        for actual_row, expected_row in zip(actual, expected):
+            assert actual_row == pytest.approx(expected_row)
+
+
+def test_load_matches_local_executor(shipments):
+    live = LiveAggregates().load(shipments)
+
+    assert live.ready and len(live) == len(shipments)
+    _assert_matches(live, shipments)
+
+
+def test_update_retracts_previous_version(shipments):
+    live = LiveAggregates().load(shipments)
+    delivered = next(document for document in shipments if document["DeliveryStatus"] == "Delivered"
+                     and "CostUSD" in document and "Carrier" in document)
+    delayed = dict(delivered, DeliveryStatus="Delayed", Carrier="New Carrier", CostUSD=delivered["CostUSD"] + 100)
+    live.apply("upsert", delayed)
+
+    documents = [delayed if document is delivered else document for document in shipments]
+    assert len(live) == len(shipments)
+    _assert_matches(live, documents)
+
+    # Re-applying the same version changes nothing.
+    live.apply("upsert", delayed)
+    _assert_matches(live, documents)
+
+
+def test_delete_retracts_document(shipments):
+    live = LiveAggregates().load(shipments)
+    removed = shipments[:25]
+    for document in removed:
+        live.apply(*parse_change({
+            "current": {},
+            "previous": {"id": document["id"]},
+            "metadata": {"operationType": "delete"},
+        }))
+
+    assert len(live) == len(shipments) - len(removed)
+    _assert_matches(live, shipments[len(removed):])
+
+    # Deleting an unknown or already deleted id is a no-op.
+    live.apply("delete", {"id": removed[0]["id"]})
+    live.apply("delete", {"id": "SHP-UNKNOWN"})
+    _assert_matches(live, shipments[len(removed):])
+
+
+def test_emptied_cells_are_dropped(shipments):
+    live = LiveAggregates().load(shipments[:3])
+    for document in shipments[:3]:
+        live.apply("delete", document)
+
+    assert live.answer(facet_cube_plan()) == []
+    assert live.answer(count_plan({})) == [{"ShipmentCount": 0}]
+
+
+def test_unsupported_plans_are_not_answered(shipments):
+    live = LiveAggregates().load(shipments)
+
+    assert live.answer(count_plan({}, since="2025-01-01T00:00:00Z")) is None
+    assert live.answer(count_plan({"Origin": "London"})) is None
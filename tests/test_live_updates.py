@@ -0,0 +1,83 @@
+# tests/test_live_updates.py
+import threading
+import time
+
+from live_updates import DashboardSubscriptions, dashboard_delta
+
+
+def _summary(total, carriers=(), top=()):
+    return {"totalShipments": total, "totalDelayedShipments": 0, "ordersPast3Months": 0, "delayedPast3Months": 0,
+            "avgCostByCarrierData": [{"carrier": carrier, "averageCost": cost} for carrier, cost in carriers],
+            "top5ExpensiveShipments": list(top)}
+
+
+def test_delta_holds_only_what_changed():
+    before = _summary(10, [("UPS", 5.0), ("DHL", 7.0)])
+    after = _summary(11, [("UPS", 6.0)])
+
+    assert dashboard_delta(before, after) == {"counters": {"totalShipments": 11},
+                                              "avgCostByCarrier": {"UPS": 6.0, "DHL": None}}
+    assert dashboard_delta(after, after) is None
+
+
+def test_rooms_share_computations_and_coalesce_changes():
+    totals = {"value": 1}
+    computed, emitted = [], []
+
+    def summary(filters):
+        computed.append(filters)
+        return _summary(totals["value"])
+
+    subscriptions = DashboardSubscriptions(summary, lambda event, message, room: emitted.append((room, message)))
+    room, first = subscriptions.subscribe("a", {"Carrier": "UPS", "DeliveryStatus": None})
+    same_room, second = subscriptions.subscribe("b", {"Carrier": "UPS"})
+    other_room, _ = subscriptions.subscribe("c", {})
+
+    assert room == same_room != other_room
+    assert first == second and len(computed) == 2
+
+    for _ in range(5):
+        subscriptions.on_store_change("upsert", {"id": "SHP1"})
+    totals["value"] = 2
+    assert subscriptions.flush() == 2 and len(computed) == 4
+    assert emitted[0][1] == {"seq": 1, "delta": {"counters": {"totalShipments": 2}}}
+    assert subscriptions.flush() == 0
+
+
+def test_dashboard_room_reads_the_http_cache_entry(api):
+    client = api.app.test_client()
+    response = client.get("/api/dashboard_summary?carrier=UPS")
+    before = api.result_cache.stats()
+    _, snapshot = api.dashboard_subscriptions.subscribe("sid", {"Carrier": "UPS", "DeliveryStatus": None})
+    api.dashboard_subscriptions.unsubscribe("sid")
+
+    assert snapshot["snapshot"] == response.get_json()
+    after = api.result_cache.stats()
+    assert (after["hits"], after["misses"]) == (before["hits"] + 1, before["misses"])
+
+
+def test_flush_task_starts_once(api, monkeypatch):
+    started = []
+    barrier = threading.Barrier(8)
+    monkeypatch.setattr(api, "live_updates_task", None)
+
+    def start_background_task(target):
+        started.append(target)
+        time.sleep(0.05)  # widens the window between the check and the assignment
+        return object()
+
+    monkeypatch.setattr(api.socketio, "start_background_task", start_background_task)
+    client = api.socketio.test_client(api.app, namespace=api.LIVE_UPDATES_NAMESPACE)
+
+    def subscribe():
+        barrier.wait(5)
+        client.emit("subscribe", {"carrier": "DHL"}, namespace=api.LIVE_UPDATES_NAMESPACE)
+
+    threads = [threading.Thread(target=subscribe) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    client.disconnect(namespace=api.LIVE_UPDATES_NAMESPACE)
+
+    assert len(started) == 1
@@ -0,0 +1,50 @@
+# tests/test_metrics.py
+from metrics import MetricsRegistry, RequestStats, current_request, filter_shape
+
+
+def test_each_page_is_charged_the_responses_received_for_it():
+    registry = MetricsRegistry()
+    with registry.track_query("SELECT * FROM c") as tracker:
+        tracker.on_response({"x-ms-request-charge": "2.5"})
+        assert tracker.add_page(10) == 2.5
+        # A throttled attempt and its retry both count towards the next page.
+        tracker.on_response({"x-ms-request-charge": "1"})
+        tracker.on_response({"x-ms-request-charge": "3.25"})
+        assert tracker.add_page(4) == 4.25
+
+    assert (tracker.pages, tracker.rows, tracker.request_charge) == (2, 14, 6.75)
+
+
+def test_queries_are_recorded_on_the_current_request():
+    registry = MetricsRegistry(slow_query_seconds=0)
+    stats = RequestStats("/api/shipments", "carrier")
+    token = current_request.set(stats)
+    try:
+        for charge in (1.0, 2.0):
+            with registry.track_query("SELECT * FROM c WHERE c.Carrier = @carrier",
+                                      [{"name": "@carrier", "value": "UPS"}]) as tracker:
+                tracker.on_response({"x-ms-request-charge": charge})
+                tracker.add_page(5)
+    finally:
+        current_request.reset(token)
+    registry.observe_request(stats, 200)
+    text = registry.render()
+
+    assert (stats.queries, stats.rows, stats.request_charge) == (2, 10, 3.0)
+    assert 'http_requests_total{route="/api/shipments",filters="carrier",status="200"} 1' in text
+    assert 'cosmos_request_charge_total{route="/api/shipments",filters="carrier"} 3.0' in text
+    assert "store_slow_queries_total 2" in text
+
+
+def test_filter_shape_records_which_filters_were_used():
+    assert filter_shape({"carrier": "UPS", "status": "All", "serviceType": "", "cursor": "abc"}) == "carrier+cursor"
+    assert filter_shape({}) == "none"
+
+
+def test_metrics_endpoint_counts_requests(api):
+    client = api.app.test_client()
+    client.get("/api/dashboard_summary?carrier=DHL")
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert 'http_requests_total{route="/api/dashboard_summary",filters="carrier",status="200"}' in text
+    assert 'route="/metrics"' not in text
@@ -0,0 +1,73 @@
+# tests/test_pagination.py
+import pytest
+
+from columnar_store import ColumnarShipmentStore
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+from query_builder import ShipmentQuery
+from shipment_store import sort_spec
+
+PAGE_SIZE = 7
+SORTS = [(field, direction) for field in ("CostUSD", "Carrier", "ShipmentDate", "ShipmentID", "Priority")
+         for direction in ("asc", "desc")]
+
+
+@pytest.fixture
+def store(shipments):
+    # Few distinct costs, so most pages end inside a run of equal sort keys.
+    for position, document in enumerate(shipments):
+        if "CostUSD" in document:
+            document["CostUSD"] = float(position % 4 * 10)
+    return ColumnarShipmentStore(shipments)
+
+
+def _page_with_cursors(store, filters, sort_by, sort_order):
+    field, direction = sort_spec(sort_by, sort_order)
+    ids, after = [], None
+    while True:
+        page = store.page_after(filters, sort_by, sort_order, after, PAGE_SIZE)
+        ids.extend(document["ShipmentID"] for document in page)
+        if len(page) < PAGE_SIZE:
+            return ids
+        cursor = encode_cursor(page[-1], field, direction, filters)
+        after = decode_cursor(cursor, field, direction, filters)
+
+
+@pytest.mark.parametrize("sort_by,sort_order", SORTS)
+@pytest.mark.parametrize("filters", [{}, {"ServiceType": "Express"}])
+def test_cursor_pages_match_offset_pages(store, filters, sort_by, sort_order):
+    expected = [document["ShipmentID"] for document in store.page(filters, sort_by, sort_order, 0, len(store))]
+    ids = _page_with_cursors(store, filters, sort_by, sort_order)
+
+    assert ids == expected
+    assert len(set(ids)) == len(ids)
+
+
+def test_missing_sort_values_come_first_ascending(store):
+    ascending = store.page({}, "CostUSD", "asc", 0, len(store))
+    missing = [document for document in ascending if "CostUSD" not in document]
+
+    assert missing and ascending[:len(missing)] == missing
+    assert [document["ShipmentID"] for document in missing] == sorted(document["ShipmentID"] for document in missing)
+    assert store.page({}, "CostUSD", "desc", 0, len(store)) == ascending[::-1]
+
+
+def test_cursor_is_tied_to_filters_and_order(store):
+    document = store.page({}, "CostUSD", "asc", 0, 1)[0]
+    cursor = encode_cursor(document, "CostUSD", "asc", {})
+
+    assert decode_cursor(cursor, "CostUSD", "asc", {}) == (document.get("CostUSD"), document["ShipmentID"])
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "CostUSD", "desc", {})
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "CostUSD", "asc", {"Carrier": "DHL"})
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not a cursor", "CostUSD", "asc", {})
+
+
+def test_cosmos_keyset_for_missing_sort_value():
+    order_by = [("CostUSD", "asc"), ("ShipmentID", "asc")]
+    query = ShipmentQuery(order_by=order_by, after=("CostUSD", "asc", None, "SHP1"), top=PAGE_SIZE)
+
+    assert "IS_DEFINED(c.CostUSD)" in query.text
+    assert "@afterValue" not in query.text
+    assert {"name": "@afterId", "value": "SHP1"} in query.parameters()
@@ -0,0 +1,50 @@
+# tests/test_query_builder.py
+import pytest
+
+from aggregate_queries import Aggregate
+from query_builder import ShipmentQuery, compile_spec
+
+
+def test_values_are_parameters_not_query_text():
+    query = ShipmentQuery(fields=("ShipmentID", "CostUSD"), filters={"Carrier": "O'Hare \" Freight"},
+                          since="2024-01-01T00:00:00Z", top=5)
+
+    assert query.text == ("SELECT TOP @top c.ShipmentID, c.CostUSD FROM c "
+                          "WHERE c.Carrier = @carrier AND c.ShipmentDate >= @since")
+    assert query.parameters() == [{"name": "@top", "value": 5},
+                                  {"name": "@carrier", "value": "O'Hare \" Freight"},
+                                  {"name": "@since", "value": "2024-01-01T00:00:00Z"}]
+
+
+def test_same_shape_reuses_the_compiled_text():
+    compile_spec.cache_clear()
+    ups = ShipmentQuery(filters={"Carrier": "UPS", "ServiceType": "Express"}, order_by=[("CostUSD", "desc")])
+    dhl = ShipmentQuery(filters={"ServiceType": "Standard", "Carrier": "DHL"}, order_by=[("CostUSD", "desc")])
+    empty_filter = ShipmentQuery(filters={"Carrier": "DHL", "ServiceType": "Standard", "Priority": ""},
+                                 order_by=[("CostUSD", "desc")])
+
+    assert ups.text == dhl.text == empty_filter.text
+    assert compile_spec.cache_info().misses == 1 and compile_spec.cache_info().hits == 2
+    assert ups.parameters() != dhl.parameters()
+
+
+def test_tuple_filters_become_in_lists():
+    query = ShipmentQuery(aggregates=[Aggregate("ShipmentCount", "COUNT")], value=True,
+                          filters={"Priority": ("High", "Medium")})
+
+    assert query.text == "SELECT VALUE COUNT(1) FROM c WHERE c.Priority IN (@priority0, @priority1)"
+    assert [parameter["value"] for parameter in query.parameters()] == ["High", "Medium"]
+
+
+def test_keyset_position_is_bound_as_parameters():
+    query = ShipmentQuery(order_by=[("CostUSD", "asc"), ("ShipmentID", "asc")],
+                          after=("CostUSD", "asc", 12.5, "SHP9"), top=10)
+
+    assert "(c.CostUSD > @afterValue OR (c.CostUSD = @afterValue AND c.ShipmentID > @afterId))" in query.text
+    assert {"name": "@afterValue", "value": 12.5} in query.parameters()
+    assert {"name": "@afterId", "value": "SHP9"} in query.parameters()
+
+
+def test_field_names_are_validated():
+    with pytest.raises(ValueError):
+        ShipmentQuery(fields=("Carrier; DROP",)).text
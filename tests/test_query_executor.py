@@ -0,0 +1,75 @@
+# tests/test_query_executor.py
+import contextvars
+import threading
+import time
+
+import pytest
+
+from query_executor import QueryCancelled, QueryExecutor, QueryTimeout
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.fixture
+def executor():
+    executor = QueryExecutor(max_workers=4, default_timeout=5)
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def test_queries_run_concurrently(executor):
+    barrier = threading.Barrier(3)
+
+    def query(value):
+        def run():
+            # Only returns once all three are running at the same time.
+            barrier.wait(2)
+            return value
+        return run
+
+    result = executor.run({"a": query(1), "b": query(2), "c": query(3)})
+
+    assert result.results == {"a": 1, "b": 2, "c": 3}
+    assert result.server_timing().startswith("a;dur=") and "total;dur=" in result.server_timing()
+
+
+def test_sub_queries_see_the_callers_context(executor):
+    request_id.set("req-1")
+    result = executor.run({"a": request_id.get, "b": request_id.get})
+
+    assert result.results == {"a": "req-1", "b": "req-1"}
+
+
+def test_nested_fan_out_runs_inline(executor):
+    outer = {f"q{position}": (lambda: executor.run({"x": lambda: 1, "y": lambda: 2}).results)
+             for position in range(4)}
+
+    # With every pool thread taken by an outer query, a nested fan-out on the pool would deadlock.
+    assert executor.run(outer, timeout=2).results["q0"] == {"x": 1, "y": 2}
+
+
+def test_first_exception_is_raised(executor):
+    def fail():
+        raise ValueError("bad query")
+
+    with pytest.raises(ValueError, match="bad query"):
+        executor.run({"fail": fail, "slow": lambda: time.sleep(1)})
+
+
+def test_deadline_raises_and_names_the_unfinished_queries(executor):
+    release = threading.Event()
+    with pytest.raises(QueryTimeout, match="slow"):
+        executor.run({"fast": lambda: 1, "slow": lambda: release.wait(5)}, timeout=0.1)
+    release.set()
+
+    assert executor.stats()["timeouts"] == 1
+
+
+def test_cancel_event_stops_waiting(executor):
+    cancel, release = threading.Event(), threading.Event()
+    cancel.set()
+    with pytest.raises(QueryCancelled):
+        executor.run({"a": lambda: release.wait(5), "b": lambda: release.wait(5)}, cancel_event=cancel)
+    release.set()
+
+    assert executor.stats()["cancellations"] == 1
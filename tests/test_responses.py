@@ -0,0 +1,64 @@
+# tests/test_responses.py
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from responses import DataVersion, ResponseLayer
+
+
+@pytest.fixture
+def served():
+    app = Flask(__name__)
+    version = DataVersion()
+    state = {"versioned": True, "calls": 0}
+    layer = ResponseLayer(app, lambda: version.token() if state["versioned"] else None, min_compress_bytes=200)
+
+    @app.route("/api/rows")
+    def rows():
+        state["calls"] += 1
+        return jsonify([{"ShipmentID": f"SHP{position}", "CostUSD": position} for position in range(50)])
+
+    @app.route("/api/small")
+    def small():
+        return jsonify({"ok": True})
+
+    return app.test_client(), version, state, layer
+
+
+def test_matching_etag_is_answered_before_the_route_runs(served):
+    client, version, state, layer = served
+    etag = client.get("/api/rows").headers["ETag"]
+    repeat = client.get("/api/rows", headers={"If-None-Match": etag})
+
+    assert repeat.status_code == 304 and state["calls"] == 1
+    assert layer.stats()["notModified"] == 1
+
+    version.bump()
+    changed = client.get("/api/rows", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_body_hash_etag_without_a_data_version(served):
+    client, _, state, _ = served
+    state["versioned"] = False
+    etag = client.get("/api/rows").headers["ETag"]
+
+    assert client.get("/api/rows").headers["ETag"] == etag
+    # The route still runs, but the unchanged body is not sent again.
+    assert client.get("/api/rows", headers={"If-None-Match": etag}).status_code == 304
+    assert state["calls"] == 3
+
+
+def test_large_json_bodies_are_compressed(served):
+    client, _, _, layer = served
+    response = client.get("/api/rows", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.get_data()))[1] == {"CostUSD": 1, "ShipmentID": "SHP1"}
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert layer.stats()["compressedBytesOut"] < layer.stats()["compressedBytesIn"]
+
+    assert "Content-Encoding" not in client.get("/api/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "Content-Encoding" not in client.get("/api/rows").headers
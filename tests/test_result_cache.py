@@ -0,0 +1,92 @@
+# tests/test_result_cache.py
+import threading
+
+import pytest
+
+from result_cache import ResultCache, cache_key
+from ru_budget import BudgetExhausted
+from single_flight import SingleFlight
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_ignores_empty_filters_and_order():
+    assert cache_key("dashboard", {"Carrier": "UPS", "DeliveryStatus": ""}) == cache_key("dashboard", {"Carrier": "UPS"})
+    assert (cache_key("dashboard", {"Carrier": "UPS", "ServiceType": "Express"})
+            == cache_key("dashboard", {"ServiceType": "Express", "Carrier": "UPS"}))
+
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = ResultCache(default_ttl=10, ttls={"facets": 60}, clock=clock)
+    computed = []
+    compute = lambda: computed.append(1) or len(computed)  # noqa: E731
+
+    assert cache.get_or_compute("dashboard", {}, compute) == 1
+    assert cache.get_or_compute("facets", {}, compute) == 2
+    clock.now = 11
+    assert cache.get_or_compute("dashboard", {}, compute) == 3
+    assert cache.get_or_compute("facets", {}, compute) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.set(cache_key("a", {}), 1)
+    cache.set(cache_key("b", {}), 2)
+    cache.get(cache_key("a", {}))
+    cache.set(cache_key("c", {}), 3)
+
+    assert cache.get(cache_key("a", {})) == (True, 1)
+    assert cache.get(cache_key("b", {})) == (False, None)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_store_change_invalidates_every_entry():
+    cache = ResultCache()
+    cache.get_or_compute("dashboard", {}, lambda: "before")
+    cache.on_store_change("upsert", {"id": "SHP1"})
+
+    assert cache.get_or_compute("dashboard", {}, lambda: "after") == "after"
+
+
+def test_result_computed_across_an_invalidation_is_not_stored():
+    cache = ResultCache(single_flight=SingleFlight())
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow_compute():
+        started.set()
+        release.wait(5)
+        return "stale"
+
+    thread = threading.Thread(target=lambda: results.append(cache.get_or_compute("dashboard", {}, slow_compute)))
+    thread.start()
+    started.wait(5)
+    cache.invalidate()
+    # A request after the write does not join the computation that started before it.
+    assert cache.get_or_compute("dashboard", {}, lambda: "fresh") == "fresh"
+    release.set()
+    thread.join(5)
+
+    assert results == ["stale"]
+    assert cache.get(cache_key("dashboard", {})) == (True, "fresh")
+
+
+def test_expired_entry_is_served_when_budget_is_exhausted():
+    clock = Clock()
+    cache = ResultCache(default_ttl=10, clock=clock)
+    cache.get_or_compute("dashboard", {}, lambda: "old")
+    clock.now = 20
+
+    def shed():
+        raise BudgetExhausted("interactive", 1.0)
+
+    assert cache.get_or_compute("dashboard", {}, shed) == "old"
+    with pytest.raises(BudgetExhausted):
+        cache.get_or_compute("facets", {}, shed)
@@ -0,0 +1,129 @@
+# tests/test_ru_budget.py
+import pytest
+
+import aggregation
+from bulk_import import FakeThrottleError
+from ru_budget import BULK, INTERACTIVE, BudgetExhausted, RUBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def budget(clock, monkeypatch):
+    budget = RUBudget(rates={INTERACTIVE: 100.0, BULK: 10.0}, max_waits={INTERACTIVE: 1.0, BULK: 5.0},
+                      clock=clock, sleep=clock.sleep)
+    monkeypatch.setattr(aggregation, "budget", budget)
+    return budget
+
+
+def test_overspent_class_waits_then_is_shed(budget, clock):
+    with budget.priority(BULK):
+        budget.acquire()
+        budget.charge(40)  # 30 RU in debt at 10 RU/s
+        budget.acquire()
+        assert clock.slept == [3.0]
+        budget.charge(80)
+        with pytest.raises(BudgetExhausted) as shed:
+            budget.acquire()
+    assert shed.value.priority == BULK and shed.value.retry_after == pytest.approx(8.0)
+
+    # Interactive work has its own bucket and is not held up by bulk debt.
+    budget.acquire()
+    assert budget.stats()["classes"][BULK]["shed"] == 1 and len(clock.slept) == 1
+
+
+def test_throttle_pauses_every_class(budget, clock):
+    budget.on_throttle(0.5)
+    budget.acquire()
+    budget.on_throttle(2.0)
+
+    assert clock.slept == [0.5]
+    with pytest.raises(BudgetExhausted):
+        budget.acquire()
+
+
+class Pages:
+    def __init__(self, container, pages, start):
+        self._container = container
+        self._pages = pages
+        self._position = start
+        self.continuation_token = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._container.requests += 1
+        if self._container.requests in self._container.throttle_on:
+            raise FakeThrottleError(200)
+        if self._position >= len(self._pages):
+            raise StopIteration
+        page = self._pages[self._position]
+        self._position += 1
+        self.continuation_token = str(self._position)
+        self._container.response_hook({"x-ms-request-charge": "5"}, page)
+        return page
+
+
+class ThrottlingContainer:
+    """Serves fixed pages and raises a 429 on the given (1-based) page requests."""
+
+    def __init__(self, pages, throttle_on):
+        self.pages = pages
+        self.throttle_on = set(throttle_on)
+        self.requests = 0
+        self.issued = 0
+
+    def query_items(self, query, response_hook, **kwargs):
+        self.issued += 1
+        self.response_hook = response_hook
+        container = self
+
+        class Paged:
+            def by_page(self, continuation_token=None):
+                return Pages(container, container.pages, int(continuation_token or 0))
+
+        return Paged()
+
+
+PAGES = [[1, 2], [3, 4], [5, 6]]
+
+
+def test_throttled_plain_query_resumes_from_the_continuation(budget, clock):
+    container = ThrottlingContainer(PAGES, throttle_on=[2])
+    pages = list(aggregation.iter_query_pages(container, "SELECT * FROM c"))
+
+    assert pages == PAGES and container.issued == 2
+    assert clock.slept == [0.2] and budget.stats()["throttles"] == 1
+    assert budget.stats()["classes"][INTERACTIVE]["charged"] == 15
+
+
+def test_throttled_ordered_query_is_reissued_and_skips_returned_rows(budget):
+    container = ThrottlingContainer(PAGES, throttle_on=[3])
+    pages = list(aggregation.iter_query_pages(container, "SELECT * FROM c ORDER BY c.CostUSD, c.ShipmentID"))
+
+    assert pages == PAGES and container.issued == 2
+
+
+def test_query_gives_up_after_repeated_throttling(budget, monkeypatch):
+    monkeypatch.setattr(aggregation, "MAX_THROTTLED_ATTEMPTS", 2)
+    container = ThrottlingContainer(PAGES, throttle_on=[1, 2, 3])
+
+    with pytest.raises(FakeThrottleError):
+        list(aggregation.iter_query_pages(container, "SELECT * FROM c"))
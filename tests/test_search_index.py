@@ -0,0 +1,54 @@
+# tests/test_search_index.py
+import pytest
+
+from columnar_store import ColumnarShipmentStore
+from search_index import SEARCH_FIELDS, LaneIndex, PlaceIndex
+
+LANES = [("Hamburg", "New York"), ("Hamm", "Dubai"), ("Sydney", "Hamburg"), ("New Delhi", "Sydney")]
+
+
+@pytest.fixture
+def index():
+    return LaneIndex().load({"Origin": origin, "Destination": destination} for origin, destination in LANES)
+
+
+def test_prefix_and_substring_matches_ignore_case():
+    places = PlaceIndex()
+    for name in ("Hamburg", "Hamm", "Durham", "hamburg", "Oslo"):
+        places.add(name)
+
+    assert places.prefix("HAM") == ["Hamburg", "hamburg", "Hamm"]
+    assert places.contains("ham") == ["Durham", "Hamburg", "hamburg", "Hamm"]
+    assert places.contains("bur") == places.prefix("hamb")
+    assert places.contains("am") == places.contains("ham")
+    assert places.prefix("x") == [] and places.contains("xyz") == []
+
+
+def test_both_sides_are_narrowed_to_existing_lanes(index):
+    assert index.resolve("ham") == {"Origin": ("Hamburg", "Hamm")}
+    assert index.resolve("ham", "new") == {"Origin": ("Hamburg",), "Destination": ("New York",)}
+    assert index.resolve(destination="york", mode="contains") == {"Destination": ("New York",)}
+    assert index.resolve("Sydney", "Dubai") is None
+    with pytest.raises(ValueError):
+        index.resolve("ham", mode="fuzzy")
+
+
+def test_writes_add_places_and_lanes(index):
+    index.apply("upsert", {"Origin": "Hamilton", "Destination": "Dubai"})
+    index.apply("delete", {"Origin": "Oslo", "Destination": "Dubai"})
+
+    assert index.resolve("ham", "dub") == {"Origin": ("Hamilton", "Hamm"), "Destination": ("Dubai",)}
+    assert index.resolve("oslo") is None
+    assert index.stats()["lanes"] == 5
+
+
+def test_resolved_filters_select_the_same_rows_as_a_substring_scan(shipments):
+    store = ColumnarShipmentStore(shipments)
+    index = LaneIndex().load(store.iter_items(fields=SEARCH_FIELDS))
+    origin = shipments[0]["Origin"][1:4]
+    filters = index.resolve(origin, mode="contains")
+
+    expected = sorted(document["ShipmentID"] for document in shipments
+                      if origin.casefold() in (document.get("Origin") or "").casefold())
+    assert expected
+    assert sorted(document["ShipmentID"] for document in store.iter_items(filters)) == expected
@@ -0,0 +1,72 @@
+# tests/test_shared_aggregates.py
+import pytest
+
+import shared_aggregates
+from aggregate_queries import carrier_cost_plan, count_plan, status_count_plan
+from change_feed import LiveAggregates
+from daily_rollups import DailyRollups
+from distributions import DistributionSketches
+from shared_aggregates import _HEADER, AggregatePublisher, AggregateSegment, SharedAggregates
+
+SEGMENT_BYTES = 8 * 1024 * 1024
+PLANS = [carrier_cost_plan({}), status_count_plan({"Carrier": "DHL"}, since="2024-01-01T00:00:00Z")]
+
+
+@pytest.fixture
+def segments():
+    writer = AggregateSegment(size=SEGMENT_BYTES, create=True)
+    reader = AggregateSegment(writer.name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_worker_answers_like_the_writer(segments, shipments):
+    writer_segment, reader_segment = segments
+    live, rollups = LiveAggregates().load(shipments), DailyRollups().load(shipments)
+    sketches = DistributionSketches().load(shipments)
+    AggregatePublisher(writer_segment, live, rollups, sketches).publish()
+    updates = []
+    shared = SharedAggregates(reader_segment, on_update=lambda: updates.append(1))
+
+    assert shared.refresh() and not shared.refresh() and updates == [1]
+    assert shared.live.ready and shared.rollups.ready and shared.distributions.ready
+    assert shared.live.answer(PLANS[0]) == live.answer(PLANS[0])
+    assert shared.rollups.answer(PLANS[1]) == rollups.answer(PLANS[1])
+    assert shared.rollups.query(group_by=("Carrier",)) == rollups.query(group_by=("Carrier",))
+    # Sketch queries compact with random coin flips, so compare the state they start from.
+    assert shared.distributions.export_state() == sketches.export_state()
+
+
+def test_workers_pick_up_each_new_version(segments, shipments):
+    writer_segment, reader_segment = segments
+    live = LiveAggregates().load(shipments)
+    publisher = AggregatePublisher(writer_segment, live, DailyRollups(), DistributionSketches())
+    publisher.publish()
+    shared = SharedAggregates(reader_segment)
+    shared.refresh()
+    first_version = shared.version
+
+    live.apply("delete", {"id": shipments[0]["id"]})
+    publisher.publish()
+
+    assert shared.refresh() and shared.version == first_version + 2
+    assert shared.live.answer(count_plan({})) == [{"ShipmentCount": len(shipments) - 1}]
+
+
+def test_reader_retries_while_a_write_is_in_progress(segments, monkeypatch):
+    writer_segment, reader_segment = segments
+    writer_segment.publish(b"{}")
+    monkeypatch.setattr(shared_aggregates, "MAX_READ_ATTEMPTS", 3)
+    # An odd sequence number means the writer is in the middle of a publish.
+    _HEADER.pack_into(writer_segment._memory.buf, 0, 3, 0, 0.0)
+
+    with pytest.raises(TimeoutError):
+        reader_segment.read()
+    assert reader_segment.retries == 3
+
+
+def test_state_larger_than_the_segment_is_rejected(segments):
+    writer_segment, _ = segments
+    with pytest.raises(ValueError, match="SHARED_AGGREGATES_BYTES"):
+        writer_segment.publish(b"x" * (SEGMENT_BYTES + 1))
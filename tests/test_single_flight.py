@@ -0,0 +1,80 @@
+# tests/test_single_flight.py
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def _run_concurrently(flight, key, function):
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(flight.do(key, function))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def _wait_for_followers(flight, count):
+    for _ in range(500):
+        if flight.stats()["deduplicated"] >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError("followers did not join the call")
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def query():
+        executions.append(1)
+        release.wait(5)
+        return {"rows": 3}
+
+    threads, outcomes = _run_concurrently(flight, "dashboard", query)
+    _wait_for_followers(flight, CALLERS - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(executions) == 1 and outcomes == [{"rows": 3}] * CALLERS
+    # Nothing is kept once the call returns.
+    assert flight.do("dashboard", lambda: "again") == "again"
+    assert flight.stats() == {"executions": 2, "deduplicated": CALLERS - 1, "inFlight": 0}
+
+
+def test_waiters_get_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise TimeoutError("store timed out")
+
+    threads, outcomes = _run_concurrently(flight, "facets", failing)
+    _wait_for_followers(flight, CALLERS - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(outcomes) == CALLERS and all(isinstance(outcome, TimeoutError) for outcome in outcomes)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    assert flight.do("a", lambda: 1) == 1 and flight.do("b", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do("a", lambda: int("x"))
+    assert flight.stats()["executions"] == 3
@@ -0,0 +1,55 @@
+# tests/test_snapshot.py
+from aggregate_queries import carrier_cost_plan, priority_status_plan
+from columnar_store import ColumnarShipmentStore
+from snapshot import SnapshotWriter, load_snapshot, write_snapshot
+
+
+def _documents(store):
+    return sorted(store.iter_items(), key=lambda document: document["ShipmentID"])
+
+
+def test_snapshot_round_trips_rows_and_header(shipments, tmp_path):
+    path = str(tmp_path / "shipments.snap")
+    store = ColumnarShipmentStore(shipments)
+    store.delete(shipments[3]["ShipmentID"])
+    write_snapshot(store, path, checkpoint="feed-42", source="cosmos:shipments", data_version=7)
+    loaded, header = load_snapshot(path, expected_source="cosmos:shipments")
+
+    assert (header["rows"], header["checkpoint"], header["dataVersion"]) == (len(shipments) - 1, "feed-42", 7)
+    assert _documents(loaded) == _documents(store)
+    for plan in (carrier_cost_plan({}), priority_status_plan({"ServiceType": "Express"})):
+        assert loaded.aggregate(plan) == store.aggregate(plan)
+
+
+def test_writes_to_a_loaded_store_do_not_touch_the_file(shipments, tmp_path):
+    path = str(tmp_path / "shipments.snap")
+    write_snapshot(ColumnarShipmentStore(shipments), path)
+    loaded, _ = load_snapshot(path)
+    loaded.upsert(dict(shipments[0], Carrier="Zeta Freight", CostUSD=1.0))
+    loaded.delete(shipments[1]["ShipmentID"])
+    loaded.upsert(dict(shipments[2], ShipmentID="SHP-NEW", id="SHP-NEW"))
+
+    reloaded, _ = load_snapshot(path)
+    assert _documents(reloaded) == _documents(ColumnarShipmentStore(shipments))
+    assert len(loaded) == len(shipments)
+
+
+def test_unusable_snapshots_are_ignored(shipments, tmp_path):
+    path = tmp_path / "shipments.snap"
+    assert load_snapshot(str(path)) is None
+    write_snapshot(ColumnarShipmentStore(shipments), str(path), source="replica:a")
+    assert load_snapshot(str(path), expected_source="replica:b") is None
+    path.write_bytes(b"not a snapshot")
+    assert load_snapshot(str(path)) is None
+
+
+def test_writer_only_rewrites_after_the_data_changed(shipments, tmp_path):
+    version = {"value": 1}
+    writer = SnapshotWriter(ColumnarShipmentStore(shipments), str(tmp_path / "shipments.snap"), interval=60,
+                            version=lambda: version["value"], checkpoint=lambda: "feed-1")
+
+    assert writer.write_if_changed() and not writer.write_if_changed()
+    version["value"] = 2
+    assert writer.write_if_changed()
+    assert writer.stats()["snapshotsWritten"] == 2
+    assert load_snapshot(writer.path)[1]["dataVersion"] == 2
@@ -0,0 +1,62 @@
+# tests/test_startup.py
+import threading
+
+from startup import Startup
+
+
+def test_phases_run_in_order_then_the_process_is_ready():
+    startup = Startup()
+    startup.mark("imports")
+    ran = []
+    startup.run([("connect", lambda: ran.append("connect")), ("store", lambda: ran.append("store"))])
+
+    assert ran == ["connect", "store"]
+    assert startup.ready and startup.failed is None
+    assert [phase["name"] for phase in startup.stats()["phases"]] == ["imports", "connect", "store"]
+
+
+def test_failed_phase_stops_warm_up():
+    startup = Startup()
+    ran = []
+
+    def connect():
+        raise ConnectionError("no route to host")
+
+    startup.run([("connect", connect), ("store", lambda: ran.append("store"))])
+
+    assert not startup.ready and ran == []
+    assert startup.failed == "connect: no route to host"
+    phases = startup.stats()["phases"]
+    assert len(phases) == 1 and phases[0]["error"] == "no route to host"
+
+
+def test_warm_up_runs_once_in_the_background():
+    startup = Startup()
+    release = threading.Event()
+    runs = []
+
+    def store():
+        runs.append(1)
+        release.wait(5)
+
+    startup.start([("store", store)])
+    startup.start([("store", store)])
+    assert not startup.wait(0.05) and startup.stats()["runningPhase"] == "store"
+    release.set()
+
+    assert startup.wait(5) and runs == [1]
+
+
+def test_probes_follow_warm_up(api, monkeypatch):
+    client = api.app.test_client()
+    assert client.get("/readyz").status_code == 200
+    assert client.get("/healthz").status_code == 200
+
+    warming = Startup()
+    monkeypatch.setattr(api, "startup", warming)
+    assert client.get("/readyz").status_code == 503
+    assert client.get("/healthz").status_code == 200
+
+    warming.failed = "connect: no route to host"
+    assert client.get("/healthz").get_json() == {"status": "failed", "error": "connect: no route to host"}
+    assert client.get("/healthz").status_code == 500